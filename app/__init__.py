@@ -1,18 +1,42 @@
+import os
 from flask import Flask
 from flask_restx import Api
+from config import config
+from app.api.v1 import serialization
+from app.api.v1.compression import compress_response
+from app.api.v1.metrics import RequestTimer, metrics
+from app.api.v1.profiling import Profiler
 from app.api.v1.users import api as users_ns
 from app.api.v1.reports import api as reports_ns
 from app.api.v1.buses import api as buses_ns
 from app.api.v1.routes import api as routes_ns
+from app.api.v1.assignments import api as assignments_ns
+from app.api.v1.maintenance import api as maintenance_ns
+from app.api.v1.fleet import api as fleet_ns
 
 def create_app():
     app = Flask(__name__)
+    settings = config[os.getenv('FLASK_CONFIG', 'default')]
+    app.config['COMPRESS_MIN_SIZE'] = settings.COMPRESS_MIN_SIZE
+    app.config['COMPRESS_LEVEL'] = settings.COMPRESS_LEVEL
+    app.config['JSON_DUMPS'] = serialization.get_encoder(settings.JSON_ENCODER)
     api = Api(app, version='1.0', title='Portfolio API',
               description='But fleet management API', doc='/api/v1/')
+    api.representation('application/json')(serialization.output_json)
+    app.after_request(compress_response)
+    if settings.METRICS:
+        app.wsgi_app = RequestTimer(app.wsgi_app, settings.METRICS_SAMPLE)
+        app.add_url_rule('/metrics', 'metrics', metrics)
+    if (settings.PROFILE_TOKEN or settings.PROFILE_ALL or settings.PROFILE_SAMPLE_MS
+            or settings.SLOW_REQUEST_MS):
+        app.wsgi_app = Profiler.from_config(app.wsgi_app, settings)
 
     api.add_namespace(users_ns, path='/api/v1/users')
     api.add_namespace(reports_ns, path='/api/v1/reports')
     api.add_namespace(buses_ns, path='/api/v1/buses')
     api.add_namespace(routes_ns, path='/api/v1/routes')
+    api.add_namespace(assignments_ns, path='/api/v1/assignments')
+    api.add_namespace(maintenance_ns, path='/api/v1/maintenance')
+    api.add_namespace(fleet_ns, path='/api/v1/fleet')
 
     return app
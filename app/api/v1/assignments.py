@@ -0,0 +1,95 @@
+from datetime import datetime
+from flask_restx import Namespace, Resource, fields
+from app.services import facade
+from app.api.v1.etag import collection_etag, entity_etag, not_modified, tagged
+from app.models.assignment import Assignment
+from app.api.v1.pagination import page_args, encode_cursor
+from app.persistence.schedule import ScheduleConflict
+from app.api.v1.filters import parse_query
+
+api = Namespace('assignments', description='Assignment operations')
+
+ASSIGNMENT_FIELDS = {'bus_id': str, 'route_id': str,
+                     'start': datetime.fromisoformat, 'end': datetime.fromisoformat}
+
+assignment_model = api.model('Assignment', {
+    'bus_id': fields.String(required=True, description='ID of the bus'),
+    'route_id': fields.String(required=True, description='ID of the route'),
+    'start': fields.DateTime(required=True, description='Start of the assignment (ISO 8601)'),
+    'end': fields.DateTime(required=True, description='End of the assignment (ISO 8601)')
+})
+
+
+@api.route('/')
+class AssignmentList(Resource):
+
+    @api.expect(assignment_model)
+    @api.response(201, 'Assignment successfully created')
+    @api.response(400, 'Invalid input data')
+    @api.response(409, 'The bus is already booked in that window')
+    def post(self):
+        """Assign a bus to a route for a time window"""
+        data = api.payload
+        if not isinstance(data, dict):
+            return {'error': 'Invalid input data'}, 400
+        try:
+            assignment = facade.create_assignment({
+                'bus_id': data.get('bus_id'),
+                'route_id': data.get('route_id'),
+                'start': data.get('start'),
+                'end': data.get('end')
+            })
+        except ScheduleConflict as e:
+            return {'error': str(e), 'conflicts': [obj.id for obj in e.conflicts]}, 409
+        except (ValueError, TypeError) as e:
+            return {'error': str(e)}, 400
+        return assignment.to_dict(), 201
+
+    @api.doc(params={'limit': 'Maximum number of assignments to return',
+                     'cursor': 'Cursor from the previous page',
+                     'bus_id': 'Filter by bus ID',
+                     'route_id': 'Filter by route ID',
+                     'order_by': 'Comma-separated fields, prefixed with - for descending'})
+    @api.response(200, 'List of assignments retrieved successfully')
+    @api.response(400, 'Invalid query parameters')
+    def get(self):
+        """Retrieve a page of assignments"""
+        tag = collection_etag(Assignment)
+        unchanged = not_modified(tag)
+        if unchanged:
+            return unchanged
+        try:
+            limit, after = page_args()
+            filters, order_by = parse_query(ASSIGNMENT_FIELDS)
+            assignments, next_position = facade.get_assignments_page(limit, after, filters, order_by)
+        except ValueError as e:
+            return {'error': str(e)}, 400
+        return {
+            'assignments': [assignment.to_dict() for assignment in assignments],
+            'next_cursor': encode_cursor(next_position)
+        }, 200, tagged(tag)
+
+
+@api.route('/<string:assignment_id>')
+class AssignmentResource(Resource):
+
+    @api.response(200, 'Assignment details retrieved successfully')
+    @api.response(404, 'Assignment not found')
+    def get(self, assignment_id):
+        """Get assignment details by ID"""
+        assignment = facade.get_assignment(assignment_id)
+        if not assignment:
+            return {'error': 'Assignment not found'}, 404
+        tag = entity_etag(assignment)
+        unchanged = not_modified(tag)
+        if unchanged:
+            return unchanged
+        return assignment.to_dict(), 200, tagged(tag)
+
+    @api.response(200, 'Assignment deleted successfully')
+    @api.response(404, 'Assignment not found')
+    def delete(self, assignment_id):
+        """Cancel an assignment"""
+        if not facade.delete_assignment(assignment_id):
+            return {'error': 'Assignment not found'}, 404
+        return {'message': 'Assignment deleted'}, 200
@@ -0,0 +1,38 @@
+from flask import request
+
+MAX_BULK_ITEMS = 5000
+
+
+def bulk_items():
+    """Read the JSON array of items from a bulk request body."""
+    items = request.get_json(silent=True)
+    if not isinstance(items, list) or not items:
+        raise ValueError("Expected a non-empty JSON array")
+    if len(items) > MAX_BULK_ITEMS:
+        raise ValueError(f"At most {MAX_BULK_ITEMS} items per request")
+    return items
+
+
+def bulk_response(results, success_status):
+    """Turn (entity, error) pairs into a per-item response body and status.
+
+    Each successful item reports only the entity id, so the response stays
+    cheap to build however large the batch is. The status is
+    ``success_status`` when every item succeeded, 400 when none did, and
+    207 (Multi-Status) otherwise.
+    """
+    body = []
+    failed = 0
+    for index, (obj, error) in enumerate(results):
+        if error is None:
+            body.append({'index': index, 'status': success_status, 'id': obj.id})
+        else:
+            failed += 1
+            body.append({'index': index, 'status': 400, 'error': error})
+    if not failed:
+        status = success_status
+    elif failed == len(results):
+        status = 400
+    else:
+        status = 207
+    return {'results': body, 'succeeded': len(results) - failed, 'failed': failed}, status
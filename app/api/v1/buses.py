@@ -1,6 +1,14 @@
 from flask import request
 from flask_restx import Namespace, Resource, fields
 from app.services import facade
+from app.api.v1.pagination import page_args, encode_cursor
+from app.api.v1.streaming import stream_format, stream_collection
+from app.api.v1.bulk import bulk_items, bulk_response
+from app.api.v1.filters import parse_query
+from app.api.v1.etag import collection_etag, entity_etag, not_modified, tagged
+from app.models.bus import Bus
+from app.models.user import User
+from app.models.report import Report
 
 api = Namespace('buses', description='Bus operations')
 
@@ -30,6 +38,45 @@ bus_model = api.model('Bus', {
     'reports': fields.List(fields.String, required=True, description="List of report IDs")
 })
 
+EXPANDABLE = ('owner', 'reports')
+EXPANDED_MODELS = {'owner': User, 'reports': Report}
+
+
+BUS_FIELDS = {'status': int, 'euro_standard': int, 'engine_type': str, 'owner_id': str,
+              'name': str, 'price': float, 'length': float, 'capacity': float}
+
+
+def parse_filters():
+    """Read the bus filters and ordering from the query (see parse_query)."""
+    return parse_query(BUS_FIELDS, {'owner': 'owner_id'})
+
+
+def parse_expand():
+    """Return the relations named in ?expand=owner,reports."""
+    expand = request.args.get('expand', '')
+    return tuple(name for name in expand.split(',') if name in EXPANDABLE)
+
+
+def serialize_buses(buses, expand=()):
+    """Serialize buses, embedding the expanded relations resolved in one batch."""
+    if not expand:
+        return [bus.to_dict() for bus in buses]
+
+    hydrated = facade.hydrate_buses(buses, expand)
+    return [embed_relations(bus, hydrated[bus.id]) for bus in buses]
+
+
+def embed_relations(bus, relations):
+    """bus.to_dict() with the relations resolved by hydrate_buses embedded."""
+    bus_dict = dict(bus.to_dict())
+    if 'owner' in relations:
+        owner = relations['owner']
+        bus_dict['owner'] = owner.to_dict() if owner else None
+    if 'reports' in relations:
+        bus_dict['reports'] = [report.to_dict() for report in relations['reports']]
+    return bus_dict
+
+
 @api.route('/')
 class BusList(Resource):
 
@@ -57,10 +104,103 @@ class BusList(Resource):
         except ValueError as e:
             return {'error': str(e)}, 400
 
+    @api.doc(params={
+        'limit': 'Maximum number of buses to return',
+        'cursor': 'Cursor from the previous page',
+        'status': 'Filter by status',
+        'engine_type': 'Filter by engine type',
+        'euro_standard': 'Filter by euro standard',
+        'owner': 'Filter by owner ID',
+        'price__gte': 'Range filters: __gt, __gte, __lt, __lte on price, length, capacity, '
+                      'status and euro_standard',
+        'engine_type__in': 'Comma-separated values, on any filter',
+        'name__prefix': 'Prefix filter on name, engine_type or owner',
+        'order_by': 'Comma-separated fields, prefixed with - for descending',
+        'explain': 'Return the query plan instead of the buses',
+        'expand': 'Comma-separated relations to embed (owner, reports)',
+        'stream': 'Stream the whole collection as json or ndjson'
+    })
     @api.response(200, 'List of buses retrieved successfully')
+    @api.response(400, 'Invalid query parameters')
+    def get(self):
+        try:
+            limit, after = page_args()
+            filters, order_by = parse_filters()
+            fmt = stream_format()
+            if 'explain' in request.args:
+                return {'plan': facade.explain(Bus, filters, order_by, limit)}, 200
+        except ValueError as e:
+            return {'error': str(e)}, 400
+        expand = parse_expand()
+        if fmt:
+            return stream_collection(facade.iter_buses(filters),
+                                     lambda chunk: serialize_buses(chunk, expand),
+                                     fmt, 'buses')
+        tag = collection_etag(Bus, *(EXPANDED_MODELS[name] for name in expand))
+        unchanged = not_modified(tag)
+        if unchanged:
+            return unchanged
+        try:
+            buses, next_position = facade.get_buses_page(limit, after, filters, order_by)
+        except ValueError as e:
+            return {'error': str(e)}, 400
+        return {
+            'buses': serialize_buses(buses, expand),
+            'next_cursor': encode_cursor(next_position)
+        }, 200, tagged(tag)
+
+
+@api.route('/bulk')
+class BusBulk(Resource):
+
+    @api.expect([bus_model])
+    @api.response(201, 'Every bus created')
+    @api.response(207, 'Some items failed, see the per-item results')
+    @api.response(400, 'Invalid input data')
+    def post(self):
+        """Create a batch of buses"""
+        try:
+            items = bulk_items()
+        except ValueError as e:
+            return {'error': str(e)}, 400
+        return bulk_response(facade.create_buses_many(items), 201)
+
+    @api.response(200, 'Every bus updated')
+    @api.response(207, 'Some items failed, see the per-item results')
+    @api.response(400, 'Invalid input data')
+    def put(self):
+        """Update a batch of buses, each item carrying its id"""
+        try:
+            items = bulk_items()
+        except ValueError as e:
+            return {'error': str(e)}, 400
+        return bulk_response(facade.update_buses_many(items), 200)
+
+
+@api.route('/available')
+class AvailableBuses(Resource):
+
+    @api.doc(params={
+        'from': 'Start of the window (ISO 8601)',
+        'to': 'End of the window (ISO 8601)',
+        'status': 'Filter by status',
+        'engine_type': 'Filter by engine type',
+        'euro_standard': 'Filter by euro standard',
+        'owner': 'Filter by owner ID',
+        'expand': 'Comma-separated relations to embed (owner, reports)'
+    })
+    @api.response(200, 'Buses free for the whole window')
+    @api.response(400, 'Invalid query parameters')
     def get(self):
-        buses = facade.get_all_buses()
-        return {'buses': [bus.to_dict() for bus in buses]}, 200
+        """Buses matching the filters with no assignment between from and to"""
+        if 'from' not in request.args or 'to' not in request.args:
+            return {'error': 'from and to are required'}, 400
+        try:
+            filters, _ = parse_filters()
+            buses = facade.get_available_buses(request.args['from'], request.args['to'], filters)
+        except ValueError as e:
+            return {'error': str(e)}, 400
+        return {'buses': serialize_buses(buses, parse_expand()), 'count': len(buses)}, 200
 
 
 @api.route('/<string:bus_id>')
@@ -72,7 +212,16 @@ class BusResource(Resource):
         bus = facade.get_bus(bus_id)
         if not bus:
             return {'error': 'Bus not found'}, 404
-        return bus.to_dict(), 200
+        expand = parse_expand()
+        related = []
+        if expand:
+            relations = facade.hydrate_buses([bus], expand)[bus.id]
+            related = [obj for obj in [relations.get('owner')] + relations.get('reports', []) if obj]
+        tag = entity_etag(bus, *related, variant=expand)
+        unchanged = not_modified(tag)
+        if unchanged:
+            return unchanged
+        return serialize_buses([bus], expand)[0], 200, tagged(tag)
 
     @api.expect(bus_model)
     @api.response(200, 'Bus updated successfully')
@@ -115,3 +264,29 @@ class BusResource(Resource):
             return {'error': 'Bus not found'}, 404
         facade.delete_bus(bus_id)
         return {'message': 'Bus deleted successfully'}, 200
+
+
+@api.route('/<string:bus_id>/availability')
+class BusAvailability(Resource):
+
+    @api.doc(params={'from': 'Start of the window (ISO 8601)',
+                     'to': 'End of the window (ISO 8601)'})
+    @api.response(200, 'Availability of the bus in the window')
+    @api.response(400, 'Invalid query parameters')
+    @api.response(404, 'Bus not found')
+    def get(self, bus_id):
+        """Bookings and free gaps of a bus between from and to"""
+        if not facade.get_bus(bus_id):
+            return {'error': 'Bus not found'}, 404
+        if 'from' not in request.args or 'to' not in request.args:
+            return {'error': 'from and to are required'}, 400
+        try:
+            busy, free = facade.get_bus_availability(bus_id, request.args['from'], request.args['to'])
+        except ValueError as e:
+            return {'error': str(e)}, 400
+        return {
+            'bus_id': bus_id,
+            'available': not busy,
+            'busy': [booking.to_dict() for booking in busy],
+            'free': [{'start': start, 'end': end} for start, end in free]
+        }, 200
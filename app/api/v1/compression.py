@@ -0,0 +1,72 @@
+"""Negotiated gzip / deflate compression of API responses.
+
+``compress_response`` runs after every request. It compresses JSON bodies
+of at least ``COMPRESS_MIN_SIZE`` bytes when the client accepts gzip or
+deflate; smaller bodies are sent as they are, since compressing them saves
+less than it costs. Streamed responses are compressed chunk by chunk, each
+chunk flushed so that clients still see data as it is produced. A
+compressed body gets its own strong tag, the plain one suffixed with the
+coding.
+"""
+import zlib
+
+from flask import current_app, request
+
+COMPRESS_MIN_SIZE = 1024
+COMPRESS_LEVEL = 6
+COMPRESSIBLE = ('application/json', 'application/x-ndjson')
+
+# zlib window bits selecting the container: gzip, or zlib for HTTP 'deflate'
+_WBITS = {'gzip': 16 + zlib.MAX_WBITS, 'deflate': zlib.MAX_WBITS}
+CODINGS = tuple(_WBITS)
+
+
+def compress_response(response):
+    if (response.mimetype not in COMPRESSIBLE or response.status_code < 200
+            or response.status_code in (204, 304) or 'Content-Encoding' in response.headers):
+        return response
+    response.vary.add('Accept-Encoding')
+    coding = request.accept_encodings.best_match(CODINGS)
+    if coding is None:
+        return response
+    level = current_app.config.get('COMPRESS_LEVEL', COMPRESS_LEVEL)
+    if response.is_streamed:
+        response.response = _compress_chunks(response.response, coding, level)
+        response.headers.pop('Content-Length', None)
+    else:
+        data = response.get_data()
+        if len(data) < current_app.config.get('COMPRESS_MIN_SIZE', COMPRESS_MIN_SIZE):
+            return response
+        response.set_data(compress(data, coding, level))
+    response.headers['Content-Encoding'] = coding
+    tag, weak = response.get_etag()
+    if tag and not weak:
+        response.set_etag(coded_etag(tag, coding))
+    return response
+
+
+def coded_etag(tag, coding):
+    """Strong tag of the body tagged tag once compressed with coding."""
+    return f"{tag}-{coding}"
+
+
+def compress(data, coding, level=COMPRESS_LEVEL):
+    """data encoded with coding, 'gzip' or 'deflate'."""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, _WBITS[coding])
+    return compressor.compress(data) + compressor.flush()
+
+
+def _compress_chunks(chunks, coding, level):
+    compressor = zlib.compressobj(level, zlib.DEFLATED, _WBITS[coding])
+    try:
+        for chunk in chunks:
+            if isinstance(chunk, str):
+                chunk = chunk.encode()
+            data = compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+            if data:
+                yield data
+        yield compressor.flush()
+    finally:
+        close = getattr(chunks, 'close', None)
+        if close is not None:
+            close()
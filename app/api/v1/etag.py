@@ -0,0 +1,55 @@
+import hashlib
+import os
+from flask import Response, request
+from werkzeug.http import quote_etag
+from app.services import facade
+from app.api.v1.compression import CODINGS, coded_etag
+
+# Entity versions and repository counters restart with the process, so
+# every tag is keyed with a token drawn at startup.
+_BOOT = os.urandom(16)
+
+
+def etag(*parts):
+    """Strong entity tag over parts: entity cache keys, repository counters, the URL."""
+    return hashlib.blake2b(repr(parts).encode(), digest_size=12, key=_BOOT).hexdigest()
+
+
+def entity_etag(*objs, variant=None):
+    """Tag of a representation built from objs (the entity and any it embeds).
+
+    ``variant`` names the shape of the representation, e.g. the expanded
+    relations, when one entity has several.
+    """
+    return etag(variant, *((obj.id, obj.cache_key()) for obj in objs))
+
+
+def collection_etag(*models):
+    """Tag of a list response over the repositories of models, for this URL and query."""
+    return etag(request.full_path, facade.collection_version(*models))
+
+
+def matched_etag(etags, tag):
+    """Which of tag and its compressed variants the parsed If-None-Match etags holds, or None."""
+    if etags.contains_weak(tag):
+        return tag
+    for coding in CODINGS:
+        if etags.contains_weak(coded_etag(tag, coding)):
+            return coded_etag(tag, coding)
+    return None
+
+
+def not_modified(tag):
+    """A bare 304 when If-None-Match already holds tag, plain or compressed, else None.
+
+    Endpoints check this before serializing anything.
+    """
+    matched = matched_etag(request.if_none_match, tag)
+    if matched:
+        return Response(status=304, headers={'ETag': quote_etag(matched)})
+    return None
+
+
+def tagged(tag):
+    """Headers carrying tag, for a (body, status, headers) return value."""
+    return {'ETag': quote_etag(tag)}
@@ -0,0 +1,53 @@
+from flask import request
+
+NUMERIC_LOOKUPS = ('gt', 'gte', 'lt', 'lte')
+
+
+def parse_query(fields, aliases=None):
+    """Read the filters and ?order_by= of a list endpoint from the query string.
+
+    ``fields`` maps each filterable attribute to the type of its values
+    (int, float, str or a parser such as datetime.fromisoformat) and
+    ``aliases`` maps query names to attributes. An attribute accepts
+    ``name=value`` and ``name__in=a,b``; numbers and dates also take
+    ``__gt``, ``__gte``, ``__lt`` and ``__lte``, strings ``__prefix``.
+    Other parameters are left to the endpoint.
+
+    Returns (filters, order_by) in the form app.persistence.query reads;
+    raises ValueError for a malformed value or an unsupported lookup.
+    """
+    aliases = aliases or {}
+    filters = {}
+    for key, raw in request.args.items():
+        name, _, lookup = key.partition('__')
+        attr = aliases.get(name, name)
+        kind = fields.get(attr)
+        if kind is None:
+            continue
+        if lookup in ('', 'eq'):
+            filters[attr] = _convert(kind, raw, key)
+        elif lookup == 'in':
+            filters[f"{attr}__in"] = [_convert(kind, value, key) for value in raw.split(',')]
+        elif lookup in NUMERIC_LOOKUPS and kind is not str:
+            filters[f"{attr}__{lookup}"] = _convert(kind, raw, key)
+        elif lookup == 'prefix' and kind is str:
+            filters[f"{attr}__prefix"] = raw
+        else:
+            raise ValueError(f"{name} does not support __{lookup}")
+
+    order_by = []
+    for key in filter(None, request.args.get('order_by', '').split(',')):
+        name = key.lstrip('-')
+        attr = aliases.get(name, name)
+        if attr not in fields:
+            raise ValueError(f"Cannot order by {name}")
+        order_by.append(('-' if key.startswith('-') else '') + attr)
+    return filters, order_by
+
+
+def _convert(kind, raw, key):
+    try:
+        return kind(raw)
+    except ValueError:
+        expected = {int: 'an integer', float: 'a number'}.get(kind, 'a valid value')
+        raise ValueError(f"{key} must be {expected}")
@@ -0,0 +1,35 @@
+from flask import request
+from flask_restx import Namespace, Resource
+from app.services import facade
+from app.api.v1.etag import collection_etag, not_modified, tagged
+from app.models.bus import Bus
+
+api = Namespace('fleet', description='Fleet-wide analytics')
+
+
+@api.route('/stats')
+class FleetStats(Resource):
+
+    @api.doc(params={'group_by': 'Comma-separated breakdowns among engine_type, '
+                                 'euro_standard and status (default all three)'})
+    @api.response(200, 'Fleet statistics retrieved successfully')
+    @api.response(400, 'Invalid query parameters')
+    def get(self):
+        """Fleet composition and budget: counts, price, length and capacity totals and averages"""
+        group_by = request.args.get('group_by')
+        tag = collection_etag(Bus)
+        unchanged = not_modified(tag)
+        if unchanged:
+            return unchanged
+        try:
+            if group_by is None:
+                stats = facade.get_fleet_stats()
+            else:
+                stats = facade.get_fleet_stats(tuple(name for name in group_by.split(',') if name))
+        except ValueError as e:
+            return {'error': str(e)}, 400
+        for name, groups in stats.items():
+            if name.startswith('by_'):
+                # JSON object keys are strings, and euro_standard/status are ints.
+                stats[name] = {str(value): summary for value, summary in groups.items()}
+        return stats, 200, tagged(tag)
@@ -0,0 +1,119 @@
+from datetime import datetime
+from flask import request
+from flask_restx import Namespace, Resource, fields
+from app.services import facade
+from app.api.v1.etag import collection_etag, entity_etag, not_modified, tagged
+from app.models.maintenance import Maintenance
+from app.api.v1.pagination import page_args, encode_cursor, MAX_LIMIT
+from app.persistence.schedule import ScheduleConflict
+from app.api.v1.filters import parse_query
+
+api = Namespace('maintenance', description='Maintenance operations')
+
+maintenance_model = api.model('Maintenance', {
+    'bus_id': fields.String(required=True, description='ID of the bus'),
+    'type': fields.String(required=True, description='Type of maintenance'),
+    'start': fields.DateTime(required=True, description='Start of the maintenance (ISO 8601)'),
+    'end': fields.DateTime(required=True, description='End of the maintenance (ISO 8601)'),
+    'technician_id': fields.String(description='ID of the technician in charge')
+})
+
+MAINTENANCE_FIELDS = {'bus_id': str, 'type': str, 'technician_id': str,
+                      'start': datetime.fromisoformat, 'end': datetime.fromisoformat}
+MAX_UPCOMING_DAYS = 366
+
+
+@api.route('/')
+class MaintenanceList(Resource):
+
+    @api.expect(maintenance_model)
+    @api.response(201, 'Maintenance successfully scheduled')
+    @api.response(400, 'Invalid input data')
+    @api.response(409, 'The bus is already booked in that window')
+    def post(self):
+        """Schedule maintenance of a bus"""
+        data = api.payload
+        if not isinstance(data, dict):
+            return {'error': 'Invalid input data'}, 400
+        try:
+            maintenance = facade.create_maintenance({
+                'bus_id': data.get('bus_id'),
+                'type': data.get('type'),
+                'start': data.get('start'),
+                'end': data.get('end'),
+                'technician_id': data.get('technician_id')
+            })
+        except ScheduleConflict as e:
+            return {'error': str(e), 'conflicts': [obj.id for obj in e.conflicts]}, 409
+        except (ValueError, TypeError) as e:
+            return {'error': str(e)}, 400
+        return maintenance.to_dict(), 201
+
+    @api.doc(params={'limit': 'Maximum number of maintenance windows to return',
+                     'cursor': 'Cursor from the previous page',
+                     'bus_id': 'Filter by bus ID'})
+    @api.response(200, 'List of maintenance windows retrieved successfully')
+    @api.response(400, 'Invalid query parameters')
+    def get(self):
+        """Retrieve a page of maintenance windows"""
+        tag = collection_etag(Maintenance)
+        unchanged = not_modified(tag)
+        if unchanged:
+            return unchanged
+        try:
+            limit, after = page_args()
+            filters, order_by = parse_query(MAINTENANCE_FIELDS)
+            windows, next_position = facade.get_maintenance_page(limit, after, filters, order_by)
+        except ValueError as e:
+            return {'error': str(e)}, 400
+        return {
+            'maintenance': [maintenance.to_dict() for maintenance in windows],
+            'next_cursor': encode_cursor(next_position)
+        }, 200, tagged(tag)
+
+
+@api.route('/upcoming')
+class UpcomingMaintenance(Resource):
+
+    @api.doc(params={'days': 'Look-ahead in days (default 7)',
+                     'limit': 'Maximum number of maintenance windows to return'})
+    @api.response(200, 'Maintenance starting in the next days, soonest first')
+    @api.response(400, 'Invalid query parameters')
+    def get(self):
+        """Maintenance across the fleet starting in the next N days"""
+        try:
+            days = float(request.args.get('days', 7))
+            limit = int(request.args.get('limit', MAX_LIMIT))
+        except ValueError:
+            return {'error': 'days and limit must be numbers'}, 400
+        if not 0 < days <= MAX_UPCOMING_DAYS:
+            return {'error': f"days must be between 0 and {MAX_UPCOMING_DAYS}"}, 400
+        if not 1 <= limit <= MAX_LIMIT:
+            return {'error': f"limit must be between 1 and {MAX_LIMIT}"}, 400
+        windows = facade.get_upcoming_maintenance(days, limit)
+        return {'maintenance': [maintenance.to_dict() for maintenance in windows]}, 200
+
+
+@api.route('/<string:maintenance_id>')
+class MaintenanceResource(Resource):
+
+    @api.response(200, 'Maintenance details retrieved successfully')
+    @api.response(404, 'Maintenance not found')
+    def get(self, maintenance_id):
+        """Get maintenance details by ID"""
+        maintenance = facade.get_maintenance(maintenance_id)
+        if not maintenance:
+            return {'error': 'Maintenance not found'}, 404
+        tag = entity_etag(maintenance)
+        unchanged = not_modified(tag)
+        if unchanged:
+            return unchanged
+        return maintenance.to_dict(), 200, tagged(tag)
+
+    @api.response(200, 'Maintenance cancelled successfully')
+    @api.response(404, 'Maintenance not found')
+    def delete(self, maintenance_id):
+        """Cancel a maintenance window"""
+        if not facade.delete_maintenance(maintenance_id):
+            return {'error': 'Maintenance not found'}, 404
+        return {'message': 'Maintenance deleted'}, 200
@@ -0,0 +1,101 @@
+import itertools
+from time import perf_counter
+from flask import Response
+from app.services import facade
+from app.models.base_model import BaseModel
+from app.metrics import REGISTRY
+
+HTTP_SECONDS = REGISTRY.histogram(
+    'http_request_duration_seconds', 'Time to handle a request, by route and status.',
+    ('method', 'route', 'status'))
+
+# Any other method is recorded as 'other', so clients cannot mint label values.
+METHODS = frozenset(('GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS'))
+
+
+def _repository_objects():
+    return {(table,): size for table, (size, _) in facade.repository_stats().items()}
+
+
+def _repository_modifications():
+    return {(table,): count for table, (_, count) in facade.repository_stats().items()}
+
+
+def _cache_requests():
+    values = {}
+    for model, stats in BaseModel.cache_stats().items():
+        values[(model, 'hit')] = stats['hits']
+        values[(model, 'miss')] = stats['misses']
+    return values
+
+
+def _cache_hit_ratio():
+    return {(model,): stats['hits'] / (stats['hits'] + stats['misses'])
+            for model, stats in BaseModel.cache_stats().items()
+            if stats['hits'] + stats['misses']}
+
+
+REGISTRY.callback('repository_objects', 'Objects stored in each repository.',
+                  ('repository',), _repository_objects)
+REGISTRY.callback('repository_modifications_total', 'Writes made through each repository.',
+                  ('repository',), _repository_modifications, kind='counter')
+REGISTRY.callback('serialization_cache_requests_total',
+                  'to_dict calls answered from the serialization cache or rebuilt.',
+                  ('model', 'result'), _cache_requests, kind='counter')
+REGISTRY.callback('serialization_cache_hit_ratio',
+                  'Share of to_dict calls answered from the serialization cache.',
+                  ('model',), _cache_hit_ratio)
+
+
+class RequestTimer:
+    """WSGI middleware timing each request into HTTP_SECONDS.
+
+    The route and status are read when the app calls start_response, from
+    the request Flask keeps in the environ, so no context-local lookup is
+    needed: those cost more than the timing itself. Streamed bodies are
+    timed until the response starts, not until the last chunk. With sample
+    n, one request in n is timed and counted n times (see app.metrics).
+    """
+
+    def __init__(self, wsgi_app, sample=1):
+        self.wsgi_app = wsgi_app
+        self.sample = sample
+        self._ticks = itertools.count()
+        self._observers = {}
+
+    def __call__(self, environ, start_response):
+        if next(self._ticks) % self.sample:
+            return self.wsgi_app(environ, start_response)
+        started = perf_counter()
+        status = route = None
+
+        def capture(status_line, headers, exc_info=None):
+            nonlocal status, route
+            status = status_line[:3]
+            route = matched_route(environ)
+            return start_response(status_line, headers, exc_info)
+
+        body = self.wsgi_app(environ, capture)
+        method = environ['REQUEST_METHOD']
+        key = (method if method in METHODS else 'other', route or 'unmatched', status or '500')
+        observer = self._observers.get(key)
+        if observer is None:
+            observer = self._observers[key] = HTTP_SECONDS.labels(*key).observe
+        observer(perf_counter() - started, self.sample)
+        return body
+
+
+def matched_route(environ):
+    """URL rule of the request Flask is handling in environ, or 'unmatched'.
+
+    Flask drops the request from the environ once it returns the body, so
+    this is for start_response callbacks.
+    """
+    request = environ.get('werkzeug.request')
+    rule = request.url_rule if request is not None else None
+    return rule.rule if rule is not None else 'unmatched'
+
+
+def metrics():
+    """Every metric in the Prometheus text format."""
+    return Response(REGISTRY.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,70 @@
+import base64
+import binascii
+import json
+from datetime import datetime
+from flask import request
+
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 1000
+
+
+def encode_cursor(position):
+    """Turn a repository position, or an ordered page's keyset, into an opaque cursor string."""
+    if position is None:
+        return None
+    if isinstance(position, tuple):
+        raw = 'k' + json.dumps(position, separators=(',', ':'), default=_encode_value)
+    else:
+        raw = f"p{position}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Turn a cursor back into a position or keyset (None for no cursor)."""
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        if raw.startswith('k'):
+            keyset = json.loads(raw[1:], object_hook=_decode_value)
+            if not isinstance(keyset, list) or not keyset or not isinstance(keyset[-1], int):
+                raise ValueError
+            return tuple(keyset)
+        if not raw.startswith('p'):
+            raise ValueError
+        return int(raw[1:])
+    except (ValueError, TypeError, binascii.Error, UnicodeDecodeError):
+        raise ValueError("Invalid cursor")
+
+
+def _encode_value(value):
+    if isinstance(value, datetime):
+        return {'datetime': value.isoformat()}
+    raise TypeError(f"Cannot put {type(value).__name__} in a cursor")
+
+
+def _decode_value(obj):
+    if set(obj) != {'datetime'}:
+        raise ValueError
+    return datetime.fromisoformat(obj['datetime'])
+
+
+def page_args():
+    """Read ?limit= and ?cursor= from the request as (limit, position)."""
+    try:
+        limit = int(request.args.get('limit', DEFAULT_LIMIT))
+    except ValueError:
+        raise ValueError("limit must be an integer")
+    if not 1 <= limit <= MAX_LIMIT:
+        raise ValueError(f"limit must be between 1 and {MAX_LIMIT}")
+    return limit, decode_cursor(request.args.get('cursor'))
+
+
+def offset_args():
+    """Read ?limit= and ?cursor= for an offset-paged listing, as (limit, offset)."""
+    limit, offset = page_args()
+    if offset is None:
+        return limit, 0
+    if not isinstance(offset, int) or offset < 0:
+        raise ValueError("Invalid cursor")
+    return limit, offset
@@ -0,0 +1,170 @@
+import cProfile
+import hmac
+import logging
+import os
+import re
+import threading
+import time
+import uuid
+from collections import Counter
+from time import perf_counter
+
+from app.api.v1.metrics import matched_route
+from app.profiling import Sampler, StackTracer, collapse, write_atomically
+
+FORMATS = ('pstats', 'collapsed')
+# Slow requests need samples to show where their time went. CPU-bound code
+# only yields the GIL every sys.getswitchinterval() (5 ms by default), so
+# shorter intervals are not reached anyway.
+SLOW_SAMPLE_INTERVAL = 0.01
+FLUSH_INTERVAL = 60
+
+logger = logging.getLogger(__name__)
+
+
+class Profiler:
+    """WSGI middleware profiling requests on demand and logging slow ones.
+
+    A request is profiled when it carries ``X-Profile: <token>`` (or every
+    request, with ``profile_all``), under cProfile for 'pstats' or a
+    StackTracer for 'collapsed' (stacks weighted by microseconds, for flame
+    graphs); ``X-Profile-Format`` overrides the default format. The profile
+    is saved in ``directory`` and named in the ``X-Profile-File`` response
+    header.
+
+    With ``sample_interval`` set, every request's stack is also sampled at
+    that rate, and the samples are added up per route in
+    ``directory/sampled.folded``, rewritten every minute. Requests slower
+    than ``slow_ms`` are appended to ``directory/slow.log`` with their
+    samples.
+
+    Only the call into the app is profiled: the body of a streamed
+    response is produced after it returns.
+    """
+
+    def __init__(self, wsgi_app, directory, token=None, profile_all=False, fmt='pstats',
+                 sample_interval=0, slow_ms=0):
+        if fmt not in FORMATS:
+            raise ValueError(f"profile format must be one of {', '.join(FORMATS)}")
+        self.wsgi_app = wsgi_app
+        self.directory = directory
+        self.token = token
+        self.profile_all = profile_all
+        self.format = fmt
+        self.slow_ms = slow_ms
+        if slow_ms and not sample_interval:
+            sample_interval = SLOW_SAMPLE_INTERVAL
+        self.sampler = Sampler(sample_interval).start() if sample_interval else None
+        self.sampled = Counter()
+        self._lock = threading.Lock()
+        self._flushed = time.monotonic()
+        os.makedirs(directory, exist_ok=True)
+
+    @classmethod
+    def from_config(cls, wsgi_app, config):
+        return cls(wsgi_app, config.PROFILE_DIR, token=config.PROFILE_TOKEN,
+                   profile_all=config.PROFILE_ALL, fmt=config.PROFILE_FORMAT,
+                   sample_interval=config.PROFILE_SAMPLE_MS / 1000,
+                   slow_ms=config.SLOW_REQUEST_MS)
+
+    def __call__(self, environ, start_response):
+        fmt = self._requested_format(environ)
+        if fmt is not None:
+            return self._profile(environ, start_response, fmt)
+        if self.sampler is None:
+            return self.wsgi_app(environ, start_response)
+
+        ident = threading.get_ident()
+        trace = self.sampler.watch(ident, Profiler.__call__.__code__)
+        route = status = None
+
+        def capture(status_line, headers, exc_info=None):
+            nonlocal route, status
+            route = matched_route(environ)
+            status = status_line[:3]
+            return start_response(status_line, headers, exc_info)
+
+        started = perf_counter()
+        try:
+            return self.wsgi_app(environ, capture)
+        finally:
+            elapsed_ms = (perf_counter() - started) * 1000
+            self.sampler.unwatch(ident)
+            root = f"{environ['REQUEST_METHOD']} {route or 'unmatched'}"
+            with self._lock:
+                for stack, count in trace.items():
+                    self.sampled[(root,) + stack] += count
+                # Claimed under the lock, so one request flushes per interval.
+                due = time.monotonic() - self._flushed >= FLUSH_INTERVAL
+                if due:
+                    self._flushed = time.monotonic()
+            if self.slow_ms and elapsed_ms >= self.slow_ms:
+                self._log_slow(environ, root, status or '500', elapsed_ms, trace)
+            if due:
+                self.flush()
+
+    def _requested_format(self, environ):
+        if not self.profile_all:
+            supplied = environ.get('HTTP_X_PROFILE')
+            if not supplied or not self.token or not hmac.compare_digest(
+                    supplied.encode('latin-1'), self.token.encode()):
+                return None
+        fmt = environ.get('HTTP_X_PROFILE_FORMAT', self.format)
+        return fmt if fmt in FORMATS else self.format
+
+    def _profile(self, environ, start_response, fmt):
+        name = self._file_name(environ, 'prof' if fmt == 'pstats' else 'folded')
+
+        def tagged(status_line, headers, exc_info=None):
+            return start_response(status_line, list(headers) + [('X-Profile-File', name)], exc_info)
+
+        path = os.path.join(self.directory, name)
+        if fmt == 'pstats':
+            profile = cProfile.Profile()
+            profile.enable()
+            try:
+                return self.wsgi_app(environ, tagged)
+            finally:
+                profile.disable()
+                profile.dump_stats(path)
+
+        tracer = StackTracer()
+        try:
+            with tracer:
+                return self.wsgi_app(environ, tagged)
+        finally:
+            write_atomically(path, ''.join(line + '\n' for line in collapse(tracer.stacks)))
+
+    def _file_name(self, environ, extension):
+        path = re.sub(r'[^A-Za-z0-9]+', '_', environ.get('PATH_INFO', '')).strip('_')[:60]
+        return (f"{time.strftime('%Y%m%dT%H%M%S')}-{environ['REQUEST_METHOD']}-{path}"
+                f"-{uuid.uuid4().hex[:8]}.{extension}")
+
+    def _log_slow(self, environ, root, status, elapsed_ms, trace):
+        query = environ.get('QUERY_STRING')
+        url = environ.get('PATH_INFO', '') + (f"?{query}" if query else '')
+        lines = [f"{time.strftime('%Y-%m-%dT%H:%M:%S')} {root} {status} {elapsed_ms:.1f} ms {url}"]
+        lines += [f"    {line}" for line in collapse(trace)] or ["    (no samples)"]
+        path = os.path.join(self.directory, 'slow.log')
+        try:
+            with self._lock, open(path, 'a') as log:
+                log.write('\n'.join(lines) + '\n')
+        except OSError:
+            # Called as the request finishes: losing the entry beats failing it.
+            logger.exception("Could not append to %s", path)
+
+    def flush(self):
+        """Rewrite sampled.folded with every sample taken so far."""
+        with self._lock:
+            self._flushed = time.monotonic()
+            text = ''.join(line + '\n' for line in collapse(self.sampled))
+        path = os.path.join(self.directory, 'sampled.folded')
+        try:
+            write_atomically(path, text)
+        except OSError:
+            logger.exception("Could not write %s", path)
+
+    def close(self):
+        if self.sampler is not None:
+            self.sampler.stop()
+            self.flush()
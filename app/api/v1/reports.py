@@ -1,5 +1,13 @@
+from flask import request
 from flask_restx import Namespace, Resource, fields
 from app.services import facade
+from app.api.v1.etag import collection_etag, entity_etag, not_modified, tagged
+from app.models.report import Report
+from app.api.v1.pagination import page_args, offset_args, encode_cursor
+from app.api.v1.streaming import stream_format, stream_collection
+from app.api.v1.bulk import bulk_items, bulk_response
+from app.api.v1.filters import parse_query
+from app.persistence.text import tokenize
 
 api = Namespace('reports', description='Report operations')
 
@@ -7,6 +15,8 @@ report_model = api.model('Report', {
     'comment': fields.String(required=True, description='Comment of the report')
 })
 
+REPORT_FIELDS = {'comment': str}
+
 @api.route('/')
 class ReportList(Resource):
     @api.expect(report_model)
@@ -25,11 +35,87 @@ class ReportList(Resource):
             return {'error': 'Invalid input data'}, 400
         return new_report.to_dict(), 201
 
+    @api.doc(params={'limit': 'Maximum number of reports to return',
+                     'cursor': 'Cursor from the previous page',
+                     'comment__prefix': 'Filter by the start of the comment',
+                     'order_by': 'Comma-separated fields, prefixed with - for descending',
+                     'stream': 'Stream the whole collection as json or ndjson'})
     @api.response(200, 'List of reports retrieved successfully')
+    @api.response(400, 'Invalid query parameters')
+    def get(self):
+        """Retrieve a page of reports"""
+        tag = collection_etag(Report)
+        unchanged = not_modified(tag)
+        if unchanged:
+            return unchanged
+        try:
+            limit, after = page_args()
+            fmt = stream_format()
+            filters, order_by = parse_query(REPORT_FIELDS)
+            if not fmt:
+                reports, next_position = facade.get_reports_page(limit, after, filters, order_by)
+        except ValueError as e:
+            return {'error': str(e)}, 400
+        if fmt:
+            return stream_collection(facade.iter_reports(filters),
+                                     lambda chunk: [report.to_dict() for report in chunk],
+                                     fmt, 'reports')
+        return {
+            'reports': [report.to_dict() for report in reports],
+            'next_cursor': encode_cursor(next_position)
+        }, 200, tagged(tag)
+
+@api.route('/search')
+class ReportSearch(Resource):
+    @api.doc(params={'q': 'Words to look for; each must match a word of the comment '
+                          'or the start of one, ignoring case and accents',
+                     'limit': 'Maximum number of reports to return',
+                     'cursor': 'Cursor from the previous page'})
+    @api.response(200, 'Matching reports, best match first')
+    @api.response(400, 'Invalid query parameters')
     def get(self):
-        """Retrieve a list of all reports"""
-        reports = facade.get_all_reports()
-        return [report.to_dict() for report in reports]
+        """Full-text search over report comments"""
+        q = request.args.get('q', '')
+        if not tokenize(q):
+            return {'error': 'q must contain at least one word'}, 400
+        tag = collection_etag(Report)
+        unchanged = not_modified(tag)
+        if unchanged:
+            return unchanged
+        try:
+            limit, offset = offset_args()
+        except ValueError as e:
+            return {'error': str(e)}, 400
+        results, more = facade.search_reports(q, limit, offset)
+        return {
+            'reports': [dict(report.to_dict(), score=round(score, 4)) for report, score in results],
+            'next_cursor': encode_cursor(offset + limit) if more else None
+        }, 200, tagged(tag)
+
+@api.route('/bulk')
+class ReportBulk(Resource):
+    @api.expect([report_model])
+    @api.response(201, 'Every report created')
+    @api.response(207, 'Some items failed, see the per-item results')
+    @api.response(400, 'Invalid input data')
+    def post(self):
+        """Create a batch of reports"""
+        try:
+            items = bulk_items()
+        except ValueError as e:
+            return {'error': str(e)}, 400
+        return bulk_response(facade.create_reports_many(items), 201)
+
+    @api.response(200, 'Every report updated')
+    @api.response(207, 'Some items failed, see the per-item results')
+    @api.response(400, 'Invalid input data')
+    def put(self):
+        """Update a batch of reports, each item carrying its id"""
+        try:
+            items = bulk_items()
+        except ValueError as e:
+            return {'error': str(e)}, 400
+        return bulk_response(facade.update_reports_many(items), 200)
 
 @api.route('/<string:report_id>')
 class ReportResource(Resource):
@@ -40,7 +126,11 @@ class ReportResource(Resource):
         report = facade.get_report(report_id)
         if not report:
             return {'error': 'Report not found'}, 404
-        return report.to_dict(), 200
+        tag = entity_etag(report)
+        unchanged = not_modified(tag)
+        if unchanged:
+            return unchanged
+        return report.to_dict(), 200, tagged(tag)
 
     @api.expect(report_model)
     @api.response(200, 'Report updated successfully')
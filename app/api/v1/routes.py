@@ -1,5 +1,9 @@
 from flask_restx import Namespace, Resource, fields
 from app.services import facade
+from app.api.v1.etag import collection_etag, entity_etag, not_modified, tagged
+from app.models.route import Route
+from app.api.v1.pagination import page_args, encode_cursor
+from app.api.v1.filters import parse_query
 
 api = Namespace('routes', description='Route operations')
 
@@ -11,6 +15,8 @@ route_model = api.model('Route', {
     'bus_id': fields.List(fields.String, required=True, description='List of bus IDs')
 })
 
+ROUTE_FIELDS = {'route_number': str, 'name': str, 'user_id': str}
+
 @api.route('/')
 class RouteList(Resource):
 
@@ -40,42 +46,54 @@ class RouteList(Resource):
             return {'error': 'bus_id must be a non-empty list of bus IDs'}, 400
 
         # Create route
-        new_route = facade.create_route({
-            'route_number': route_number,
-            'name': name,
-            'user_id': user_id,
-            'bus_id': bus_id
-        })
-
-        if not new_route:
-            if not facade.get_user(user_id):
-                return {'error': 'User not found'}, 400
-            # bus_id is a list → check each bus
-            for b in bus_id:
-                if not facade.get_bus(b):
-                    return {'error': f'Bus not found: {b}'}, 400
-            return {'error': 'Could not create route'}, 400
+        try:
+            new_route = facade.create_route({
+                'route_number': route_number,
+                'name': name,
+                'user_id': user_id,
+                'bus_id': bus_id
+            })
+        except (ValueError, TypeError) as e:
+            return {'error': str(e)}, 400
 
         return {
             'id': new_route.id,
             'route_number': new_route.route_number,
             'name': new_route.name,
             'user_id': new_route.user_id,
-            'bus_id': new_route.bus_id
+            'bus_id': new_route.bus_ids
         }, 201
 
+    @api.doc(params={'limit': 'Maximum number of routes to return',
+                     'cursor': 'Cursor from the previous page',
+                     'route_number': 'Filter by route_number, name or user_id, '
+                                     'with __in or __prefix lookups',
+                     'order_by': 'Comma-separated fields, prefixed with - for descending'})
     @api.response(200, 'List of routes retrieved successfully')
+    @api.response(400, 'Invalid query parameters')
     def get(self):
-        """Retrieve a list of all routes"""
-        routes = facade.get_all_routes()
-        return [
-            {
-                'id': route.id,
-                'route_number': route.route_number,
-                'name': route.name
-            }
-            for route in routes
-        ], 200
+        """Retrieve a page of routes"""
+        tag = collection_etag(Route)
+        unchanged = not_modified(tag)
+        if unchanged:
+            return unchanged
+        try:
+            limit, after = page_args()
+            filters, order_by = parse_query(ROUTE_FIELDS)
+            routes, next_position = facade.get_routes_page(limit, after, filters, order_by)
+        except ValueError as e:
+            return {'error': str(e)}, 400
+        return {
+            'routes': [
+                {
+                    'id': route.id,
+                    'route_number': route.route_number,
+                    'name': route.name
+                }
+                for route in routes
+            ],
+            'next_cursor': encode_cursor(next_position)
+        }, 200, tagged(tag)
 
 
 @api.route('/<route_id>')
@@ -88,14 +106,18 @@ class RouteResource(Resource):
         route = facade.get_route(route_id)
         if not route:
             return {'error': 'Route not found'}, 404
+        tag = entity_etag(route)
+        unchanged = not_modified(tag)
+        if unchanged:
+            return unchanged
 
         return {
             'id': route.id,
             'route_number': route.route_number,
             'name': route.name,
             'user_id': route.user_id,
-            'bus_id': route.bus_id
-        }, 200
+            'bus_id': route.bus_ids
+        }, 200, tagged(tag)
 
     @api.expect(route_model)
     @api.response(200, 'Route updated successfully')
@@ -117,11 +139,15 @@ class RouteResource(Resource):
             if not isinstance(data_route['bus_id'], list) or not data_route['bus_id']:
                 return {'error': 'bus_id must be a non-empty list of bus IDs'}, 400
 
-        updated_route = facade.update_route(route_id, data_route)
+        if not facade.get_route(route_id):
+            return {'error': 'Route not found'}, 404
+
+        try:
+            updated_route = facade.update_route(route_id, data_route)
+        except (ValueError, TypeError) as e:
+            return {'error': str(e)}, 400
 
         if not updated_route:
-            if not facade.get_route(route_id):
-                return {'error': 'Route not found'}, 404
             return {'error': 'Invalid input data'}, 400
 
         return {'message': 'Route updated successfully'}, 200
@@ -158,3 +184,15 @@ class BusRouteList(Resource):
             }
             for route in bus_routes
         ], 200
+
+
+@api.route('/<route_id>/buses')
+class RouteBusList(Resource):
+
+    @api.response(200, 'List of buses for the route retrieved successfully')
+    @api.response(404, 'Route not found')
+    def get(self, route_id):
+        if not facade.get_route(route_id):
+            return {'error': 'Route not found'}, 404
+
+        return [bus.to_dict() for bus in facade.get_buses_by_route(route_id)], 200
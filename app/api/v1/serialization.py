@@ -0,0 +1,90 @@
+"""JSON encoding of API responses, pluggable between encoders.
+
+``orjson`` is used when installed: it encodes in C, several times faster
+than the stdlib, and writes datetime objects itself. Without it the stdlib
+encoder is used, with a fallback that writes datetimes the same way, so
+handlers can return datetimes whichever encoder is active. Both write NaN
+and infinities as null. Their bodies decode to the same values but are not
+always byte for byte equal: they spell some floats differently (1e+16
+against 1e16).
+
+Each app picks its encoder once, in ``app.config['JSON_DUMPS']``.
+"""
+import json
+import math
+from datetime import date, datetime
+
+from flask import current_app, has_app_context, make_response
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - depends on the environment
+    orjson = None
+
+
+def _default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"Object of type {value.__class__.__name__} is not JSON serializable")
+
+
+def _finite(data):
+    """Copy of data with NaN and infinities replaced by None."""
+    if isinstance(data, float):
+        return data if math.isfinite(data) else None
+    if isinstance(data, dict):
+        return {key: _finite(value) for key, value in data.items()}
+    if isinstance(data, (list, tuple)):
+        return [_finite(value) for value in data]
+    return data
+
+
+def _stdlib_dumps(data):
+    try:
+        return json.dumps(data, default=_default, ensure_ascii=False, separators=(',', ':'),
+                          allow_nan=False).encode()
+    except ValueError:
+        # Non-finite floats, rare enough to pay for a copy; NaN is not JSON.
+        return json.dumps(_finite(data), default=_default, ensure_ascii=False,
+                          separators=(',', ':'), allow_nan=False).encode()
+
+
+def _orjson_dumps(data):
+    return orjson.dumps(data, option=orjson.OPT_NON_STR_KEYS)
+
+
+ENCODERS = {'json': _stdlib_dumps}
+if orjson is not None:
+    ENCODERS['orjson'] = _orjson_dumps
+
+_fastest = ENCODERS.get('orjson', _stdlib_dumps)
+
+
+def get_encoder(name):
+    """The encoder called name; 'auto' picks the fastest one installed."""
+    if name == 'auto':
+        return _fastest
+    if name not in ENCODERS:
+        raise ValueError(f"JSON encoder '{name}' is not available "
+                         f"(choose from auto, {', '.join(ENCODERS)})")
+    return ENCODERS[name]
+
+
+def app_encoder():
+    """The current app's encoder, or the fastest installed outside an app."""
+    if has_app_context():
+        return current_app.config.get('JSON_DUMPS', _fastest)
+    return _fastest
+
+
+def dumps(data):
+    """Encode data as compact JSON bytes with the current app's encoder."""
+    return app_encoder()(data)
+
+
+def output_json(data, code, headers=None):
+    """flask-restx representation for application/json using the app's encoder."""
+    response = make_response(dumps(data), code)
+    response.headers.extend(headers or {})
+    response.mimetype = 'application/json'
+    return response
@@ -0,0 +1,48 @@
+from itertools import islice
+from flask import Response, request, stream_with_context
+from app.api.v1.serialization import app_encoder
+
+STREAM_FORMATS = ('json', 'ndjson')
+CHUNK_SIZE = 256
+
+
+def stream_format():
+    """Return the format requested with ?stream=, or None for a normal response."""
+    fmt = request.args.get('stream')
+    if fmt is None:
+        return None
+    if fmt not in STREAM_FORMATS:
+        raise ValueError(f"stream must be one of {', '.join(STREAM_FORMATS)}")
+    return fmt
+
+
+def stream_collection(items, serialize_chunk, fmt, key):
+    """Stream an iterable of entities as a JSON object or as NDJSON lines.
+
+    Entities are pulled from ``items`` and serialized ``CHUNK_SIZE`` at a
+    time by ``serialize_chunk`` (a list of entities to a list of dicts), so
+    memory stays flat however large the collection is. The JSON form is
+    ``{key: [...]}``, matching the non-streamed body without the cursor.
+    """
+    dumps = app_encoder()
+
+    def generate():
+        iterator = iter(items)
+        first = True
+        if fmt == 'json':
+            yield f'{{"{key}": ['.encode()
+        while True:
+            chunk = list(islice(iterator, CHUNK_SIZE))
+            if not chunk:
+                break
+            encoded = [dumps(entry) for entry in serialize_chunk(chunk)]
+            if fmt == 'ndjson':
+                yield b'\n'.join(encoded) + b'\n'
+            else:
+                yield (b'' if first else b',') + b','.join(encoded)
+            first = False
+        if fmt == 'json':
+            yield b']}'
+
+    mimetype = 'application/x-ndjson' if fmt == 'ndjson' else 'application/json'
+    return Response(stream_with_context(generate()), mimetype=mimetype)
@@ -1,5 +1,10 @@
 from flask_restx import Namespace, Resource, fields
 from app.services import facade
+from app.api.v1.etag import collection_etag, entity_etag, not_modified, tagged
+from app.models.user import User
+from app.api.v1.pagination import page_args, encode_cursor
+from app.api.v1.bulk import bulk_items, bulk_response
+from app.api.v1.filters import parse_query
 
 api = Namespace('users', description='User operations')
 
@@ -10,6 +15,8 @@ user_model = api.model('User', {
     'email': fields.String(required=True, description='Email of the user')
 })
 
+USER_FIELDS = {'first_name': str, 'last_name': str, 'email': str}
+
 @api.route('/')
 class UserList(Resource):
     @api.expect(user_model, validate=True)
@@ -33,15 +40,58 @@ class UserList(Resource):
         except ValueError as e:
             return {'error': str(e)}, 400
         
+    @api.doc(params={'limit': 'Maximum number of users to return',
+                     'cursor': 'Cursor from the previous page',
+                     'email': 'Filter by first_name, last_name or email, '
+                              'with __in or __prefix lookups',
+                     'order_by': 'Comma-separated fields, prefixed with - for descending'})
+    @api.response(400, 'Invalid query parameters')
     def get(self):
-        """Retrive the list of all users"""
-        users = facade.get_all_users()
-        return [{
-            'id': user.id,
-            'first_name': user.first_name,
-            'last_name': user.last_name,
-            'email': user.email
-        } for user in users], 200
+        """Retrive a page of users"""
+        tag = collection_etag(User)
+        unchanged = not_modified(tag)
+        if unchanged:
+            return unchanged
+        try:
+            limit, after = page_args()
+            filters, order_by = parse_query(USER_FIELDS)
+            users, next_position = facade.get_users_page(limit, after, filters, order_by)
+        except ValueError as e:
+            return {'error': str(e)}, 400
+        return {
+            'users': [{
+                'id': user.id,
+                'first_name': user.first_name,
+                'last_name': user.last_name,
+                'email': user.email
+            } for user in users],
+            'next_cursor': encode_cursor(next_position)
+        }, 200, tagged(tag)
+
+@api.route('/bulk')
+class UserBulk(Resource):
+    @api.expect([user_model])
+    @api.response(201, 'Every user created')
+    @api.response(207, 'Some items failed, see the per-item results')
+    @api.response(400, 'Invalid input data')
+    def post(self):
+        """Register a batch of users"""
+        try:
+            items = bulk_items()
+        except ValueError as e:
+            return {'error': str(e)}, 400
+        return bulk_response(facade.create_users_many(items), 201)
+
+    @api.response(200, 'Every user updated')
+    @api.response(207, 'Some items failed, see the per-item results')
+    @api.response(400, 'Invalid input data')
+    def put(self):
+        """Update a batch of users, each item carrying its id"""
+        try:
+            items = bulk_items()
+        except ValueError as e:
+            return {'error': str(e)}, 400
+        return bulk_response(facade.update_users_many(items), 200)
 
 @api.route('/<string:user_id>')
 class UserResource(Resource):
@@ -53,12 +103,16 @@ class UserResource(Resource):
             user = facade.get_user(user_id)
             if user is None:
                 return {'error': 'User not found'}, 404
+            tag = entity_etag(user)
+            unchanged = not_modified(tag)
+            if unchanged:
+                return unchanged
             return {
                 'id': user.id,
                 'first_name': user.first_name,
                 'last_name': user.last_name,
                 'email': user.email
-            }, 200
+            }, 200, tagged(tag)
         except ValueError as e:
             return {'error': str(e)}, 404
 
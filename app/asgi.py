@@ -0,0 +1,263 @@
+"""ASGI serving of the API, for many concurrent connections per process.
+
+Dashboards poll a handful of read endpoints from many connections at
+once. Those are answered here by coroutines on an AsyncFacade, so a
+request waiting on a blocking backend holds a suspended coroutine rather
+than a thread, and its independent lookups (a bus's owner and reports)
+run concurrently. They answer exactly as their Flask counterparts do,
+with the same bodies, ETags and compression, but are not timed in
+/metrics or profiled.
+
+Every other request goes to the Flask app through WsgiBridge, on a pool
+of ``ASGI_THREADS`` threads that also runs the calls of blocking
+backends.
+"""
+import asyncio
+import io
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs
+
+from werkzeug.exceptions import HTTPException
+from werkzeug.http import parse_accept_header, parse_etags, quote_etag
+
+from config import config
+from app import create_app
+from app.api.v1.buses import EXPANDABLE, embed_relations
+from app.api.v1.compression import CODINGS, COMPRESS_LEVEL, COMPRESS_MIN_SIZE, coded_etag, compress
+from app.api.v1.etag import entity_etag, matched_etag
+from app.services import facade
+from app.services.async_facade import BLOCKING_BACKENDS, AsyncFacade
+
+_DONE = object()
+
+
+class Request:
+    """What native handlers read from an ASGI HTTP scope."""
+
+    def __init__(self, scope):
+        self.headers = {}
+        for name, value in scope['headers']:
+            name = name.decode('latin-1').lower()
+            value = value.decode('latin-1')
+            self.headers[name] = f"{self.headers[name]}, {value}" if name in self.headers else value
+        self.args = parse_qs(scope['query_string'].decode('latin-1'))
+
+    def arg(self, name, default=''):
+        values = self.args.get(name)
+        return values[0] if values else default
+
+
+async def get_user(api, request, user_id):
+    user = await api.get_user(user_id)
+    if user is None:
+        return 404, {'error': 'User not found'}, None
+    return 200, lambda: {'id': user.id, 'first_name': user.first_name,
+                         'last_name': user.last_name, 'email': user.email}, entity_etag(user)
+
+
+async def get_report(api, request, report_id):
+    report = await api.get_report(report_id)
+    if not report:
+        return 404, {'error': 'Report not found'}, None
+    return 200, report.to_dict, entity_etag(report)
+
+
+async def get_bus(api, request, bus_id):
+    bus = await api.get_bus(bus_id)
+    if not bus:
+        return 404, {'error': 'Bus not found'}, None
+    expand = tuple(name for name in request.arg('expand').split(',') if name in EXPANDABLE)
+    if not expand:
+        return 200, bus.to_dict, entity_etag(bus, variant=expand)
+    relations = (await api.hydrate_buses([bus], expand))[bus.id]
+    related = [obj for obj in [relations.get('owner')] + relations.get('reports', []) if obj]
+    return 200, lambda: embed_relations(bus, relations), entity_etag(bus, *related, variant=expand)
+
+
+async def get_route(api, request, route_id):
+    route = await api.get_route(route_id)
+    if not route:
+        return 404, {'error': 'Route not found'}, None
+    return 200, lambda: {'id': route.id, 'route_number': route.route_number, 'name': route.name,
+                         'user_id': route.user_id, 'bus_id': route.bus_ids}, entity_etag(route)
+
+
+async def get_bus_routes(api, request, bus_id):
+    if not await api.get_bus(bus_id):
+        return 404, {'error': 'Bus not found'}, None
+    routes = await api.get_routes_by_bus(bus_id)
+    return 200, [{'id': route.id, 'route_number': route.route_number, 'name': route.name}
+                 for route in routes], None
+
+
+# GET endpoints served natively, by the Flask endpoint they stand in for:
+# paths are matched against the Flask app's own URL map.
+NATIVE = {
+    'users_user_resource': get_user,
+    'reports_report_resource': get_report,
+    'buses_bus_resource': get_bus,
+    'routes_route_resource': get_route,
+    'routes_bus_route_list': get_bus_routes,
+}
+
+
+class AsgiApp:
+    def __init__(self, flask_app, api, executor, compress_min_size=COMPRESS_MIN_SIZE,
+                 compress_level=COMPRESS_LEVEL):
+        self.api = api
+        self.executor = executor
+        self.bridge = WsgiBridge(flask_app, executor)
+        self.dumps = flask_app.config['JSON_DUMPS']
+        self.urls = flask_app.url_map.bind('localhost')
+        self.compress_min_size = compress_min_size
+        self.compress_level = compress_level
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            return await self._lifespan(receive, send)
+        if scope['type'] != 'http':
+            raise ValueError(f"unsupported ASGI scope type {scope['type']!r}")
+        if scope['method'] == 'GET':
+            try:
+                endpoint, args = self.urls.match(scope['path'][len(scope.get('root_path', '')):], 'GET')
+            except HTTPException:
+                # Not found, redirects to add a slash: Flask answers those.
+                endpoint = None
+            handler = NATIVE.get(endpoint)
+            if handler is not None:
+                request = Request(scope)
+                status, body, tag = await handler(self.api, request, **args)
+                return await self._respond(send, request, status, body, tag)
+        await self.bridge(scope, receive, send)
+
+    async def _respond(self, send, request, status, body, tag):
+        """Send body, or a bare 304 when If-None-Match holds tag.
+
+        body may be a callable, called only when the body is needed.
+        """
+        matched = tag and matched_etag(parse_etags(request.headers.get('if-none-match')), tag)
+        if matched:
+            await send({'type': 'http.response.start', 'status': 304,
+                        'headers': [(b'etag', quote_etag(matched).encode())]})
+            await send({'type': 'http.response.body', 'body': b''})
+            return
+        data = self.dumps(body() if callable(body) else body)
+        headers = [(b'content-type', b'application/json'), (b'vary', b'Accept-Encoding')]
+        if len(data) >= self.compress_min_size:
+            coding = parse_accept_header(request.headers.get('accept-encoding')).best_match(CODINGS)
+            if coding is not None:
+                data = compress(data, coding, self.compress_level)
+                headers.append((b'content-encoding', coding.encode()))
+                if tag is not None:
+                    tag = coded_etag(tag, coding)
+        if tag is not None:
+            headers.append((b'etag', quote_etag(tag).encode()))
+        headers.append((b'content-length', str(len(data)).encode()))
+        await send({'type': 'http.response.start', 'status': status, 'headers': headers})
+        await send({'type': 'http.response.body', 'body': data})
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                self.executor.shutdown()
+                self.api.facade.close()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+
+class WsgiBridge:
+    """ASGI app running a WSGI app on executor threads.
+
+    The request body is read whole before the app is called; the response
+    is sent as the app's iterable yields it, so streamed responses stay
+    streamed.
+    """
+
+    def __init__(self, wsgi_app, executor):
+        self.wsgi_app = wsgi_app
+        self.executor = executor
+
+    async def __call__(self, scope, receive, send):
+        body = bytearray()
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                return
+            body += message.get('body', b'')
+            if not message.get('more_body'):
+                break
+
+        started = []
+
+        def start_response(status, headers, exc_info=None):
+            started[:] = [int(status[:3]), [(name.lower().encode('latin-1'), value.encode('latin-1'))
+                                            for name, value in headers]]
+
+        loop = asyncio.get_running_loop()
+        chunks = await loop.run_in_executor(self.executor, self.wsgi_app,
+                                            wsgi_environ(scope, bytes(body)), start_response)
+        try:
+            iterator = iter(chunks)
+            # start_response may wait for the first chunk, as generators do.
+            chunk = await loop.run_in_executor(self.executor, next, iterator, _DONE)
+            await send({'type': 'http.response.start', 'status': started[0], 'headers': started[1]})
+            while chunk is not _DONE:
+                if chunk:
+                    await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+                chunk = await loop.run_in_executor(self.executor, next, iterator, _DONE)
+            await send({'type': 'http.response.body', 'body': b''})
+        finally:
+            close = getattr(chunks, 'close', None)
+            if close is not None:
+                await loop.run_in_executor(self.executor, close)
+
+
+def wsgi_environ(scope, body):
+    """WSGI environ of an ASGI HTTP scope, with body as wsgi.input."""
+    root_path = scope.get('root_path', '')
+    path = scope['path']
+    if root_path and path.startswith(root_path):
+        path = path[len(root_path):]
+    server = scope.get('server') or ('localhost', 80)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': root_path.encode().decode('latin-1'),
+        'PATH_INFO': path.encode().decode('latin-1'),
+        'QUERY_STRING': scope['query_string'].decode('latin-1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1] or 80),
+        'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': False,
+        'wsgi.run_once': False,
+    }
+    if scope.get('client'):
+        environ['REMOTE_ADDR'], environ['REMOTE_PORT'] = scope['client'][0], str(scope['client'][1])
+    for name, value in scope['headers']:
+        key = name.decode('latin-1').upper().replace('-', '_')
+        if key not in ('CONTENT_TYPE', 'CONTENT_LENGTH'):
+            key = f"HTTP_{key}"
+        value = value.decode('latin-1')
+        environ[key] = f"{environ[key]},{value}" if key in environ else value
+    # The server has already decoded any chunked body, read here whole.
+    environ.pop('HTTP_TRANSFER_ENCODING', None)
+    environ['CONTENT_LENGTH'] = str(len(body))
+    return environ
+
+
+def create_asgi_app():
+    settings = config[os.getenv('FLASK_CONFIG', 'default')]
+    app = create_app()
+    executor = ThreadPoolExecutor(settings.ASGI_THREADS, thread_name_prefix='asgi')
+    api = AsyncFacade(facade, executor if facade.backend in BLOCKING_BACKENDS else None)
+    return AsgiApp(app, api, executor, compress_min_size=settings.COMPRESS_MIN_SIZE,
+                   compress_level=settings.COMPRESS_LEVEL)
@@ -0,0 +1,249 @@
+"""In-process metrics rendered in the Prometheus text format.
+
+Histograms are sharded per thread: each thread updates its own counters
+without taking a lock, and a scrape sums them. A thread only takes the
+histogram's lock the first time it records a given label set. Counters of
+threads that have exited are folded together, so a server starting a
+thread per request does not keep one set of counters per request.
+
+Timers may sample: with ``sample`` n, one call in n reads the clock and
+is recorded with a weight of n, so counts and sums stay right on average
+while the other calls only pay for a counter.
+
+Figures the application already keeps (sizes, cache counters) are read
+from a callback at scrape time instead.
+"""
+import functools
+import inspect
+import itertools
+import threading
+from bisect import bisect_left
+from time import perf_counter
+
+# Upper bounds in seconds, from 50 microseconds (a cached read) to 10 seconds.
+LATENCY_BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005,
+                   0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Fold exited threads' shards once this many shards exist.
+_MAX_SHARDS = 64
+
+
+class Histogram:
+    """Observations counted into cumulative ``le`` buckets, with their sum.
+
+    Each thread keeps one cell per label set: a count per bucket (the last
+    for values above every bound) followed by the sum of the values.
+    """
+
+    kind = 'histogram'
+
+    def __init__(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._children = {}
+        self._shards = []
+        self._retired = {}
+
+    def labels(self, *values):
+        """The observer for one label set; hold on to it on hot paths."""
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(values, _Child(self, values))
+        return child
+
+    def observe(self, value, labels=(), weight=1):
+        self.labels(*labels).observe(value, weight)
+
+    def _register(self, labels):
+        """A new cell for the calling thread."""
+        cell = [0] * (len(self.buckets) + 1) + [0.0]
+        with self._lock:
+            self._shards.append((threading.current_thread(), labels, cell))
+            if len(self._shards) > _MAX_SHARDS:
+                self._fold()
+        return cell
+
+    def _fold(self):
+        live = []
+        for shard in self._shards:
+            thread, labels, cell = shard
+            if thread.is_alive():
+                live.append(shard)
+            else:
+                _add(self._retired, labels, cell)
+        self._shards = live
+
+    def collect(self):
+        """Sum of every thread's cells: {label values: cell}."""
+        with self._lock:
+            self._fold()
+            totals = {labels: list(cell) for labels, cell in self._retired.items()}
+            for _, labels, cell in self._shards:
+                _add(totals, labels, cell)
+        return totals
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for labels, cell in sorted(self.collect().items()):
+            lines.extend(self._samples(dict(zip(self.labelnames, labels)), cell))
+        return lines
+
+    def _samples(self, labels, cell):
+        cumulative = 0
+        for bound, count in zip(self.buckets + ('+Inf',), cell):
+            cumulative += count
+            yield f"{self.name}_bucket{_labels(dict(labels, le=_number(bound)))} {cumulative}"
+        yield f"{self.name}_sum{_labels(labels)} {_number(cell[-1])}"
+        yield f"{self.name}_count{_labels(labels)} {cumulative}"
+
+
+class _Child:
+    """One label set of a histogram, with the calling thread's cell at hand."""
+
+    __slots__ = ('_histogram', '_labels', '_buckets', '_local')
+
+    def __init__(self, histogram, labels):
+        self._histogram = histogram
+        self._labels = labels
+        self._buckets = histogram.buckets
+        self._local = threading.local()
+
+    def observe(self, value, weight=1):
+        """Count value weight times, as if it had been seen that often."""
+        try:
+            cell = self._local.cell
+        except AttributeError:
+            cell = self._local.cell = self._histogram._register(self._labels)
+        cell[bisect_left(self._buckets, value)] += weight
+        cell[-1] += value * weight
+
+
+class Callback:
+    """Values read at scrape time: ``read`` returns {label values: number}.
+
+    ``kind`` is 'gauge', or 'counter' for totals kept elsewhere that only grow.
+    """
+
+    def __init__(self, name, help, labelnames, read, kind='gauge'):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.read = read
+        self.kind = kind
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for labels, value in sorted(self.read().items()):
+            lines.append(f"{self.name}{_labels(dict(zip(self.labelnames, labels)))} {_number(value)}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+
+    def register(self, metric):
+        """Add metric, or return the one already registered under its name."""
+        return self._metrics.setdefault(metric.name, metric)
+
+    def histogram(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self.register(Histogram(name, help, labelnames, buckets))
+
+    def callback(self, name, help, labelnames, read, kind='gauge'):
+        return self.register(Callback(name, help, labelnames, read, kind))
+
+    def render(self):
+        """Every metric in the Prometheus text exposition format (0.0.4)."""
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+FACADE_SECONDS = REGISTRY.histogram(
+    'facade_call_duration_seconds', 'Time spent in Facade methods.', ('method',))
+REPOSITORY_SECONDS = REGISTRY.histogram(
+    'repository_operation_duration_seconds', 'Time spent in repository operations.',
+    ('repository', 'operation'))
+
+REPOSITORY_OPERATIONS = ('add', 'add_many', 'get', 'get_many', 'get_all', 'update', 'delete',
+                         'get_by_attribute', 'get_all_by_attribute', 'page')
+
+
+def timed(histogram, labels, sample=1):
+    """Decorator recording the duration of calls into histogram under labels.
+
+    One call in sample is timed, the first one included, and recorded with
+    a weight of sample.
+    """
+    observe = histogram.labels(*labels).observe
+
+    def decorator(function):
+        # next() on a count is atomic, so threads can share it without a lock.
+        ticks = itertools.count()
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if next(ticks) % sample:
+                return function(*args, **kwargs)
+            start = perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                observe(perf_counter() - start, sample)
+        return wrapper
+    return decorator
+
+
+def time_facade(facade, sample=1):
+    """Time every public method of facade into FACADE_SECONDS.
+
+    ``iter_*`` methods return lazy iterators, whose cost lands in whoever
+    drains them, so they are left alone.
+    """
+    for name, member in vars(type(facade)).items():
+        if name.startswith(('_', 'iter_')) or not inspect.isfunction(member):
+            continue
+        setattr(facade, name, timed(FACADE_SECONDS, (name,), sample)(getattr(facade, name)))
+    return facade
+
+
+def time_repository(repo, name, sample=1):
+    """Time repo's operations into REPOSITORY_SECONDS, labelled with name."""
+    for operation in REPOSITORY_OPERATIONS:
+        method = getattr(repo, operation)
+        setattr(repo, operation, timed(REPOSITORY_SECONDS, (name, operation), sample)(method))
+    return repo
+
+
+def _add(totals, labels, cell):
+    total = totals.get(labels)
+    if total is None:
+        totals[labels] = list(cell)
+    else:
+        for i, value in enumerate(cell):
+            total[i] += value
+
+
+def _labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in labels.items()) + '}'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _number(value):
+    if isinstance(value, str):
+        return value
+    if isinstance(value, float) and value.is_integer() and abs(value) < 1e15:
+        return str(int(value))
+    return repr(value)
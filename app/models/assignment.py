@@ -0,0 +1,30 @@
+from app.models.booking import Booking
+
+
+class Assignment(Booking):
+    """Class representing a bus assigned to a route over [start, end)"""
+
+    __slots__ = ('_route_id',)
+    kind = 'assignment'
+
+    def __init__(self, bus_id, route_id, start, end):
+        super().__init__(bus_id, start, end)
+        self._route_id = self.id_validation(route_id, "route_id")
+
+    @property
+    def route_id(self):
+        return self._route_id
+
+    def to_record(self):
+        record = super().to_record()
+        record["route_id"] = self._route_id
+        return record
+
+    def load_record(self, record, references):
+        super().load_record(record, references)
+        self._route_id = record["route_id"]
+
+    def serialize(self):
+        base_dict = super().serialize()
+        base_dict["route_id"] = self._route_id
+        return base_dict
@@ -1,34 +1,238 @@
+import itertools
+import time
 import uuid
 from datetime import datetime
 
 
+def _now():
+    """Current time as integer microseconds since the epoch."""
+    return time.time_ns() // 1000
+
+
+def _to_datetime(micros):
+    seconds, micro = divmod(micros, 1_000_000)
+    return datetime.fromtimestamp(seconds).replace(microsecond=micro)
+
+
+def _from_datetime(value):
+    return int(value.timestamp()) * 1_000_000 + value.microsecond
+
+
+# Local 'YYYY-MM-DDTHH:MM:SS' per epoch second. Entities created or updated
+# together share their seconds, so most timestamps render without building
+# a datetime.
+_seconds_iso = {}
+_SECONDS_ISO_MAX = 4096
+
+
+def _to_iso(micros):
+    """Same string as _to_datetime(micros).isoformat(), cached per second."""
+    seconds, micro = divmod(micros, 1_000_000)
+    prefix = _seconds_iso.get(seconds)
+    if prefix is None:
+        if len(_seconds_iso) >= _SECONDS_ISO_MAX:
+            _seconds_iso.clear()
+        prefix = _seconds_iso[seconds] = datetime.fromtimestamp(seconds).isoformat()
+    return f"{prefix}.{micro:06d}" if micro else prefix
+
+
+# Versions are drawn from one process-wide sequence, so a version is never
+# reused, even by an entity reloaded from storage after being dropped.
+_versions = itertools.count(1)
+
+# Serialization cache counters per entity class: name -> [hits, misses]
+_cache_counters = {}
+
+
 class BaseModel:
-    """Base class for all entities with shared attributes and methods."""
+    """Base class for all entities with shared attributes and methods.
+
+    Entities use ``__slots__`` and keep their timestamps as integer
+    microseconds; ``created_at`` and ``updated_at`` still read and write
+    ``datetime`` objects.
+
+    Every attribute change gives the entity a new version. ``to_dict`` caches
+    the output of ``serialize`` and reuses it until the version (or the
+    version of an embedded entity, see ``cache_key``) changes.
+    """
+
+    __slots__ = ('id', '_created_at', '_updated_at', '_observers', '_version', '_cache',
+                 '__weakref__')
+
+    # Facade answering list(), set per model class by Facade.bind_models
+    _facade = None
 
     def __init__(self):
         """Initialize common attributes."""
+        self._init_state()
         self.id = str(uuid.uuid4())
-        self.created_at = datetime.now()
-        self.updated_at = datetime.now()
+        self._created_at = self._updated_at = _now()
+
+    def _init_state(self):
+        object.__setattr__(self, '_observers', ())
+        object.__setattr__(self, '_version', next(_versions))
+        object.__setattr__(self, '_cache', None)
+
+    @property
+    def created_at(self):
+        return _to_datetime(self._created_at)
+
+    @created_at.setter
+    def created_at(self, value):
+        self._created_at = _from_datetime(value)
+
+    @property
+    def updated_at(self):
+        return _to_datetime(self._updated_at)
+
+    @updated_at.setter
+    def updated_at(self, value):
+        self._updated_at = _from_datetime(value)
+
+    @property
+    def version(self):
+        return self._version
+
+    def __setattr__(self, name, value):
+        """Set an attribute, take a new version and tell observers."""
+        observers = self._observers
+        if not observers:
+            object.__setattr__(self, name, value)
+            object.__setattr__(self, '_version', next(_versions))
+            return
+        for observer in observers:
+            observer.check_attribute(self, name, value)
+        object.__setattr__(self, name, value)
+        object.__setattr__(self, '_version', next(_versions))
+        for observer in observers:
+            observer.attribute_changed(self, name)
+
+    def invalidate(self, name):
+        """Record an in-place change to attribute name, e.g. a list append."""
+        object.__setattr__(self, '_version', next(_versions))
+        for observer in self._observers:
+            observer.attribute_changed(self, name)
+
+    def add_observer(self, observer):
+        """Register an object notified of every attribute change."""
+        if observer not in self._observers:
+            object.__setattr__(self, '_observers', self._observers + (observer,))
+
+    def remove_observer(self, observer):
+        object.__setattr__(self, '_observers',
+                           tuple(o for o in self._observers if o is not observer))
 
     def save(self):
         """Update the 'updated_at' timestamp when the object is modified."""
-        self.updated_at = datetime.now()
+        self._updated_at = _now()
+
+    @classmethod
+    def fields(cls):
+        """Names update() may set: public slots and properties with a setter, but not id."""
+        names = cls.__dict__.get('_fields')
+        if names is None:
+            names = set()
+            for klass in cls.__mro__:
+                for name, member in vars(klass).items():
+                    if name.startswith('_') or name == 'id':
+                        continue
+                    if isinstance(member, property) and member.fset is not None \
+                            or name in getattr(klass, '__slots__', ()):
+                        names.add(name)
+            names = frozenset(names)
+            type.__setattr__(cls, '_fields', names)
+        return names
+
+    def check_fields(self, data):
+        """Reject keys of data naming internal state or read-only attributes."""
+        fields = self.fields()
+        for key in data:
+            if key not in fields and (key.startswith('_') or hasattr(self, key)):
+                raise ValueError(f"{key} cannot be updated")
 
     def update(self, data: dict):
         """Update object attributes from a dictionary of values."""
+        self.check_fields(data)
         for key, value in data.items():
-            if hasattr(self, key):
+            if key in self.fields():
                 setattr(self, key, value)
         self.save()  # refresh updated_at
 
+    def to_record(self):
+        """Flat dict of plain values, used by the persistent repositories."""
+        return {
+            "id": self.id,
+            "created_at": self._created_at,
+            "updated_at": self._updated_at,
+        }
+
+    @classmethod
+    def from_record(cls, record, references=None):
+        """Rebuild an entity from to_record() output without re-validating it.
+
+        ``references`` maps relation names to the repositories holding the
+        related entities; relations are restored as LazyReference proxies.
+        """
+        obj = cls.__new__(cls)
+        obj._init_state()
+        obj.load_record(record, references or {})
+        return obj
+
+    def load_record(self, record, references):
+        self.id = record["id"]
+        self._created_at = record["created_at"]
+        self._updated_at = record["updated_at"]
+
+    @classmethod
+    def bind_facade(cls, facade):
+        cls._facade = facade
+
+    @classmethod
+    def list(cls, filters=None, order_by=None, limit=None):
+        """Stored entities of this class matching filters, e.g.
+        ``Bus.list({'status': 1, 'price__lt': 300000}, order_by='-price', limit=10)``.
+
+        See app.persistence.query for the filter syntax.
+        """
+        if cls._facade is None:
+            raise RuntimeError(f"{cls.__name__} is not bound to a facade")
+        return cls._facade.query(cls, filters, order_by, limit)
+
+    def cache_key(self):
+        """Value that changes whenever the serialized form would change."""
+        return self._version
+
     def to_dict(self):
+        """Return the cached dictionary representation, rebuilding it if stale.
+
+        The returned dict is shared between callers and must not be modified.
+        """
+        counters = _cache_counters.get(self.__class__.__name__)
+        if counters is None:
+            counters = _cache_counters[self.__class__.__name__] = [0, 0]
+        key = self.cache_key()
+        cached = self._cache
+        if cached is not None and cached[0] == key:
+            counters[0] += 1
+            return cached[1]
+        counters[1] += 1
+        data = self.serialize()
+        object.__setattr__(self, '_cache', (key, data))
+        return data
+
+    def serialize(self):
         """Convert the object to a dictionary representation."""
         return {
             "id": self.id,
-            "created_at": self.created_at.isoformat(),
-            "updated_at": self.updated_at.isoformat(),
+            "created_at": _to_iso(self._created_at),
+            "updated_at": _to_iso(self._updated_at),
         }
 
+    @staticmethod
+    def cache_stats():
+        """Return serialization cache hits and misses per entity class."""
+        return {name: {"hits": hits, "misses": misses}
+                for name, (hits, misses) in _cache_counters.items()}
+
     def __repr__(self):
         return f"<{self.__class__.__name__} {self.id}>"
@@ -0,0 +1,84 @@
+from datetime import datetime
+from app.models.base_model import BaseModel, _from_datetime, _to_datetime, _to_iso
+
+
+class Booking(BaseModel):
+    """Base class for entities holding a bus over a [start, end) window
+
+    The window is fixed once created: the facade indexes it in the bus's
+    schedule, so changing it means deleting the booking and making a new
+    one. ``kind`` names the subclass in serialized output.
+    """
+
+    __slots__ = ('_bus_id', '_start', '_end')
+    kind = None
+
+    def __init__(self, bus_id, start, end):
+        super().__init__()
+        self._bus_id = self.id_validation(bus_id, "bus_id")
+        self._start = self.time_validation(start, "start")
+        self._end = self.time_validation(end, "end")
+        if self._end <= self._start:
+            raise ValueError("end must be after start")
+
+    @property
+    def bus_id(self):
+        return self._bus_id
+
+    @property
+    def start(self):
+        return _to_datetime(self._start)
+
+    @property
+    def end(self):
+        return _to_datetime(self._end)
+
+    @property
+    def window(self):
+        """The [start, end) window as integer microseconds."""
+        return self._start, self._end
+
+    @staticmethod
+    def id_validation(value, field_name):
+        if not isinstance(value, str):
+            raise TypeError(f"{field_name} must be a string")
+        if not value:
+            raise ValueError(f"{field_name} is required")
+        return value
+
+    @staticmethod
+    def time_validation(value, field_name):
+        """Accept a datetime or an ISO 8601 string; return integer microseconds."""
+        if isinstance(value, str):
+            try:
+                value = datetime.fromisoformat(value)
+            except ValueError:
+                raise ValueError(f"{field_name} must be an ISO 8601 date and time")
+        if not isinstance(value, datetime):
+            raise TypeError(f"{field_name} must be a date and time")
+        return _from_datetime(value)
+
+    def to_record(self):
+        record = super().to_record()
+        record.update({
+            "bus_id": self._bus_id,
+            "start": self._start,
+            "end": self._end
+        })
+        return record
+
+    def load_record(self, record, references):
+        super().load_record(record, references)
+        self._bus_id = record["bus_id"]
+        self._start = record["start"]
+        self._end = record["end"]
+
+    def serialize(self):
+        base_dict = super().serialize()
+        base_dict.update({
+            "kind": self.kind,
+            "bus_id": self._bus_id,
+            "start": _to_iso(self._start),
+            "end": _to_iso(self._end)
+        })
+        return base_dict
@@ -1,26 +1,34 @@
 from app.models.base_model import BaseModel
 from app.models.user import User
 from app.models.report import Report
+from app.persistence.lazy import LazyReference
+
+# Canonical engine type strings: every bus shares these objects instead of
+# holding its own copy of the value parsed from the request.
+ENGINE_TYPES = {name: name for name in ("thermal", "hybrid", "hydrogen", "electric")}
 
 
 class Bus(BaseModel):
     """Class representing a Bus entity"""
 
-    def __init__(self, name, engine_type, euro_standard, routes=[], reports=[], description="", price=0.0, length=0.0,
+    __slots__ = ('_name', 'description', '_price', '_length', '_engine_type', '_euro_standard',
+                 '_capacity', '_status', '_owner', 'owner_id', 'routes', 'reports')
+
+    def __init__(self, name, engine_type, euro_standard, routes=None, reports=None, description="", price=0.0, length=0.0,
                  status=0, capacity=0.0, owner=None):
         super().__init__()
         self._name = name
         self.description = description
         self._price = price
         self._length = length
-        self._engine_type = engine_type
+        self._engine_type = ENGINE_TYPES.get(engine_type, engine_type)
         self._euro_standard = euro_standard
         self._capacity = capacity
         self._status = status
         self._owner = owner
         self.owner_id = owner.id if owner else None
-        self.routes = routes
-        self.reports = reports
+        self.routes = list(routes) if routes else []
+        self.reports = list(reports) if reports else []
 
     @property
     def name(self):
@@ -70,10 +78,9 @@ class Bus(BaseModel):
 
     @engine_type.setter
     def engine_type(self, value):
-        allowed = {"thermal", "hybrid", "hydrogen", "electric"}
-        if not isinstance(value, str) or value not in allowed:
+        if not isinstance(value, str) or value not in ENGINE_TYPES:
             raise TypeError("Engine_type must be thermal, hybrid, hydrogen or electric")
-        self._engine_type = value
+        self._engine_type = ENGINE_TYPES[value]
 
     @property
     def euro_standard(self):
@@ -101,24 +108,37 @@ class Bus(BaseModel):
 
     @owner.setter
     def owner(self, value):
-        if value is not None and not isinstance(value, User):
+        if value is not None and not isinstance(value, (User, LazyReference)):
             raise TypeError("Owner must be a User")
         self._owner = value
         self.owner_id = value.id if value else None
 
+    @property
+    def report_ids(self):
+        return [report.id for report in self.reports]
+
     def add_route(self, route):
         from app.models.route import Route
         if not isinstance(route, Route):
             raise TypeError("route must be a Route instance")
-        self.routes.append(route)
+        if route not in self.routes:
+            self.routes.append(route)
+            self.invalidate('routes')
+
+    def remove_route(self, route):
+        if route in self.routes:
+            self.routes.remove(route)
+            self.invalidate('routes')
 
     def add_report(self, report):
         from app.models.report import Report
-        if not isinstance(report, Report):
+        if not isinstance(report, (Report, LazyReference)):
             raise TypeError("report must be a Report instance")
         self.reports.append(report)
+        self.invalidate('reports')
 
     def update(self, data: dict):
+        self.check_fields(data)
         for key, value in data.items():
 
             if key == 'price' and value < 0:
@@ -137,16 +157,51 @@ class Bus(BaseModel):
                     raise ValueError("name must be <= 100 characters")
 
             elif key == 'owner':
-                if value is not None and not isinstance(value, User):
+                if value is not None and not isinstance(value, (User, LazyReference)):
                     raise TypeError("owner must be a User instance")
 
-            if hasattr(self, key):
+            if key in self.fields():
                 setattr(self, key, value)
 
         self.save()
 
-    def to_dict(self):
-        base_dict = super().to_dict()
+    def to_record(self):
+        record = super().to_record()
+        record.update({
+            "name": self._name,
+            "description": self.description,
+            "price": self._price,
+            "length": self._length,
+            "capacity": self._capacity,
+            "engine_type": self._engine_type,
+            "euro_standard": self._euro_standard,
+            "status": self._status,
+            "owner_id": self.owner_id,
+            "route_ids": [route.id for route in self.routes],
+            "report_ids": self.report_ids
+        })
+        return record
+
+    def load_record(self, record, references):
+        super().load_record(record, references)
+        self._name = record["name"]
+        self.description = record["description"]
+        self._price = record["price"]
+        self._length = record["length"]
+        self._capacity = record["capacity"]
+        self._engine_type = ENGINE_TYPES.get(record["engine_type"], record["engine_type"])
+        self._euro_standard = record["euro_standard"]
+        self._status = record["status"]
+        self.owner_id = record["owner_id"]
+        owners = references.get("owner")
+        self._owner = LazyReference(owners, self.owner_id) if owners and self.owner_id else None
+        self.routes = [LazyReference(references.get("routes"), route_id)
+                       for route_id in record["route_ids"]]
+        self.reports = [LazyReference(references.get("reports"), report_id)
+                        for report_id in record["report_ids"]]
+
+    def serialize(self):
+        base_dict = super().serialize()
         base_dict.update({
             "name": self.name,
             "description": self.description,
@@ -156,8 +211,8 @@ class Bus(BaseModel):
             "engine_type": self.engine_type,
             "euro_standard": self.euro_standard,
             "status": self.status,
-            "owner_id": self.owner.id if self.owner else None,
+            "owner_id": self.owner_id,
             "routes": [route.id for route in self.routes],
-            "reports": [report.id for report in self.reports]
+            "reports": self.report_ids
         })
         return base_dict
@@ -0,0 +1,54 @@
+from app.models.booking import Booking
+
+
+class Maintenance(Booking):
+    """Class representing a maintenance window taking a bus out of service"""
+
+    __slots__ = ('_type', '_technician_id')
+    kind = 'maintenance'
+
+    def __init__(self, bus_id, type, start, end, technician_id=None):
+        super().__init__(bus_id, start, end)
+        self._type = self.type_validation(type)
+        if technician_id is not None:
+            technician_id = self.id_validation(technician_id, "technician_id")
+        self._technician_id = technician_id
+
+    @property
+    def type(self):
+        return self._type
+
+    @property
+    def technician_id(self):
+        return self._technician_id
+
+    @staticmethod
+    def type_validation(value):
+        if not isinstance(value, str):
+            raise TypeError("type must be a string")
+        if not value.strip():
+            raise ValueError("type is required")
+        if len(value) > 50:
+            raise ValueError("type cannot exceed 50 characters")
+        return value
+
+    def to_record(self):
+        record = super().to_record()
+        record.update({
+            "type": self._type,
+            "technician_id": self._technician_id
+        })
+        return record
+
+    def load_record(self, record, references):
+        super().load_record(record, references)
+        self._type = record["type"]
+        self._technician_id = record["technician_id"]
+
+    def serialize(self):
+        base_dict = super().serialize()
+        base_dict.update({
+            "type": self._type,
+            "technician_id": self._technician_id
+        })
+        return base_dict
@@ -4,6 +4,8 @@ from app.models.base_model import BaseModel
 class Report(BaseModel):
     """Class representing a Report entity"""
 
+    __slots__ = ('comment',)
+
     def __init__(self, comment):
         super().__init__()
         if not isinstance(comment, str):
@@ -14,9 +16,18 @@ class Report(BaseModel):
             raise ValueError("comment cannot exceed 50 characters")
         self.comment = comment
 
-    def to_dict(self):
+    def to_record(self):
+        record = super().to_record()
+        record["comment"] = self.comment
+        return record
+
+    def load_record(self, record, references):
+        super().load_record(record, references)
+        self.comment = record["comment"]
+
+    def serialize(self):
         """Return a dictionary representation of Report"""
-        base_dict = super().to_dict()
+        base_dict = super().serialize()
         base_dict.update({
             "comment": self.comment
         })
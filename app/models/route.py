@@ -1,14 +1,17 @@
 from app.models.bus import Bus
 from app.models.user import User
 from app.models.base_model import BaseModel
+from app.persistence.lazy import LazyReference
 
 
 class Route(BaseModel):
-    def __init__(self, route_number, name, bus, user):
+    __slots__ = ('_route_number', '_name', '_buses', '_user')
+
+    def __init__(self, route_number, name, buses, user):
         super().__init__()
         self._route_number = self.string_validation(route_number, "route_number")
         self._name = self.name_validation(name)
-        self._bus = self.bus_validation(bus)
+        self._buses = self.buses_validation(buses)
         self._user = self.user_validation(user)
 
     @property
@@ -27,13 +30,45 @@ class Route(BaseModel):
     def name(self, value):
         self._name = self.name_validation(value)
 
+    @property
+    def user(self):
+        return self._user
+
+    @user.setter
+    def user(self, value):
+        self._user = self.user_validation(value)
+
+    @property
+    def buses(self):
+        return self._buses
+
+    @buses.setter
+    def buses(self, value):
+        self._buses = self.buses_validation(value)
+
     @property
     def user_id(self):
         return getattr(self._user, "id", None)
 
     @property
-    def bus_id(self):
-        return getattr(self._bus, "id", None)
+    def bus_ids(self):
+        return [bus.id for bus in self._buses]
+
+    def add_bus(self, bus):
+        self.bus_validation(bus)
+        if bus not in self._buses:
+            self._buses.append(bus)
+            self.invalidate('buses')
+
+    def remove_bus(self, bus):
+        if bus in self._buses:
+            self._buses.remove(bus)
+            self.invalidate('buses')
+
+    def cache_key(self):
+        # Route embeds its buses and user, so their keys are part of ours.
+        return (self._version, self._user.cache_key(),
+                tuple(bus.cache_key() for bus in self._buses))
 
     @staticmethod
     def string_validation(value, field_name, max_length=100):
@@ -55,23 +90,46 @@ class Route(BaseModel):
 
     @staticmethod
     def bus_validation(bus):
-        if not isinstance(bus, Bus):
+        if not isinstance(bus, (Bus, LazyReference)):
             raise TypeError("bus must be a Bus instance")
         return bus
 
+    @classmethod
+    def buses_validation(cls, buses):
+        if not isinstance(buses, (list, tuple)):
+            raise TypeError("buses must be a list of Bus instances")
+        return [cls.bus_validation(bus) for bus in buses]
+
     @staticmethod
     def user_validation(user):
-        if not isinstance(user, User):
+        if not isinstance(user, (User, LazyReference)):
             raise TypeError("user must be a User instance")
         return user
     
-    def to_dict(self):
-        base_dict = super().to_dict()
+    def to_record(self):
+        record = super().to_record()
+        record.update({
+            "route_number": self._route_number,
+            "name": self._name,
+            "user_id": self.user_id,
+            "bus_ids": self.bus_ids
+        })
+        return record
+
+    def load_record(self, record, references):
+        super().load_record(record, references)
+        self._route_number = record["route_number"]
+        self._name = record["name"]
+        self._user = LazyReference(references.get("user"), record["user_id"])
+        self._buses = [LazyReference(references.get("buses"), bus_id)
+                       for bus_id in record["bus_ids"]]
+
+    def serialize(self):
+        base_dict = super().serialize()
         base_dict.update({
             "route_number": self._route_number,
             "name": self._name,
-            "bus": self._bus.to_dict() if hasattr(self._bus, "to_dict") else str(self._bus),
+            "buses": [bus.to_dict() for bus in self._buses],
             "user": self._user.to_dict() if hasattr(self._user, "to_dict") else str(self._user)
         })
         return base_dict
-
@@ -2,6 +2,8 @@ from app.models.base_model import BaseModel
 
 
 class User(BaseModel):
+    __slots__ = ('_first_name', '_last_name', '_email', '_is_admin')
+
     def __init__(self, first_name, last_name, email, is_admin=False):
         super().__init__()
         self._first_name = self.string_validation(first_name, "first_name")
@@ -56,9 +58,26 @@ class User(BaseModel):
             raise ValueError("email must be a valid email address")
         return email
 
-    def to_dict(self):
+    def to_record(self):
+        record = super().to_record()
+        record.update({
+            "first_name": self._first_name,
+            "last_name": self._last_name,
+            "email": self._email,
+            "is_admin": self._is_admin
+        })
+        return record
+
+    def load_record(self, record, references):
+        super().load_record(record, references)
+        self._first_name = record["first_name"]
+        self._last_name = record["last_name"]
+        self._email = record["email"]
+        self._is_admin = record["is_admin"]
+
+    def serialize(self):
         """Return a dictionary representation of User"""
-        base_dict = super().to_dict()
+        base_dict = super().serialize()
         base_dict.update({
             "first_name": self._first_name,
             "last_name": self._last_name,
@@ -0,0 +1,117 @@
+import asyncio
+from abc import ABC, abstractmethod
+from app.persistence.locks import NullLock
+
+
+class AsyncRepository(ABC):
+    """Coroutine counterpart of Repository.
+
+    A backend reached over the network implements it natively, so the
+    event loop serves other requests while it waits; AsyncRepositoryAdapter
+    puts any synchronous Repository behind it.
+    """
+
+    @abstractmethod
+    async def add(self, obj): pass
+
+    async def add_many(self, objs):
+        for obj in objs:
+            await self.add(obj)
+
+    @abstractmethod
+    async def get(self, obj_id): pass
+
+    @abstractmethod
+    async def get_many(self, obj_ids): pass
+
+    @abstractmethod
+    async def get_all(self): pass
+
+    @abstractmethod
+    async def update(self, obj_id, data): pass
+
+    @abstractmethod
+    async def delete(self, obj_id): pass
+
+    @abstractmethod
+    async def get_by_attribute(self, attr_name, attr_value): pass
+
+    @abstractmethod
+    async def get_all_by_attribute(self, attr_name, attr_value): pass
+
+    @abstractmethod
+    async def page(self, limit, after=None, filters=None): pass
+
+
+class AsyncRepositoryAdapter(AsyncRepository):
+    """AsyncRepository over a synchronous repository.
+
+    Each call holds ``lock`` (the facade's RWLock) as the facade's own
+    methods do, through run_locked: with an executor, calls run on its
+    threads, so a backend blocking on I/O leaves the event loop free;
+    without one they run inline, which suits backends answering from
+    memory in less time than a thread hop takes.
+    """
+
+    def __init__(self, repository, executor=None, lock=None):
+        self.repository = repository
+        self.executor = executor
+        self.lock = lock if lock is not None else NullLock()
+
+    async def _run(self, write, method, *args):
+        return await run_locked(self.lock, write, self.executor, method, *args)
+
+    async def add(self, obj):
+        return await self._run(True, self.repository.add, obj)
+
+    async def add_many(self, objs):
+        return await self._run(True, self.repository.add_many, list(objs))
+
+    async def get(self, obj_id):
+        return await self._run(False, self.repository.get, obj_id)
+
+    async def get_many(self, obj_ids):
+        return await self._run(False, self.repository.get_many, list(obj_ids))
+
+    async def get_all(self):
+        return await self._run(False, self.repository.get_all)
+
+    async def update(self, obj_id, data):
+        return await self._run(True, self.repository.update, obj_id, data)
+
+    async def delete(self, obj_id):
+        return await self._run(True, self.repository.delete, obj_id)
+
+    async def get_by_attribute(self, attr_name, attr_value):
+        return await self._run(False, self.repository.get_by_attribute, attr_name, attr_value)
+
+    async def get_all_by_attribute(self, attr_name, attr_value):
+        return await self._run(False, self.repository.get_all_by_attribute, attr_name, attr_value)
+
+    async def page(self, limit, after=None, filters=None):
+        return await self._run(False, self.repository.page, limit, after, filters)
+
+
+async def run_locked(lock, write, executor, method, *args):
+    """Call method holding lock for writing (or reading), without blocking the event loop.
+
+    Calls run on executor. Without one they run inline when lock is a
+    NullLock or is free right away; a call that would wait for the lock
+    goes to the loop's default executor instead, so a writer holding it
+    never stalls the loop.
+    """
+    if executor is None:
+        if isinstance(lock, NullLock):
+            return method(*args)
+        if (lock.acquire_write if write else lock.acquire_read)(blocking=False):
+            try:
+                return method(*args)
+            finally:
+                (lock.release_write if write else lock.release_read)()
+    return await asyncio.get_running_loop().run_in_executor(
+        executor, _locked, lock, write, method, args)
+
+
+def _locked(lock, write, method, args):
+    with lock.write() if write else lock.read():
+        return method(*args)
@@ -0,0 +1,154 @@
+def iter_bits(mask):
+    """Positions of the set bits of an int, lowest first."""
+    # Scanning the binary string beats peeling bits off a wide int one by one.
+    digits = bin(mask)[:1:-1]
+    position = digits.find('1')
+    while position >= 0:
+        yield position
+        position = digits.find('1', position + 1)
+
+
+class FleetIndex:
+    """Bitmaps over the fleet, one bit per bus, held in Python ints.
+
+    Each bus gets a bit position. For every value of the indexed
+    attributes (status, engine type, ...) there is a mask of the buses
+    holding it, and for every time slot of ``slot_us`` microseconds a mask
+    of the buses booked in it; ``block`` consecutive slots are also OR-ed
+    into a coarser mask so long windows read fewer ints. A fleet query is
+    then a handful of AND/OR/NOT operations on ints of fleet-size bits.
+
+    Slot masks mark any bus whose booking touches the slot, so they can
+    over-report at a window's unaligned edges; ``available`` resolves those
+    edge buses exactly against the Schedule.
+    """
+
+    def __init__(self, schedule, attributes=('status', 'engine_type', 'euro_standard'),
+                 slot_us=5 * 60 * 1_000_000, block=12):
+        self.schedule = schedule
+        self.attributes = tuple(attributes)
+        self.slot_us = slot_us
+        self.block = block
+        self._bits = {}
+        self._ids = []
+        self._free_bits = []
+        self._all = 0
+        self._values = {}
+        self._masks = {name: {} for name in self.attributes}
+        self._slots = {}
+        self._blocks = {}
+
+    def refresh(self, obj):
+        """Add obj, or move it to the masks matching its current attributes."""
+        bit = self._bits.get(obj.id)
+        if bit is None:
+            bit = self._free_bits.pop() if self._free_bits else len(self._ids)
+            if bit == len(self._ids):
+                self._ids.append(obj.id)
+            else:
+                self._ids[bit] = obj.id
+            self._bits[obj.id] = bit
+            self._all |= 1 << bit
+        values = tuple(getattr(obj, name, None) for name in self.attributes)
+        old = self._values.get(obj.id)
+        if old == values:
+            return
+        self._values[obj.id] = values
+        for i, name in enumerate(self.attributes):
+            masks = self._masks[name]
+            if old is not None:
+                self._clear(masks, old[i], bit)
+            masks[values[i]] = masks.get(values[i], 0) | 1 << bit
+
+    def remove(self, obj_id):
+        """Forget a bus; its bookings must be released first."""
+        bit = self._bits.pop(obj_id, None)
+        if bit is None:
+            return
+        for i, name in enumerate(self.attributes):
+            self._clear(self._masks[name], self._values[obj_id][i], bit)
+        del self._values[obj_id]
+        self._all &= ~(1 << bit)
+        self._ids[bit] = None
+        self._free_bits.append(bit)
+
+    def book(self, obj_id, start, end):
+        """Mark the slots touched by [start, end) as busy for obj_id."""
+        flag = 1 << self._bits[obj_id]
+        first, last = start // self.slot_us, (end - 1) // self.slot_us
+        for slot in range(first, last + 1):
+            self._slots[slot] = self._slots.get(slot, 0) | flag
+        for block in range(first // self.block, last // self.block + 1):
+            self._blocks[block] = self._blocks.get(block, 0) | flag
+
+    def release(self, obj_id, start, end):
+        """Clear the busy marks of [start, end), keeping those another booking still touches.
+
+        Call after the booking has left the Schedule.
+        """
+        bit = self._bits.get(obj_id)
+        if bit is None:
+            return
+        slot_us, block = self.slot_us, self.block
+        first, last = start // slot_us, (end - 1) // slot_us
+        for slot in range(first, last + 1):
+            if not self.schedule.conflicts(obj_id, slot * slot_us, (slot + 1) * slot_us):
+                self._clear(self._slots, slot, bit)
+        span = slot_us * block
+        for number in range(first // block, last // block + 1):
+            if not self.schedule.conflicts(obj_id, number * span, (number + 1) * span):
+                self._clear(self._blocks, number, bit)
+
+    def available(self, start, end, filters=None):
+        """Ids of the buses matching filters with no booking overlapping [start, end).
+
+        ``filters`` maps indexed attributes to required values.
+        """
+        mask = self._all
+        for name, value in (filters or {}).items():
+            mask &= self._masks[name].get(value, 0)
+        if not mask or start >= end:
+            return [self._ids[bit] for bit in iter_bits(mask)]
+
+        slot_us = self.slot_us
+        first, last = start // slot_us, (end - 1) // slot_us
+        inner_lo, inner_hi = -(-start // slot_us), end // slot_us
+        # Buses booked in a slot wholly inside the window are surely busy.
+        mask &= ~self._busy_between(inner_lo, inner_hi)
+        edges = {slot for slot in (first, last) if not inner_lo <= slot < inner_hi}
+        maybe = 0
+        for slot in edges:
+            maybe |= self._slots.get(slot, 0)
+        maybe &= mask
+        for bit in iter_bits(maybe):
+            if self.schedule.conflicts(self._ids[bit], start, end):
+                mask &= ~(1 << bit)
+        return [self._ids[bit] for bit in iter_bits(mask)]
+
+    def _busy_between(self, lo, hi):
+        """OR of the slot masks in [lo, hi), reading whole blocks where possible."""
+        slots, blocks, size = self._slots, self._blocks, self.block
+        busy = 0
+        block_lo, block_hi = -(-lo // size), hi // size
+        if block_lo >= block_hi:
+            for slot in range(lo, hi):
+                busy |= slots.get(slot, 0)
+            return busy
+        for slot in range(lo, block_lo * size):
+            busy |= slots.get(slot, 0)
+        for number in range(block_lo, block_hi):
+            busy |= blocks.get(number, 0)
+        for slot in range(block_hi * size, hi):
+            busy |= slots.get(slot, 0)
+        return busy
+
+    @staticmethod
+    def _clear(masks, key, bit):
+        mask = masks.get(key, 0) & ~(1 << bit)
+        if mask:
+            masks[key] = mask
+        else:
+            masks.pop(key, None)
+
+    def __len__(self):
+        return len(self._bits)
@@ -0,0 +1,120 @@
+from array import array
+
+
+def _number(value):
+    return float(value) if isinstance(value, (int, float)) and not isinstance(value, bool) else 0.0
+
+
+class FleetColumns:
+    """Columnar shadow copy of the buses' numeric and categorical fields.
+
+    Every bus owns a row: numeric fields live in ``array('d')`` columns and
+    categorical ones in ``array('l')`` columns of codes into a per-column
+    value list. Rows freed by deleted buses are reused.
+
+    Per-group counts and sums are kept up to date on every write, moved
+    by the difference between a bus's old and new row, so ``stats`` costs a pass
+    over the groups rather than the fleet, however many buses there are.
+    """
+
+    NUMERIC = ('price', 'length', 'capacity')
+    CATEGORICAL = ('engine_type', 'euro_standard', 'status')
+
+    def __init__(self):
+        self._rows = {}
+        self._free_rows = []
+        self._numeric = {name: array('d') for name in self.NUMERIC}
+        self._codes = {name: array('l') for name in self.CATEGORICAL}
+        self._values = {name: [] for name in self.CATEGORICAL}
+        self._lookup = {name: {} for name in self.CATEGORICAL}
+        # [count, sum of each NUMERIC field], overall and per group code
+        self._total = [0] + [0.0] * len(self.NUMERIC)
+        self._groups = {name: {} for name in self.CATEGORICAL}
+
+    def refresh(self, obj):
+        """Add obj's row, or overwrite it with its current values."""
+        numbers = [_number(getattr(obj, name, None)) for name in self.NUMERIC]
+        codes = [self._code(name, getattr(obj, name, None)) for name in self.CATEGORICAL]
+        row = self._rows.get(obj.id)
+        if row is None:
+            row = self._free_rows.pop() if self._free_rows else self._append_row()
+            self._rows[obj.id] = row
+            self._apply(codes, numbers, 1)
+        else:
+            old_numbers, old_codes = self._row(row)
+            if old_codes == codes:
+                if old_numbers == numbers:
+                    return
+                # Same groups: only the sums move, by the difference.
+                self._apply(codes, [new - old for new, old in zip(numbers, old_numbers)], 0)
+            else:
+                self._apply(old_codes, [-old for old in old_numbers], -1)
+                self._apply(codes, numbers, 1)
+        for name, value in zip(self.NUMERIC, numbers):
+            self._numeric[name][row] = value
+        for name, code in zip(self.CATEGORICAL, codes):
+            self._codes[name][row] = code
+
+    def remove(self, obj_id):
+        row = self._rows.pop(obj_id, None)
+        if row is None:
+            return
+        numbers, codes = self._row(row)
+        self._apply(codes, [-number for number in numbers], -1)
+        self._free_rows.append(row)
+
+    def stats(self, group_by=CATEGORICAL):
+        """Fleet totals plus count and per-field total/average for each group of group_by."""
+        result = self._summary(self._total)
+        for name in group_by:
+            values = self._values[name]
+            result[f"by_{name}"] = {values[code]: self._summary(sums)
+                                    for code, sums in self._groups[name].items()}
+        return result
+
+    def _append_row(self):
+        for column in self._numeric.values():
+            column.append(0.0)
+        for column in self._codes.values():
+            column.append(0)
+        return len(self._rows)
+
+    def _row(self, row):
+        return ([self._numeric[name][row] for name in self.NUMERIC],
+                [self._codes[name][row] for name in self.CATEGORICAL])
+
+    def _code(self, name, value):
+        code = self._lookup[name].get(value)
+        if code is None:
+            code = self._lookup[name][value] = len(self._values[name])
+            self._values[name].append(value)
+        return code
+
+    def _apply(self, codes, deltas, count):
+        """Add count rows and the per-field deltas to the total and to the groups of codes."""
+        targets = [self._total]
+        for groups, code in zip(self._groups.values(), codes):
+            sums = groups.get(code)
+            if sums is None:
+                sums = groups[code] = [0] + [0.0] * len(deltas)
+            if sums[0] + count:
+                targets.append(sums)
+            else:
+                del groups[code]
+        for sums in targets:
+            sums[0] += count
+            for i, delta in enumerate(deltas, 1):
+                sums[i] += delta
+        if not self._total[0]:
+            # Drop the rounding residue left by subtracting every row.
+            self._total[1:] = [0.0] * len(deltas)
+
+    def _summary(self, sums):
+        count = sums[0]
+        summary = {'count': count}
+        for i, name in enumerate(self.NUMERIC, 1):
+            summary[name] = {'total': sums[i], 'average': sums[i] / count if count else 0.0}
+        return summary
+
+    def __len__(self):
+        return len(self._rows)
@@ -0,0 +1,130 @@
+from bisect import bisect_right, insort
+
+
+class HashIndex:
+    """Hash index from an attribute value to the objects holding that value.
+
+    Non-unique buckets keep their objects sorted by the repository's
+    insertion sequence, so a bucket can be paged from any position.
+    """
+
+    def __init__(self, attr_name, unique=False):
+        self.attr_name = attr_name
+        self.unique = unique
+        self._buckets = {}
+        self._values = {}
+
+    def check(self, obj, value):
+        """Raise ValueError if giving obj this value would break uniqueness."""
+        if not self.unique or value is None:
+            return
+        holder = self._buckets.get(value)
+        if holder is not None and holder.id != obj.id:
+            raise ValueError(f"{self.attr_name} '{value}' already exists")
+
+    def add(self, obj, seq):
+        value = getattr(obj, self.attr_name, None)
+        self._values[obj.id] = (value, seq)
+        if self.unique:
+            if value is not None:
+                self._buckets[value] = obj
+        else:
+            bucket = self._buckets.get(value)
+            if bucket is None:
+                bucket = self._buckets[value] = _Bucket()
+            bucket.add(seq, obj)
+
+    def remove(self, obj):
+        if obj.id not in self._values:
+            return
+        value, seq = self._values.pop(obj.id)
+        if self.unique:
+            if self._buckets.get(value) is obj:
+                del self._buckets[value]
+        else:
+            bucket = self._buckets.get(value)
+            if bucket is not None:
+                bucket.remove(seq)
+                if not bucket.objs:
+                    del self._buckets[value]
+
+    def refresh(self, obj):
+        """Move obj to the bucket matching its current attribute value."""
+        entry = self._values.get(obj.id)
+        if entry is None:
+            return
+        if entry[0] != getattr(obj, self.attr_name, None):
+            self.remove(obj)
+            self.add(obj, entry[1])
+
+    def get(self, value):
+        if self.unique:
+            return self._buckets.get(value)
+        bucket = self._buckets.get(value)
+        return next(bucket.scan(), None) if bucket else None
+
+    def get_all(self, value):
+        return list(self.scan(value))
+
+    def count(self, value):
+        if self.unique:
+            return 1 if value in self._buckets else 0
+        bucket = self._buckets.get(value)
+        return len(bucket.objs) if bucket else 0
+
+    def positions(self, value):
+        """Insertion sequences of the objects holding value, as a set-like view."""
+        if self.unique:
+            obj = self._buckets.get(value)
+            return {self._values[obj.id][1]} if obj is not None else set()
+        bucket = self._buckets.get(value)
+        return bucket.objs.keys() if bucket else set()
+
+    def scan(self, value, after=None):
+        """Yield the objects holding value whose sequence is above after."""
+        if self.unique:
+            obj = self._buckets.get(value)
+            if obj is not None and (after is None or self._values[obj.id][1] > after):
+                yield obj
+            return
+        bucket = self._buckets.get(value)
+        if bucket is not None:
+            yield from bucket.scan(after)
+
+    def __len__(self):
+        return len(self._values)
+
+
+class _Bucket:
+    """Objects sharing one index value, ordered by insertion sequence."""
+
+    __slots__ = ('seqs', 'objs')
+
+    def __init__(self):
+        self.seqs = []
+        self.objs = {}
+
+    def add(self, seq, obj):
+        if not self.seqs or seq > self.seqs[-1]:
+            self.seqs.append(seq)
+        else:
+            insort(self.seqs, seq)
+        self.objs[seq] = obj
+
+    def remove(self, seq):
+        if self.objs.pop(seq, None) is not None:
+            del self.seqs[bisect_right(self.seqs, seq) - 1]
+
+    def scan(self, after=None):
+        seqs = self.seqs
+        i = 0 if after is None else bisect_right(seqs, after)
+        while i < len(seqs):
+            seq = seqs[i]
+            obj = self.objs.get(seq)
+            if obj is not None:
+                yield obj
+            # Re-seek if the bucket changed while the caller held the item.
+            if i < len(seqs) and seqs[i] == seq:
+                i += 1
+            else:
+                i = bisect_right(seqs, seq)
@@ -0,0 +1,302 @@
+import glob
+import os
+import pickle
+import struct
+import threading
+import zlib
+from contextlib import contextmanager
+from app.persistence.repository import InMemoryRepository
+
+FSYNC_POLICIES = ('always', 'interval', 'os')
+
+_HEADER = struct.Struct('<II')  # payload length, crc32 of payload
+_PUT = 'P'
+_DELETE = 'D'
+
+
+def _fsync_directory(directory):
+    """Make a rename inside directory durable (no-op where unsupported)."""
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+class Journal:
+    """Append-only file of framed, checksummed binary entries.
+
+    ``fsync_policy`` controls durability:
+
+    - ``always``: every append is on disk before it returns. Concurrent
+      writers share fsyncs (group commit): a writer whose entry was covered
+      by another thread's fsync does not issue its own.
+    - ``interval``: a background thread fsyncs every ``fsync_interval_ms``.
+    - ``os``: entries are flushed to the OS, which decides when to write.
+    """
+
+    def __init__(self, path, fsync_policy='interval', fsync_interval_ms=100):
+        if fsync_policy not in FSYNC_POLICIES:
+            raise ValueError(f"fsync_policy must be one of {', '.join(FSYNC_POLICIES)}")
+        self.path = path
+        self.fsync_policy = fsync_policy
+        self.fsync_interval = fsync_interval_ms / 1000
+        self._file = open(path, 'ab')
+        self._lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+        self._written = self._file.tell()
+        self._synced = self._written
+        self._closed = threading.Event()
+        self._flusher = None
+        if fsync_policy == 'interval':
+            self._flusher = threading.Thread(target=self._flush_loop, daemon=True)
+            self._flusher.start()
+
+    @property
+    def size(self):
+        return self._written
+
+    def append(self, entry):
+        """Append an entry and return the number of bytes written."""
+        return self.append_many((entry,))
+
+    def append_many(self, entries):
+        """Append entries with a single write (and fsync); return the bytes written."""
+        frames = []
+        for entry in entries:
+            payload = pickle.dumps(entry, protocol=pickle.HIGHEST_PROTOCOL)
+            frames.append(_HEADER.pack(len(payload), zlib.crc32(payload)) + payload)
+        frame = b''.join(frames)
+        with self._lock:
+            self._file.write(frame)
+            self._file.flush()
+            self._written += len(frame)
+            offset = self._written
+        if self.fsync_policy == 'always':
+            self._sync(offset)
+        return len(frame)
+
+    def _sync(self, offset):
+        with self._sync_lock:
+            if self._synced >= offset:
+                return
+            with self._lock:
+                target = self._written
+            os.fsync(self._file.fileno())
+            self._synced = target
+
+    def _flush_loop(self):
+        while not self._closed.wait(self.fsync_interval):
+            if self._synced < self._written:
+                self._sync(self._written)
+
+    def close(self):
+        self._closed.set()
+        if self._flusher is not None:
+            self._flusher.join()
+        if self.fsync_policy != 'os':
+            self._sync(self._written)
+        self._file.close()
+
+
+class JournalReader:
+    """Iterate the entries of a journal file, stopping at a torn or corrupt tail.
+
+    After iteration ``valid_length`` is the offset just past the last good
+    entry, where a crashed writer's partial frame (if any) begins.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.valid_length = 0
+
+    def __iter__(self):
+        with open(self.path, 'rb') as f:
+            while True:
+                header = f.read(_HEADER.size)
+                if len(header) < _HEADER.size:
+                    return
+                length, crc = _HEADER.unpack(header)
+                payload = f.read(length)
+                if len(payload) < length or zlib.crc32(payload) != crc:
+                    return
+                self.valid_length = f.tell()
+                yield pickle.loads(payload)
+
+    def truncate(self):
+        """Cut off anything after the last good entry."""
+        if os.path.getsize(self.path) > self.valid_length:
+            with open(self.path, 'r+b') as f:
+                f.truncate(self.valid_length)
+
+
+class JournaledRepository(InMemoryRepository):
+    """InMemoryRepository that survives restarts through a journal and snapshots.
+
+    Every add, change and delete appends the entity's ``to_record()`` (or
+    its id) to ``<name>.<generation>.journal`` in ``directory``. When the
+    journal grows past ``compact_ratio`` times the last snapshot (and at
+    least ``compact_min_bytes``), the whole store is written to
+    ``<name>.snapshot`` and a new journal generation starts, so restart
+    time and bytes rewritten per logical write both stay bounded.
+
+    ``open()`` loads the snapshot and replays the journal tail; call it
+    once the repositories for related entities are bound.
+    """
+
+    def __init__(self, directory, name, model, unique_indexes=(), indexes=(),
+                 fsync_policy='interval', fsync_interval_ms=100,
+                 compact_ratio=1.0, compact_min_bytes=1 << 20):
+        super().__init__(unique_indexes=unique_indexes, indexes=indexes)
+        self.directory = directory
+        self.name = name
+        self.model = model
+        self.fsync_policy = fsync_policy
+        self.fsync_interval_ms = fsync_interval_ms
+        self.compact_ratio = compact_ratio
+        self.compact_min_bytes = compact_min_bytes
+        self.generation = 0
+        self.snapshot_size = 0
+        self.journal_bytes_written = 0
+        self.snapshot_bytes_written = 0
+        self._journal = None
+        self._local = threading.local()
+
+    @property
+    def snapshot_path(self):
+        return os.path.join(self.directory, f"{self.name}.snapshot")
+
+    def _journal_path(self, generation):
+        return os.path.join(self.directory, f"{self.name}.{generation}.journal")
+
+    def _journal_generations(self):
+        generations = []
+        for path in glob.glob(os.path.join(self.directory, f"{self.name}.*.journal")):
+            middle = os.path.basename(path)[len(self.name) + 1:-len(".journal")]
+            if middle.isdigit():
+                generations.append(int(middle))
+        return sorted(generations)
+
+    def open(self):
+        os.makedirs(self.directory, exist_ok=True)
+        if os.path.exists(self.snapshot_path):
+            self.snapshot_size = os.path.getsize(self.snapshot_path)
+            with open(self.snapshot_path, 'rb') as f:
+                unpickler = pickle.Unpickler(f)
+                self.generation = unpickler.load()["generation"]
+                for record in iter(unpickler.load, None):
+                    self._restore(record)
+
+        for generation in self._journal_generations():
+            if generation < self.generation:
+                os.remove(self._journal_path(generation))
+                continue
+            reader = JournalReader(self._journal_path(generation))
+            for op, value in reader:
+                if op == _PUT:
+                    self._restore(value)
+                else:
+                    super().delete(value)
+            reader.truncate()
+            self.generation = generation
+
+        self._journal = Journal(self._journal_path(self.generation),
+                                self.fsync_policy, self.fsync_interval_ms)
+
+    def _restore(self, record):
+        obj = self._storage.get(record["id"])
+        if obj is None:
+            super().add(self.model.from_record(record, self.references))
+            return
+        # Reload in place so the entity keeps its position in scan order.
+        obj.remove_observer(self)
+        obj.load_record(record, self.references)
+        for index in self._indexes.values():
+            index.refresh(obj)
+        obj.add_observer(self)
+
+    def close(self):
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
+
+    def _log(self, entry):
+        self._log_many((entry,))
+
+    def _log_many(self, entries):
+        self.journal_bytes_written += self._journal.append_many(entries)
+        if self._journal.size > max(self.compact_min_bytes,
+                                    self.compact_ratio * self.snapshot_size):
+            self.compact()
+
+    def compact(self):
+        """Write a snapshot of the whole store and start a new journal."""
+        old_journal = self._journal
+        self.generation += 1
+        self._journal = Journal(self._journal_path(self.generation),
+                                self.fsync_policy, self.fsync_interval_ms)
+
+        tmp_path = self.snapshot_path + ".tmp"
+        with open(tmp_path, 'wb') as f:
+            pickler = pickle.Pickler(f, protocol=pickle.HIGHEST_PROTOCOL)
+            pickler.dump({"generation": self.generation})
+            for obj in self._storage.values():
+                pickler.dump(obj.to_record())
+            pickler.dump(None)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.snapshot_path)
+        _fsync_directory(self.directory)
+        self.snapshot_size = os.path.getsize(self.snapshot_path)
+        self.snapshot_bytes_written += self.snapshot_size
+
+        old_journal.close()
+        os.remove(old_journal.path)
+
+    def add(self, obj):
+        super().add(obj)
+        self._log((_PUT, obj.to_record()))
+
+    def add_many(self, objs):
+        objs = list(objs)
+        super().add_many(objs)
+        if objs:
+            self._log_many([(_PUT, obj.to_record()) for obj in objs])
+
+    def delete(self, obj_id):
+        if obj_id in self._storage:
+            super().delete(obj_id)
+            self._log((_DELETE, obj_id))
+
+    @contextmanager
+    def _deferred_writes(self):
+        """Collect attribute-change entries and log each object once."""
+        pending = getattr(self._local, 'pending', None)
+        if pending is not None:
+            yield
+            return
+        self._local.pending = pending = {}
+        try:
+            yield
+        finally:
+            self._local.pending = None
+            for obj in pending.values():
+                if obj.id in self._storage:
+                    self._log((_PUT, obj.to_record()))
+
+    def update(self, obj_id, data):
+        with self._deferred_writes():
+            super().update(obj_id, data)
+
+    def attribute_changed(self, obj, name):
+        super().attribute_changed(obj, name)
+        pending = getattr(self._local, 'pending', None)
+        if pending is not None:
+            pending[obj.id] = obj
+        else:
+            self._log((_PUT, obj.to_record()))
@@ -0,0 +1,38 @@
+class LazyReference:
+    """Stand-in for a related entity, loaded from its repository on first use.
+
+    The id is always available without a lookup, so serializing a reference
+    (``ref.id``) never touches the repository. Any other attribute access
+    resolves the target and delegates to it.
+    """
+
+    __slots__ = ('id', '_repo', '_target')
+
+    def __init__(self, repo, obj_id):
+        self.id = obj_id
+        self._repo = repo
+        self._target = None
+
+    @property
+    def resolved(self):
+        return self._target is not None
+
+    def resolve(self):
+        if self._target is None:
+            self._target = self._repo.get(self.id)
+        return self._target
+
+    def __getattr__(self, name):
+        target = self.resolve()
+        if target is None:
+            raise AttributeError(f"{self.id} no longer exists")
+        return getattr(target, name)
+
+    def __eq__(self, other):
+        return getattr(other, 'id', None) == self.id
+
+    def __hash__(self):
+        return hash(self.id)
+
+    def __repr__(self):
+        return f"<LazyReference {self.id}>"
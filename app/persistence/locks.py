@@ -0,0 +1,144 @@
+import functools
+import threading
+from contextlib import contextmanager
+
+
+class RWLock:
+    """Reader-writer lock: any number of readers, or a single writer.
+
+    Writers are preferred: once a writer is waiting, new readers queue
+    behind it so a steady stream of reads cannot starve writes. The lock is
+    reentrant per thread: a reader may read again, and a writer may read or
+    write again, without deadlocking. A reader asking to write raises
+    RuntimeError, since two readers upgrading at once would deadlock.
+
+    With ``blocking=False`` the acquire methods return False instead of
+    waiting, and True once the lock is held.
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition(threading.Lock())
+        self._readers = 0
+        self._writer = None
+        self._writers_waiting = 0
+        # Per-thread nesting depth: positive for reads, negative for writes.
+        self._local = threading.local()
+
+    def acquire_read(self, blocking=True):
+        local = self._local
+        depth = getattr(local, 'depth', 0)
+        if depth:
+            local.depth = depth + 1 if depth > 0 else depth - 1
+            return True
+        with self._cond:
+            while self._writer is not None or self._writers_waiting:
+                if not blocking:
+                    return False
+                self._cond.wait()
+            self._readers += 1
+        local.depth = 1
+        return True
+
+    def release_read(self):
+        local = self._local
+        depth = local.depth
+        if depth != 1:
+            local.depth = depth - 1 if depth > 0 else depth + 1
+            return
+        local.depth = 0
+        with self._cond:
+            self._readers -= 1
+            if not self._readers:
+                self._cond.notify_all()
+
+    def acquire_write(self, blocking=True):
+        local = self._local
+        depth = getattr(local, 'depth', 0)
+        if depth < 0:
+            local.depth = depth - 1
+            return True
+        if depth > 0:
+            raise RuntimeError("cannot upgrade a read lock to a write lock")
+        with self._cond:
+            if not blocking and (self._writer is not None or self._readers):
+                return False
+            self._writers_waiting += 1
+            try:
+                while self._writer is not None or self._readers:
+                    self._cond.wait()
+            finally:
+                self._writers_waiting -= 1
+            self._writer = threading.get_ident()
+        local.depth = -1
+        return True
+
+    def release_write(self):
+        local = self._local
+        if local.depth != -1:
+            local.depth += 1
+            return
+        local.depth = 0
+        with self._cond:
+            self._writer = None
+            self._cond.notify_all()
+
+    @contextmanager
+    def read(self):
+        self.acquire_read()
+        try:
+            yield
+        finally:
+            self.release_read()
+
+    @contextmanager
+    def write(self):
+        self.acquire_write()
+        try:
+            yield
+        finally:
+            self.release_write()
+
+
+class NullLock(RWLock):
+    """Stand-in for RWLock when a single thread owns the data."""
+
+    def __init__(self):
+        pass
+
+    def acquire_read(self, blocking=True):
+        return True
+
+    def release_read(self):
+        pass
+
+    def acquire_write(self, blocking=True):
+        return True
+
+    def release_write(self):
+        pass
+
+
+def reads(method):
+    """Run a method holding ``self.lock`` for reading."""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        lock = self.lock
+        lock.acquire_read()
+        try:
+            return method(self, *args, **kwargs)
+        finally:
+            lock.release_read()
+    return wrapper
+
+
+def writes(method):
+    """Run a method holding ``self.lock`` for writing, so it applies atomically."""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        lock = self.lock
+        lock.acquire_write()
+        try:
+            return method(self, *args, **kwargs)
+        finally:
+            lock.release_write()
+    return wrapper
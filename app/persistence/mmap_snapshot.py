@@ -0,0 +1,357 @@
+import json
+import mmap
+import struct
+import threading
+from bisect import bisect_left, bisect_right
+from array import array
+from app.persistence.repository import InMemoryRepository
+
+MAGIC = b'FLTSNAP1'
+_PREAMBLE = struct.Struct('<8sQ')  # magic, header length
+_LIST_SEPARATOR = '\x1f'
+
+# Record fields per entity class. Fixed-width kinds are struct format
+# characters stored as one column each; 'str' and 'str?' (nullable) use an
+# offset table into a shared heap; 'list' is a list of ids stored as one
+# joined string; 'enum' stores a one-byte code into a value table.
+SCHEMAS = {
+    'User': (('id', 'str'), ('created_at', 'q'), ('updated_at', 'q'),
+             ('first_name', 'str'), ('last_name', 'str'), ('email', 'str'), ('is_admin', '?')),
+    'Report': (('id', 'str'), ('created_at', 'q'), ('updated_at', 'q'), ('comment', 'str')),
+    'Bus': (('id', 'str'), ('created_at', 'q'), ('updated_at', 'q'),
+            ('name', 'str'), ('description', 'str'), ('price', 'd'), ('length', 'd'),
+            ('capacity', 'd'), ('engine_type', 'enum'), ('euro_standard', 'q'), ('status', 'b'),
+            ('owner_id', 'str?'), ('route_ids', 'list'), ('report_ids', 'list')),
+    'Route': (('id', 'str'), ('created_at', 'q'), ('updated_at', 'q'),
+              ('route_number', 'str'), ('name', 'str'), ('user_id', 'str?'), ('bus_ids', 'list')),
+    'Assignment': (('id', 'str'), ('created_at', 'q'), ('updated_at', 'q'),
+                   ('bus_id', 'str'), ('route_id', 'str'), ('start', 'q'), ('end', 'q')),
+    'Maintenance': (('id', 'str'), ('created_at', 'q'), ('updated_at', 'q'),
+                    ('bus_id', 'str'), ('type', 'str'), ('start', 'q'), ('end', 'q'),
+                    ('technician_id', 'str?')),
+}
+
+
+def _sort_key(value):
+    # None sorts before every other value of the column
+    return (value is not None, value)
+
+
+def write_table(path, model_name, records, indexes=()):
+    """Write records of one entity class as a memory-mappable columnar file.
+
+    Every column lives in its own contiguous, 8-byte aligned section. Each
+    attribute in ``indexes`` (plus ``id``, always) gets a section of row
+    numbers sorted by that attribute, so readers can binary-search it
+    without building anything in memory.
+    """
+    schema = SCHEMAS[model_name]
+    columns = {name: [] for name, _ in schema}
+    count = 0
+    for record in records:
+        for name, _ in schema:
+            columns[name].append(record[name])
+        count += 1
+
+    sections = []
+    header = {"model": model_name, "rows": count, "columns": {}, "indexes": {}}
+
+    for name, kind in schema:
+        values = columns[name]
+        if kind in ('str', 'str?', 'list'):
+            heap = bytearray()
+            offsets = array('Q', [0])
+            nulls = bytearray(count)
+            for row, value in enumerate(values):
+                if value is None:
+                    nulls[row] = 1
+                    value = ''
+                elif kind == 'list':
+                    value = _LIST_SEPARATOR.join(value)
+                heap += value.encode()
+                offsets.append(len(heap))
+            entry = {"kind": kind, "offsets": len(sections), "heap": len(sections) + 1}
+            sections += [offsets.tobytes(), bytes(heap)]
+            if kind == 'str?':
+                entry["nulls"] = len(sections)
+                sections.append(bytes(nulls))
+        elif kind == 'enum':
+            table = sorted(set(values))
+            codes = {value: code for code, value in enumerate(table)}
+            entry = {"kind": kind, "values": table, "data": len(sections)}
+            sections.append(bytes(codes[value] for value in values))
+        else:
+            entry = {"kind": kind, "data": len(sections)}
+            sections.append(struct.pack(f'<{count}{kind}', *values))
+        header["columns"][name] = entry
+
+    for name in ('id',) + tuple(indexes):
+        values = columns[name]
+        rows = sorted(range(count), key=lambda row: _sort_key(values[row]))
+        header["indexes"][name] = len(sections)
+        sections.append(array('I', rows).tobytes())
+
+    # Resolve section numbers to absolute offsets, padding to 8 bytes.
+    placeholder = json.dumps(header).encode()
+    base = _PREAMBLE.size + len(placeholder) + 64 * len(sections) + 64
+    base += -base % 8
+    offsets = []
+    position = base
+    for section in sections:
+        offsets.append(position)
+        position += len(section) + (-len(section) % 8)
+    header["sections"] = offsets
+    encoded = json.dumps(header).encode()
+    encoded += b' ' * (base - _PREAMBLE.size - len(encoded))
+
+    with open(path, 'wb') as f:
+        f.write(_PREAMBLE.pack(MAGIC, len(encoded)))
+        f.write(encoded)
+        for section in sections:
+            f.write(section)
+            f.write(b'\0' * (-len(section) % 8))
+
+
+class MappedTable:
+    """Read-only, lazily decoded view of a file written by ``write_table``.
+
+    The file is mapped with ``mmap`` so opening it costs only the JSON
+    header, and the pages are shared by every process mapping the same
+    file. Rows are decoded one field at a time, on demand.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, length = _PREAMBLE.unpack_from(self._mm, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a fleet snapshot")
+        header = json.loads(self._mm[_PREAMBLE.size:_PREAMBLE.size + length])
+        self.model_name = header["model"]
+        self.rows = header["rows"]
+        self.schema = SCHEMAS[self.model_name]
+        sections = header["sections"]
+        self._columns = {}
+        for name, entry in header["columns"].items():
+            entry = dict(entry)
+            for key in ('offsets', 'heap', 'nulls', 'data'):
+                if key in entry:
+                    entry[key] = sections[entry[key]]
+            self._columns[name] = entry
+        self._indexes = {name: memoryview(self._mm)[sections[section]:
+                                                   sections[section] + 4 * self.rows].cast('I')
+                         for name, section in header["indexes"].items()}
+
+    def __len__(self):
+        return self.rows
+
+    @property
+    def indexed(self):
+        return tuple(self._indexes)
+
+    def value(self, name, row):
+        entry = self._columns[name]
+        kind = entry["kind"]
+        if kind in ('str', 'str?', 'list'):
+            if kind == 'str?' and self._mm[entry["nulls"] + row]:
+                return None
+            start, end = struct.unpack_from('<QQ', self._mm, entry["offsets"] + 8 * row)
+            text = self._mm[entry["heap"] + start:entry["heap"] + end].decode()
+            if kind == 'list':
+                return text.split(_LIST_SEPARATOR) if text else []
+            return text
+        if kind == 'enum':
+            return entry["values"][self._mm[entry["data"] + row]]
+        return struct.unpack_from(f'<{kind}', self._mm,
+                                  entry["data"] + struct.calcsize(kind) * row)[0]
+
+    def record(self, row):
+        return {name: self.value(name, row) for name, _ in self.schema}
+
+    def lookup(self, name, value):
+        """Rows whose column equals value, in row order, by binary search."""
+        rows = self._indexes[name]
+        key = _sort_key(value)
+
+        def row_key(row):
+            return _sort_key(self.value(name, row))
+
+        try:
+            start = bisect_left(rows, key, key=row_key)
+            end = bisect_right(rows, key, lo=start, key=row_key)
+        except TypeError:
+            return []
+        return sorted(rows[start:end])
+
+    def find(self, obj_id):
+        # ids are unique, so the first candidate row is the only one
+        rows = self._indexes['id']
+        try:
+            start = bisect_left(rows, obj_id, key=lambda row: self.value('id', row))
+        except TypeError:
+            return None
+        if start < self.rows and self.value('id', rows[start]) == obj_id:
+            return rows[start]
+        return None
+
+    def close(self):
+        for view in self._indexes.values():
+            view.release()
+        self._mm.close()
+
+
+class MappedRepository(InMemoryRepository):
+    """Repository serving a MappedTable, decoding each entity on first access.
+
+    Decoded entities move into the in-memory store (keeping their row
+    number as their position), where they are indexed and observed like
+    any other. Entities added later are kept in memory after the mapped
+    rows. Scans walk the mapped rows in file order, so only the later
+    entities go into the in-memory scan order. Lookups on attributes indexed in the file binary-search the
+    mapped index and only decode the matching rows.
+    """
+
+    def __init__(self, table, model, unique_indexes=(), indexes=()):
+        super().__init__(unique_indexes=unique_indexes, indexes=indexes)
+        self.table = table
+        self.model = model
+        self._next_seq = len(table)
+        self._deleted = set()
+        self._mapped_live = 0
+        # Readers decode rows too, under the facade's shared read lock.
+        self._materialize_lock = threading.Lock()
+
+    def _materialize(self, row):
+        with self._materialize_lock:
+            # Another reader may have decoded the row while we waited.
+            obj = self._storage.get(self.table.value('id', row))
+            if obj is None:
+                obj = self.model.from_record(self.table.record(row), self.references)
+                self._insert(obj, row)
+                self._mapped_live += 1
+            return obj
+
+    def _add_to_order(self, seq):
+        # Rows are already in order in the file; sorting them into _order
+        # as they are decoded would cost O(n) per random read.
+        if seq >= len(self.table):
+            super()._add_to_order(seq)
+
+    def _mapped_rows(self, attr_name, attr_value):
+        """Rows holding attr_value that are neither decoded nor deleted."""
+        rows = []
+        for row in self.table.lookup(attr_name, attr_value):
+            obj_id = self.table.value('id', row)
+            if obj_id not in self._storage and obj_id not in self._deleted:
+                rows.append(row)
+        return rows
+
+    def _materialize_matches(self, attr_name, attr_value):
+        for row in self._mapped_rows(attr_name, attr_value):
+            self._materialize(row)
+
+    def add(self, obj):
+        for index in self._indexes.values():
+            if index.unique:
+                self.check_attribute(obj, index.attr_name, getattr(obj, index.attr_name, None))
+        if obj.id not in self._storage and self.table.find(obj.id) is not None:
+            self._deleted.add(obj.id)
+        super().add(obj)
+
+    def add_many(self, objs):
+        objs = list(objs)
+        for obj in objs:
+            for index in self._indexes.values():
+                if index.unique:
+                    self.check_attribute(obj, index.attr_name, getattr(obj, index.attr_name, None))
+        super().add_many(objs)
+        for obj in objs:
+            if self._positions[obj.id] >= len(self.table) and self.table.find(obj.id) is not None:
+                self._deleted.add(obj.id)
+
+    def get(self, obj_id):
+        obj = self._storage.get(obj_id)
+        if obj is not None or obj_id in self._deleted:
+            return obj
+        row = self.table.find(obj_id)
+        return self._materialize(row) if row is not None else None
+
+    def get_many(self, obj_ids):
+        found = {}
+        for obj_id in obj_ids:
+            obj = self.get(obj_id)
+            if obj is not None:
+                found[obj_id] = obj
+        return found
+
+    def get_all(self):
+        return list(self.scan())
+
+    def delete(self, obj_id):
+        obj = self.get(obj_id)
+        if obj is None:
+            return
+        if self._positions[obj_id] < len(self.table):
+            self._deleted.add(obj_id)
+            self._mapped_live -= 1
+        super().delete(obj_id)
+
+    def get_by_attribute(self, attr_name, attr_value):
+        if attr_name in self.table.indexed:
+            self._materialize_matches(attr_name, attr_value)
+            return super().get_by_attribute(attr_name, attr_value)
+        return next(iter(self.scan(filters={attr_name: attr_value})), None)
+
+    def get_all_by_attribute(self, attr_name, attr_value):
+        if attr_name in self.table.indexed:
+            self._materialize_matches(attr_name, attr_value)
+            return super().get_all_by_attribute(attr_name, attr_value)
+        return list(self.scan(filters={attr_name: attr_value}))
+
+    def has_index(self, attr_name):
+        # Mapped rows only reach the in-memory indexes once materialized,
+        # so indexed filters go through scan, which does that first.
+        return False
+
+    def scan(self, after=None, filters=None):
+        filters = dict(filters or {})
+        indexed = [name for name in filters
+                   if name in self.table.indexed and name in self._indexes]
+        if indexed:
+            # Every match holds the most selective value, so decoding the
+            # mapped rows for that one filter is enough.
+            candidates = min((self._mapped_rows(name, filters[name]) for name in indexed), key=len)
+            for row in candidates:
+                self._materialize(row)
+            yield from super().scan(after, filters)
+            return
+
+        start = 0 if after is None else after + 1
+        for row in range(start, len(self.table)):
+            obj_id = self.table.value('id', row)
+            if obj_id in self._deleted:
+                continue
+            obj = self._storage.get(obj_id)
+            if obj is None:
+                obj = self._materialize(row)
+            if all(getattr(obj, name, None) == value for name, value in filters.items()):
+                yield obj
+        yield from super().scan(max(len(self.table) - 1, -1 if after is None else after), filters)
+
+    def __len__(self):
+        mapped = len(self.table) - len(self._deleted)
+        return mapped + len(self._storage) - self._mapped_live
+
+    def check_attribute(self, obj, name, value):
+        super().check_attribute(obj, name, value)
+        attr_name = name.lstrip('_')
+        index = self._indexes.get(attr_name)
+        if index is not None and index.unique and value is not None \
+                and attr_name in self.table.indexed:
+            for row in self._mapped_rows(attr_name, value):
+                if self.table.value('id', row) != obj.id:
+                    raise ValueError(f"{attr_name} '{value}' already exists")
+
+    def close(self):
+        self.table.close()
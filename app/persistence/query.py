@@ -0,0 +1,422 @@
+"""Declarative filters over a repository, planned against its hash indexes.
+
+Filters are written as a dict, Django style::
+
+    {'status': 1, 'price__gte': 100000, 'engine_type__in': ['electric', 'hybrid'],
+     'name__prefix': 'Line', 'or': [{'euro_standard': 6}, {'owner_id': owner_id}]}
+
+Every key is an attribute with an optional ``__eq``, ``__in``, ``__gt``,
+``__gte``, ``__lt``, ``__lte`` or ``__prefix`` lookup; keys are AND-ed, and
+``or`` / ``and`` take a list of nested filter dicts. ``parse`` turns the dict
+into a predicate, ``Query`` plans and runs it.
+"""
+import heapq
+from abc import ABC, abstractmethod
+from itertools import islice
+
+# Intersect two index buckets when the larger is at most this many times the
+# smaller: intersecting position sets runs in C, while filtering the smaller
+# bucket costs an attribute check in Python per object.
+INTERSECT_RATIO = 10
+
+LOOKUPS = ('eq', 'in', 'gt', 'gte', 'lt', 'lte', 'prefix')
+
+
+class Predicate(ABC):
+    @abstractmethod
+    def matches(self, obj): pass
+
+    def conjuncts(self):
+        return [self]
+
+
+class Eq(Predicate):
+    def __init__(self, attr, value):
+        self.attr = attr
+        self.value = value
+
+    def matches(self, obj):
+        return getattr(obj, self.attr, None) == self.value
+
+    def __str__(self):
+        return f"{self.attr} = {self.value!r}"
+
+
+class In(Predicate):
+    def __init__(self, attr, values):
+        self.attr = attr
+        self.values = tuple(dict.fromkeys(values))
+
+    def matches(self, obj):
+        return getattr(obj, self.attr, None) in self.values
+
+    def __str__(self):
+        return f"{self.attr} IN ({', '.join(map(repr, self.values))})"
+
+
+class Range(Predicate):
+    """Bound on one side: ``op`` is one of gt, gte, lt, lte."""
+
+    SYMBOLS = {'gt': '>', 'gte': '>=', 'lt': '<', 'lte': '<='}
+
+    def __init__(self, attr, op, value):
+        self.attr = attr
+        self.op = op
+        self.value = value
+
+    def matches(self, obj):
+        value = getattr(obj, self.attr, None)
+        if value is None:
+            return False
+        try:
+            if self.op == 'gt':
+                return value > self.value
+            if self.op == 'gte':
+                return value >= self.value
+            if self.op == 'lt':
+                return value < self.value
+            return value <= self.value
+        except TypeError:
+            return False
+
+    def __str__(self):
+        return f"{self.attr} {self.SYMBOLS[self.op]} {self.value!r}"
+
+
+class Prefix(Predicate):
+    def __init__(self, attr, prefix):
+        self.attr = attr
+        self.prefix = prefix
+
+    def matches(self, obj):
+        value = getattr(obj, self.attr, None)
+        return isinstance(value, str) and value.startswith(self.prefix)
+
+    def __str__(self):
+        return f"{self.attr} STARTS WITH {self.prefix!r}"
+
+
+class And(Predicate):
+    def __init__(self, *predicates):
+        self.predicates = predicates
+
+    def matches(self, obj):
+        return all(predicate.matches(obj) for predicate in self.predicates)
+
+    def conjuncts(self):
+        return [c for predicate in self.predicates for c in predicate.conjuncts()]
+
+    def __str__(self):
+        return ' AND '.join(f"({p})" if isinstance(p, Or) else str(p) for p in self.predicates)
+
+
+class Or(Predicate):
+    def __init__(self, *predicates):
+        self.predicates = predicates
+
+    def matches(self, obj):
+        return any(predicate.matches(obj) for predicate in self.predicates)
+
+    def __str__(self):
+        return ' OR '.join(f"({p})" if isinstance(p, And) else str(p) for p in self.predicates)
+
+
+def parse(filters):
+    """Turn a filter dict (or a Predicate, or None) into a Predicate.
+
+    Raises ValueError for an unknown lookup or a malformed value.
+    """
+    if isinstance(filters, Predicate):
+        return filters
+    predicates = []
+    for key, value in (filters or {}).items():
+        if key in ('or', 'and'):
+            if not isinstance(value, (list, tuple)) or not value:
+                raise ValueError(f"{key} takes a non-empty list of filters")
+            parts = [parse(part) for part in value]
+            predicates.append(Or(*parts) if key == 'or' else And(*parts))
+            continue
+        attr, _, lookup = key.partition('__')
+        lookup = lookup or 'eq'
+        if lookup not in LOOKUPS:
+            raise ValueError(f"Unknown lookup '{lookup}' in {key}")
+        if lookup == 'eq':
+            predicates.append(Eq(attr, value))
+        elif lookup == 'in':
+            if not isinstance(value, (list, tuple, set, frozenset)):
+                raise ValueError(f"{key} takes a list of values")
+            predicates.append(In(attr, value))
+        elif lookup == 'prefix':
+            if not isinstance(value, str):
+                raise ValueError(f"{key} takes a string")
+            predicates.append(Prefix(attr, value))
+        else:
+            predicates.append(Range(attr, lookup, value))
+    return predicates[0] if len(predicates) == 1 else And(*predicates)
+
+
+def parse_order(order_by):
+    """Turn 'name' / '-price' or a list of them into (attr, descending) pairs."""
+    if not order_by:
+        return []
+    if isinstance(order_by, str):
+        order_by = order_by.split(',')
+    return [(key.lstrip('-'), key.startswith('-')) for key in order_by if key.lstrip('-')]
+
+
+class _Plan(ABC):
+    """A node of a query plan; ``rows`` is the planner's estimate."""
+
+    rows = None
+    children = ()
+
+    @abstractmethod
+    def describe(self): pass
+
+    def lines(self, depth=0):
+        estimate = f" (est. {self.rows} rows)" if self.rows is not None else ''
+        yield '  ' * depth + self.describe() + estimate
+        for child in self.children:
+            yield from child.lines(depth + 1)
+
+
+class IndexScan(_Plan):
+    """Read the buckets of one indexed attribute for one or more values."""
+
+    def __init__(self, repo, predicate):
+        self.repo = repo
+        self.predicate = predicate
+        self.attr = predicate.attr
+        self.values = (predicate.value,) if isinstance(predicate, Eq) else predicate.values
+        self.rows = sum(repo.index_count(self.attr, value) for value in self.values)
+
+    def describe(self):
+        return f"IndexScan {self.predicate}"
+
+    def positions(self):
+        sets = [self.repo.index_positions(self.attr, value) for value in self.values]
+        return sets[0] if len(sets) == 1 else set().union(*sets)
+
+    def __call__(self, after=None):
+        if len(self.values) == 1:
+            return self.repo.index_scan(self.attr, self.values[0], after)
+        return heapq.merge(*(self.repo.index_scan(self.attr, value, after)
+                             for value in self.values), key=self.repo.position)
+
+
+class _PositionSet(_Plan):
+    """Combine the position sets of child plans, then read the objects in order."""
+
+    def __init__(self, repo, children):
+        self.repo = repo
+        self.children = children
+
+    def __call__(self, after=None):
+        positions = sorted(self.positions())
+        if after is not None:
+            positions = [position for position in positions if position > after]
+        return self.repo.at_positions(positions)
+
+
+class IndexIntersection(_PositionSet):
+    def __init__(self, repo, children):
+        super().__init__(repo, sorted(children, key=lambda child: child.rows))
+        self.rows = self.children[0].rows
+
+    def describe(self):
+        return "IndexIntersection"
+
+    def positions(self):
+        smallest, *others = self.children
+        found = set(smallest.positions())
+        for child in others:
+            if not found:
+                break
+            found.intersection_update(child.positions())
+        return found
+
+
+class IndexUnion(_PositionSet):
+    def __init__(self, repo, children):
+        super().__init__(repo, children)
+        self.rows = sum(child.rows for child in children)
+
+    def describe(self):
+        return "IndexUnion"
+
+    def positions(self):
+        return set().union(*(child.positions() for child in self.children))
+
+
+class FullScan(_Plan):
+    """Walk the repository, pushing plain equality filters down to its scan."""
+
+    def __init__(self, repo, pushed):
+        self.repo = repo
+        self.pushed = pushed
+
+    def describe(self):
+        if self.pushed:
+            return f"Scan {' AND '.join(map(str, self.pushed))} (filtered by the repository)"
+        return "FullScan"
+
+    def __call__(self, after=None):
+        return self.repo.scan(after, {predicate.attr: predicate.value for predicate in self.pushed})
+
+
+class Query:
+    """A filter, ordering and limit over one repository.
+
+    The planner looks at the AND-ed parts of the filter: equality and IN
+    parts on an indexed attribute become index scans, and an OR whose every
+    branch has one becomes an index union. The most selective access path
+    drives the query, and others of comparable size are intersected with it;
+    without any, the repository is scanned. What the access path does not
+    guarantee is checked on each candidate.
+
+    Results follow insertion order unless ``order_by`` is given.
+    """
+
+    def __init__(self, repo, filters=None, order_by=None, limit=None):
+        self.repo = repo
+        self.predicate = parse(filters) if filters else None
+        self.order_by = parse_order(order_by)
+        self.limit = limit
+        self.access, self.residual = self._plan()
+
+    def _plan(self):
+        conjuncts = self.predicate.conjuncts() if self.predicate else []
+        paths, rest = [], []
+        for conjunct in conjuncts:
+            path = self._access_path(conjunct)
+            if path is None:
+                rest.append(conjunct)
+            else:
+                paths.append((path, conjunct))
+        if not paths:
+            pushed = [c for c in rest if isinstance(c, Eq)]
+            return FullScan(self.repo, pushed), [c for c in rest if not isinstance(c, Eq)]
+
+        paths.sort(key=lambda entry: entry[0].rows)
+        best = paths[0][0]
+        chosen = [best] + [path for path, _ in paths[1:]
+                           if path.rows <= max(best.rows, 1) * INTERSECT_RATIO]
+        residual = rest + [conjunct for path, conjunct in paths if path not in chosen]
+        # An OR is only narrowed by its union, so its branches are rechecked.
+        residual += [conjunct for path, conjunct in paths
+                     if path in chosen and isinstance(path, IndexUnion)]
+        access = chosen[0] if len(chosen) == 1 else IndexIntersection(self.repo, chosen)
+        return access, residual
+
+    def _access_path(self, predicate):
+        if isinstance(predicate, (Eq, In)):
+            if not self.repo.has_index(predicate.attr):
+                return None
+            return IndexScan(self.repo, predicate)
+        if isinstance(predicate, Or):
+            branches = []
+            for branch in predicate.predicates:
+                paths = [self._access_path(c) for c in branch.conjuncts()]
+                paths = [path for path in paths if path is not None]
+                if not paths:
+                    return None
+                branches.append(min(paths, key=lambda path: path.rows))
+            return IndexUnion(self.repo, branches)
+        return None
+
+    def __iter__(self):
+        return self._run()
+
+    def all(self):
+        return list(self._run())
+
+    def page(self, limit, after=None):
+        """Up to limit matches after a position, and the next position (see Repository.page).
+
+        With order_by the positions are keysets instead: the sort values of
+        the last item returned followed by its insertion position, which
+        breaks ties, as a tuple.
+        """
+        if self.order_by:
+            return self._keyset_page(limit, after)
+        if isinstance(after, tuple):
+            raise ValueError("cursor requires the order_by it was issued for")
+        items = list(islice(self._run(after), limit + 1))
+        if len(items) > limit:
+            return items[:limit], self.repo.position(items[limit - 1])
+        return items, None
+
+    def _keyset_page(self, limit, after):
+        if after is not None and (not isinstance(after, tuple)
+                                  or len(after) != len(self.order_by) + 1):
+            raise ValueError("cursor does not match order_by")
+        matches = self._matches()
+        if after is not None:
+            matches = (obj for obj in matches if self._follows(obj, after))
+        try:
+            items = list(self._ordered(matches, limit + 1))
+        except TypeError:
+            raise ValueError("cursor does not match order_by")
+        if len(items) > limit:
+            last = items[limit - 1]
+            return items[:limit], tuple(getattr(last, attr, None) for attr, _ in self.order_by) \
+                + (self.repo.position(last),)
+        return items, None
+
+    def _follows(self, obj, keyset):
+        """Whether obj sorts after the item keyset was taken from."""
+        for (attr, descending), bound in zip(self.order_by, keyset):
+            value, bound = _sort_key(getattr(obj, attr, None)), _sort_key(bound)
+            if value != bound:
+                return value < bound if descending else value > bound
+        return self.repo.position(obj) > keyset[-1]
+
+    def _matches(self, after=None):
+        matches = self.access(after)
+        if self.residual:
+            residual = self.residual
+            matches = (obj for obj in matches if all(c.matches(obj) for c in residual))
+        return matches
+
+    def _run(self, after=None, limit=None):
+        limit = self.limit if limit is None else min(limit, self.limit or limit)
+        return self._ordered(self._matches(after), limit)
+
+    def _ordered(self, matches, limit):
+        # Sorts are stable, so ties keep insertion order.
+        if not self.order_by:
+            return matches if limit is None else islice(matches, limit)
+
+        def key(obj):
+            return [_sort_key(getattr(obj, attr, None)) for attr, _ in self.order_by]
+
+        if len(self.order_by) == 1:
+            descending = self.order_by[0][1]
+            if limit is not None:
+                pick = heapq.nlargest if descending else heapq.nsmallest
+                return iter(pick(limit, matches, key=key))
+            return iter(sorted(matches, key=key, reverse=descending))
+        ordered = list(matches)
+        for attr, descending in reversed(self.order_by):
+            ordered.sort(key=lambda obj: _sort_key(getattr(obj, attr, None)), reverse=descending)
+        return iter(ordered if limit is None else ordered[:limit])
+
+    def explain(self):
+        """The chosen plan as an indented tree, outermost step first."""
+        steps = []
+        if self.limit is not None:
+            steps.append(f"Limit {self.limit}")
+        if self.order_by:
+            steps.append("Sort by " + ', '.join(('-' if desc else '') + attr
+                                                for attr, desc in self.order_by))
+        if self.residual:
+            steps.append("Filter " + ' AND '.join(
+                f"({c})" if isinstance(c, Or) else str(c) for c in self.residual))
+        lines = ['  ' * depth + step for depth, step in enumerate(steps)]
+        lines.extend(self.access.lines(len(steps)))
+        return '\n'.join(lines)
+
+
+def _sort_key(value):
+    # Missing values sort first instead of failing the comparison.
+    return (value is not None, value)
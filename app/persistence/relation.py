@@ -0,0 +1,52 @@
+class RelationStore:
+    """Many-to-many relation between two entity kinds, indexed both ways.
+
+    Each side maps an id to the ordered set of ids it is linked to, so
+    listing the neighbours of one entity costs O(degree).
+    """
+
+    def __init__(self):
+        self._forward = {}
+        self._backward = {}
+
+    def link(self, left_id, right_id):
+        self._forward.setdefault(left_id, {})[right_id] = None
+        self._backward.setdefault(right_id, {})[left_id] = None
+
+    def unlink(self, left_id, right_id):
+        self._discard(self._forward, left_id, right_id)
+        self._discard(self._backward, right_id, left_id)
+
+    def set_rights(self, left_id, right_ids):
+        """Replace every link of left_id with links to right_ids."""
+        for right_id in self.rights(left_id):
+            self.unlink(left_id, right_id)
+        for right_id in right_ids:
+            self.link(left_id, right_id)
+
+    def remove_left(self, left_id):
+        """Drop left_id and its links, returning the ids it was linked to."""
+        right_ids = list(self._forward.pop(left_id, {}))
+        for right_id in right_ids:
+            self._discard(self._backward, right_id, left_id)
+        return right_ids
+
+    def remove_right(self, right_id):
+        left_ids = list(self._backward.pop(right_id, {}))
+        for left_id in left_ids:
+            self._discard(self._forward, left_id, right_id)
+        return left_ids
+
+    def rights(self, left_id):
+        return list(self._forward.get(left_id, ()))
+
+    def lefts(self, right_id):
+        return list(self._backward.get(right_id, ()))
+
+    @staticmethod
+    def _discard(side, key, value):
+        linked = side.get(key)
+        if linked is not None:
+            linked.pop(value, None)
+            if not linked:
+                del side[key]
@@ -1,12 +1,27 @@
 from abc import ABC, abstractmethod
+from bisect import bisect_right, insort
+from itertools import islice
+from app.persistence.index import HashIndex
 
 class Repository(ABC):
+    references = {}
+    # Bumped by every write made through the repository (adds, deletes and
+    # attribute changes of stored objects); collection ETags derive from it.
+    modifications = 0
+
     @abstractmethod
     def add(self, obj): pass
 
+    def add_many(self, objs):
+        for obj in objs:
+            self.add(obj)
+
     @abstractmethod
     def get(self, obj_id): pass
 
+    @abstractmethod
+    def get_many(self, obj_ids): pass
+
     @abstractmethod
     def get_all(self): pass
 
@@ -19,17 +34,122 @@ class Repository(ABC):
     @abstractmethod
     def get_by_attribute(self, attr_name, attr_value): pass
 
+    @abstractmethod
+    def get_all_by_attribute(self, attr_name, attr_value): pass
+
+    @abstractmethod
+    def scan(self, after=None, filters=None): pass
+
+    def page(self, limit, after=None, filters=None):
+        """Return up to limit objects after a position, and the next position.
+
+        Positions are opaque integers following insertion order; the next
+        position is None when there is nothing left to read.
+        """
+        items = list(islice(self.scan(after, filters), limit + 1))
+        if len(items) > limit:
+            return items[:limit], self.position(items[limit - 1])
+        return items, None
+
+    @abstractmethod
+    def position(self, obj): pass
+
+    def has_index(self, attr_name):
+        """Whether the query planner can read attr_name's values through
+        index_count, index_scan, index_positions and at_positions."""
+        return False
+
+    def bind_references(self, **repositories):
+        """Name the repositories holding related entities, for loading relations."""
+        self.references = repositories
+
+    def open(self):
+        """Load persisted state; called once references are bound."""
+
+    def close(self):
+        """Flush and release any files or connections."""
+
 
 class InMemoryRepository(Repository):
-    def __init__(self):
+    """Dict-backed repository with optional hash indexes on attributes.
+
+    ``unique_indexes`` and ``indexes`` name the attributes to index. Stored
+    objects notify the repository when an attribute changes, so the indexes
+    stay correct whether the change goes through ``update`` or a setter.
+
+    Every object gets an increasing sequence number when added; ``scan``
+    and ``page`` walk objects in that order and can resume from any
+    sequence number with a binary search.
+    """
+
+    def __init__(self, unique_indexes=(), indexes=()):
         self._storage = {}
+        self._positions = {}
+        self._by_seq = {}
+        self._order = []
+        self._next_seq = 0
+        self._indexes = {}
+        for attr_name in unique_indexes:
+            self._indexes[attr_name] = HashIndex(attr_name, unique=True)
+        for attr_name in indexes:
+            self._indexes[attr_name] = HashIndex(attr_name)
 
     def add(self, obj):
+        for index in self._indexes.values():
+            index.check(obj, getattr(obj, index.attr_name, None))
+        if obj.id in self._storage:
+            self.delete(obj.id)
+        seq = self._next_seq
+        self._next_seq += 1
+        self._insert(obj, seq)
+        self.modifications += 1
+
+    def add_many(self, objs):
+        """Add a batch of objects, checking every unique index before inserting any."""
+        objs = list(objs)
+        for index in self._indexes.values():
+            if not index.unique:
+                continue
+            seen = set()
+            for obj in objs:
+                value = getattr(obj, index.attr_name, None)
+                index.check(obj, value)
+                if value is not None:
+                    if value in seen:
+                        raise ValueError(f"{index.attr_name} '{value}' already exists")
+                    seen.add(value)
+        for obj in objs:
+            if obj.id in self._storage:
+                self.delete(obj.id)
+            seq = self._next_seq
+            self._next_seq += 1
+            self._insert(obj, seq)
+        self.modifications += 1
+
+    def _insert(self, obj, seq):
         self._storage[obj.id] = obj
+        self._positions[obj.id] = seq
+        self._by_seq[seq] = obj
+        self._add_to_order(seq)
+        for index in self._indexes.values():
+            index.add(obj, seq)
+        obj.add_observer(self)
+
+    def _add_to_order(self, seq):
+        """Record seq in the sorted list walked by unfiltered scans."""
+        if not self._order or seq > self._order[-1]:
+            self._order.append(seq)
+        else:
+            insort(self._order, seq)
 
     def get(self, obj_id):
         return self._storage.get(obj_id)
 
+    def get_many(self, obj_ids):
+        """Return a dict of the stored objects among obj_ids, keyed by id."""
+        storage = self._storage
+        return {obj_id: storage[obj_id] for obj_id in obj_ids if obj_id in storage}
+
     def get_all(self):
         return list(self._storage.values())
 
@@ -40,8 +160,99 @@ class InMemoryRepository(Repository):
 
     def delete(self, obj_id):
         if obj_id in self._storage:
-            del self._storage[obj_id]
+            obj = self._storage.pop(obj_id)
+            del self._by_seq[self._positions.pop(obj_id)]
+            for index in self._indexes.values():
+                index.remove(obj)
+            obj.remove_observer(self)
+            self.modifications += 1
+            if len(self._order) > 2 * len(self._by_seq) + 1024:
+                self._order[:] = [seq for seq in self._order if seq in self._by_seq]
 
     def get_by_attribute(self, attr_name, attr_value):
+        index = self._indexes.get(attr_name)
+        if index is not None:
+            return index.get(attr_value)
         return next((obj for obj in self._storage.values()
                      if getattr(obj, attr_name) == attr_value), None)
+
+    def get_all_by_attribute(self, attr_name, attr_value):
+        index = self._indexes.get(attr_name)
+        if index is not None:
+            return index.get_all(attr_value)
+        return [obj for obj in self._storage.values()
+                if getattr(obj, attr_name) == attr_value]
+
+    def scan(self, after=None, filters=None):
+        """Yield objects in insertion order, starting after a position.
+
+        ``filters`` maps attribute names to required values. The indexed
+        filter with the smallest bucket drives the walk; the others are
+        checked on each candidate.
+        """
+        filters = dict(filters or {})
+        indexed = [(self._indexes[name].count(value), name)
+                   for name, value in filters.items() if name in self._indexes]
+        if indexed:
+            _, name = min(indexed)
+            source = self._indexes[name].scan(filters.pop(name), after)
+        else:
+            source = self._scan_order(after)
+
+        for obj in source:
+            if all(getattr(obj, name, None) == value for name, value in filters.items()):
+                yield obj
+
+    def position(self, obj):
+        return self._positions.get(obj.id)
+
+    def has_index(self, attr_name):
+        return attr_name in self._indexes
+
+    def index_count(self, attr_name, value):
+        return self._indexes[attr_name].count(value)
+
+    def index_scan(self, attr_name, value, after=None):
+        return self._indexes[attr_name].scan(value, after)
+
+    def index_positions(self, attr_name, value):
+        """Set-like view of the positions of the objects holding value."""
+        return self._indexes[attr_name].positions(value)
+
+    def at_positions(self, positions):
+        """Yield the objects still stored at positions, in the given order."""
+        by_seq = self._by_seq
+        for seq in positions:
+            obj = by_seq.get(seq)
+            if obj is not None:
+                yield obj
+
+    def _scan_order(self, after):
+        order = self._order
+        i = 0 if after is None else bisect_right(order, after)
+        while i < len(order):
+            seq = order[i]
+            obj = self._by_seq.get(seq)
+            if obj is not None:
+                yield obj
+            # Re-seek if the order list changed while the caller held the item.
+            if i < len(order) and order[i] == seq:
+                i += 1
+            else:
+                i = bisect_right(order, seq)
+
+    def __len__(self):
+        return len(self._storage)
+
+    def check_attribute(self, obj, name, value):
+        """Reject an attribute change that would break a unique index."""
+        index = self._indexes.get(name.lstrip('_'))
+        if index is not None:
+            index.check(obj, value)
+
+    def attribute_changed(self, obj, name):
+        """Keep the index on ``name`` in step with the object's new value."""
+        self.modifications += 1
+        index = self._indexes.get(name.lstrip('_'))
+        if index is not None:
+            index.refresh(obj)
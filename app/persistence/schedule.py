@@ -0,0 +1,139 @@
+from bisect import bisect_left, bisect_right
+
+
+class ScheduleConflict(ValueError):
+    """Raised when a booking overlaps one already on the same timeline."""
+
+    def __init__(self, key, conflicts):
+        self.key = key
+        self.conflicts = conflicts
+        ids = ', '.join(obj.id for obj in conflicts)
+        super().__init__(f"{key} is already booked in that window ({ids})")
+
+
+class _Timeline:
+    """Non-overlapping bookings of one key, kept sorted by start.
+
+    Because bookings never overlap, sorting by start also sorts the ends,
+    so both an overlap check and a window lookup are two binary searches.
+    """
+
+    __slots__ = ('starts', 'ends', 'objs')
+
+    def __init__(self):
+        self.starts = []
+        self.ends = []
+        self.objs = []
+
+    def window(self, start, end):
+        """Index range of the bookings overlapping [start, end)."""
+        return bisect_right(self.ends, start), bisect_left(self.starts, end)
+
+
+class Schedule:
+    """Per-key sorted interval index of half-open [start, end) bookings.
+
+    Keys are usually bus ids and bounds integer microseconds. Bookings of
+    one key may not overlap: ``add`` raises ScheduleConflict instead, so
+    checking a new booking and inserting it cost O(log n) searches.
+    """
+
+    def __init__(self):
+        self._timelines = {}
+        self._bounds = {}
+
+    def conflicts(self, key, start, end):
+        """Bookings of key overlapping [start, end), in time order."""
+        timeline = self._timelines.get(key)
+        if timeline is None:
+            return []
+        i, j = timeline.window(start, end)
+        return timeline.objs[i:j]
+
+    def add(self, key, start, end, obj):
+        if start >= end:
+            raise ValueError("end must be after start")
+        timeline = self._timelines.get(key)
+        if timeline is None:
+            timeline = self._timelines[key] = _Timeline()
+        i, j = timeline.window(start, end)
+        if i != j:
+            raise ScheduleConflict(key, timeline.objs[i:j])
+        timeline.starts.insert(i, start)
+        timeline.ends.insert(i, end)
+        timeline.objs.insert(i, obj)
+        self._bounds[obj.id] = (key, start)
+
+    def remove(self, obj):
+        entry = self._bounds.pop(obj.id, None)
+        if entry is None:
+            return
+        key, start = entry
+        timeline = self._timelines[key]
+        i = bisect_left(timeline.starts, start)
+        del timeline.starts[i], timeline.ends[i], timeline.objs[i]
+        if not timeline.objs:
+            del self._timelines[key]
+
+    def remove_key(self, key):
+        """Drop every booking of key, returning them."""
+        timeline = self._timelines.pop(key, None)
+        if timeline is None:
+            return []
+        for obj in timeline.objs:
+            del self._bounds[obj.id]
+        return timeline.objs
+
+    def free(self, key, start, end):
+        """Gaps of [start, end) not covered by a booking of key, as (start, end) pairs."""
+        gaps = []
+        cursor = start
+        timeline = self._timelines.get(key)
+        if timeline is not None:
+            i, j = timeline.window(start, end)
+            for k in range(i, j):
+                if timeline.starts[k] > cursor:
+                    gaps.append((cursor, timeline.starts[k]))
+                cursor = max(cursor, timeline.ends[k])
+        if cursor < end:
+            gaps.append((cursor, end))
+        return gaps
+
+    def __len__(self):
+        return len(self._bounds)
+
+
+class TimeIndex:
+    """Bookings of every key in one list sorted by start, for fleet-wide time-range reads.
+
+    Unlike Schedule, bookings here may overlap (they belong to different
+    buses); ``between`` is two binary searches and a slice.
+    """
+
+    def __init__(self):
+        self._starts = []
+        self._objs = []
+
+    def add(self, start, obj):
+        i = bisect_right(self._starts, start)
+        self._starts.insert(i, start)
+        self._objs.insert(i, obj)
+
+    def remove(self, start, obj):
+        i = bisect_left(self._starts, start)
+        while i < len(self._objs) and self._starts[i] == start:
+            if self._objs[i].id == obj.id:
+                del self._starts[i], self._objs[i]
+                return
+            i += 1
+
+    def between(self, start, end, limit=None):
+        """Bookings starting in [start, end), in start order."""
+        i = bisect_left(self._starts, start)
+        j = bisect_left(self._starts, end, lo=i)
+        if limit is not None:
+            j = min(j, i + limit)
+        return self._objs[i:j]
+
+    def __len__(self):
+        return len(self._objs)
@@ -0,0 +1,337 @@
+import json
+import sqlite3
+import threading
+import weakref
+from contextlib import contextmanager
+from app.persistence.repository import Repository
+
+BATCH_SIZE = 500
+
+
+class ConnectionPool:
+    """One SQLite connection per thread, all opened on the same database file.
+
+    Connections are created in WAL mode so readers never block the writer,
+    and keep a statement cache so the repository's fixed SQL strings are
+    prepared once per connection.
+    """
+
+    def __init__(self, path, cached_statements=256):
+        self.path = path
+        self.cached_statements = cached_statements
+        self._local = threading.local()
+        self._connections = []
+        self._lock = threading.Lock()
+
+    def connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, check_same_thread=False,
+                                   cached_statements=self.cached_statements)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            with self._lock:
+                self._connections.append(conn)
+        return conn
+
+    def close_all(self):
+        with self._lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections.clear()
+        self._local = threading.local()
+
+
+class SqliteRepository(Repository):
+    """Repository storing one entity class in one SQLite table.
+
+    Each row holds the entity's ``to_record()`` as JSON, plus one real
+    column per indexed attribute backed by a SQL index, so
+    ``get_by_attribute`` on those attributes is an index lookup, and the
+    query planner reads them through the ``index_*`` methods. The rowid
+    is the insertion sequence used by ``scan`` and ``page``.
+
+    As in ``InMemoryRepository``, adding an object whose id is stored
+    already replaces the stored one, which moves to the end of the order.
+
+    Loaded entities are kept in an identity map and observed like in
+    ``InMemoryRepository``: attribute changes are written back to the row.
+    """
+
+    def __init__(self, pool, table, model, unique_indexes=(), indexes=()):
+        self.pool = pool
+        self.table = table
+        self.model = model
+        self.unique_indexes = tuple(unique_indexes)
+        self.columns = self.unique_indexes + tuple(indexes)
+        self.references = {}
+        self._identity = weakref.WeakValueDictionary()
+        self._identity_lock = threading.Lock()
+        self._local = threading.local()
+
+        for name in (table,) + self.columns:
+            if not name.isidentifier():
+                raise ValueError(f"Invalid SQL identifier: {name}")
+        extra = ''.join(f", {column}" for column in self.columns)
+        placeholders = ', ?' * len(self.columns)
+        assignments = ''.join(f", {column} = ?" for column in self.columns)
+        self._sql_insert = f"INSERT INTO {table} (id, data{extra}) VALUES (?, ?{placeholders})"
+        self._sql_update = f"UPDATE {table} SET data = ?{assignments} WHERE id = ?"
+        self._sql_get = f"SELECT seq, data FROM {table} WHERE id = ?"
+        self._sql_delete = f"DELETE FROM {table} WHERE id = ?"
+        self._sql_count = f"SELECT COUNT(*) FROM {table}"
+        self._create_schema()
+
+    def _create_schema(self):
+        conn = self.pool.connection()
+        column_defs = ''.join(f", {column}" for column in self.columns)
+        with conn:
+            conn.execute(f"CREATE TABLE IF NOT EXISTS {self.table} ("
+                         f"seq INTEGER PRIMARY KEY AUTOINCREMENT, "
+                         f"id TEXT NOT NULL UNIQUE, data TEXT NOT NULL{column_defs})")
+            for column in self.columns:
+                if column in self.unique_indexes:
+                    conn.execute(f"CREATE UNIQUE INDEX IF NOT EXISTS "
+                                 f"idx_{self.table}_{column} ON {self.table} ({column})")
+                else:
+                    # seq keeps each value's rows in scan order
+                    conn.execute(f"CREATE INDEX IF NOT EXISTS "
+                                 f"idx_{self.table}_{column} ON {self.table} ({column}, seq)")
+
+    def _row_values(self, obj):
+        return [getattr(obj, column, None) for column in self.columns]
+
+    def _load(self, data):
+        record = json.loads(data)
+        obj = self._identity.get(record["id"])
+        if obj is not None:
+            return obj
+        # Concurrent readers loading the same row must share one object.
+        with self._identity_lock:
+            obj = self._identity.get(record["id"])
+            if obj is None:
+                obj = self.model.from_record(record, self.references)
+                obj.add_observer(self)
+                self._identity[obj.id] = obj
+            return obj
+
+    def _write(self, obj):
+        conn = self.pool.connection()
+        with conn:
+            conn.execute(self._sql_update,
+                         [json.dumps(obj.to_record())] + self._row_values(obj) + [obj.id])
+
+    @contextmanager
+    def _deferred_writes(self):
+        """Collect attribute-change writes and flush each object once."""
+        pending = getattr(self._local, 'pending', None)
+        if pending is not None:
+            yield
+            return
+        self._local.pending = pending = {}
+        try:
+            yield
+        finally:
+            self._local.pending = None
+            for obj in pending.values():
+                self._write(obj)
+
+    def _integrity_error(self, error, obj):
+        for column in self.unique_indexes:
+            if f"{self.table}.{column}" in str(error):
+                return ValueError(f"{column} '{getattr(obj, column, None)}' already exists")
+        return ValueError(str(error))
+
+    def add(self, obj):
+        conn = self.pool.connection()
+        try:
+            with conn:
+                # Deleted in the same transaction, so a rejected row keeps the old one.
+                conn.execute(self._sql_delete, (obj.id,))
+                conn.execute(self._sql_insert,
+                             [obj.id, json.dumps(obj.to_record())] + self._row_values(obj))
+        except sqlite3.IntegrityError as e:
+            raise self._integrity_error(e, obj)
+        self._remember(obj)
+        self.modifications += 1
+
+    def _remember(self, obj):
+        """Put obj in the identity map, dropping an object it replaces."""
+        replaced = self._identity.get(obj.id)
+        if replaced is not None and replaced is not obj:
+            replaced.remove_observer(self)
+        self._identity[obj.id] = obj
+        obj.add_observer(self)
+
+    def add_many(self, objs):
+        """Insert a batch of objects in one transaction with executemany."""
+        # An id given twice keeps its last object, in that one's place.
+        objs = list({obj.id: obj for obj in reversed(list(objs))}.values())[::-1]
+        conn = self.pool.connection()
+        current = None
+
+        def rows():
+            # executemany pulls rows one at a time, so on a constraint
+            # failure current is the object whose row was rejected.
+            nonlocal current
+            for obj in objs:
+                current = obj
+                yield [obj.id, json.dumps(obj.to_record())] + self._row_values(obj)
+
+        try:
+            with conn:
+                conn.executemany(self._sql_delete, [(obj.id,) for obj in objs])
+                conn.executemany(self._sql_insert, rows())
+        except sqlite3.IntegrityError as e:
+            raise self._integrity_error(e, current)
+        for obj in objs:
+            self._remember(obj)
+        self.modifications += 1
+
+    def get(self, obj_id):
+        obj = self._identity.get(obj_id)
+        if obj is not None:
+            return obj
+        row = self.pool.connection().execute(self._sql_get, (obj_id,)).fetchone()
+        return self._load(row[1]) if row else None
+
+    def get_many(self, obj_ids):
+        found = {}
+        missing = []
+        for obj_id in dict.fromkeys(obj_ids):
+            obj = self._identity.get(obj_id)
+            if obj is not None:
+                found[obj_id] = obj
+            else:
+                missing.append(obj_id)
+        conn = self.pool.connection()
+        for start in range(0, len(missing), BATCH_SIZE):
+            chunk = missing[start:start + BATCH_SIZE]
+            marks = ', '.join('?' * len(chunk))
+            for (data,) in conn.execute(
+                    f"SELECT data FROM {self.table} WHERE id IN ({marks})", chunk):
+                obj = self._load(data)
+                found[obj.id] = obj
+        return found
+
+    def get_all(self):
+        return list(self.scan())
+
+    def update(self, obj_id, data):
+        obj = self.get(obj_id)
+        if obj:
+            with self._deferred_writes():
+                obj.update(data)
+
+    def delete(self, obj_id):
+        conn = self.pool.connection()
+        with conn:
+            conn.execute(self._sql_delete, (obj_id,))
+        self.modifications += 1
+        obj = self._identity.pop(obj_id, None)
+        if obj is not None:
+            obj.remove_observer(self)
+
+    def get_by_attribute(self, attr_name, attr_value):
+        return next(iter(self._select(attr_name, attr_value, limit=1)), None)
+
+    def get_all_by_attribute(self, attr_name, attr_value):
+        return self._select(attr_name, attr_value)
+
+    def _select(self, attr_name, attr_value, limit=None):
+        if attr_name not in self.columns:
+            matches = (obj for obj in self.scan() if getattr(obj, attr_name) == attr_value)
+            return [obj for _, obj in zip(range(limit), matches)] if limit else list(matches)
+        sql = f"SELECT data FROM {self.table} WHERE {attr_name} = ? ORDER BY seq"
+        if limit:
+            sql += f" LIMIT {int(limit)}"
+        rows = self.pool.connection().execute(sql, (attr_value,)).fetchall()
+        return [self._load(data) for (data,) in rows]
+
+    def scan(self, after=None, filters=None):
+        """Yield objects in rowid order after a position, in batches.
+
+        Filters on indexed columns go into the WHERE clause; the rest are
+        checked on each loaded object.
+        """
+        filters = dict(filters or {})
+        indexed = {name: filters.pop(name) for name in list(filters) if name in self.columns}
+        where = ''.join(f" AND {name} = ?" for name in indexed)
+        sql = (f"SELECT seq, data FROM {self.table} WHERE seq > ?{where} "
+               f"ORDER BY seq LIMIT {BATCH_SIZE}")
+        position = -1 if after is None else after
+        conn = self.pool.connection()
+        while True:
+            rows = conn.execute(sql, [position] + list(indexed.values())).fetchall()
+            for seq, data in rows:
+                obj = self._load(data)
+                if all(getattr(obj, name, None) == value for name, value in filters.items()):
+                    yield obj
+            if len(rows) < BATCH_SIZE:
+                return
+            position = rows[-1][0]
+
+    def position(self, obj):
+        row = self.pool.connection().execute(self._sql_get, (obj.id,)).fetchone()
+        return row[0] if row else None
+
+    def has_index(self, attr_name):
+        return attr_name in self.columns
+
+    def index_count(self, attr_name, value):
+        return self.pool.connection().execute(
+            f"SELECT COUNT(*) FROM {self.table} WHERE {attr_name} IS ?", (value,)).fetchone()[0]
+
+    def index_scan(self, attr_name, value, after=None):
+        sql = (f"SELECT seq, data FROM {self.table} WHERE {attr_name} IS ? AND seq > ? "
+               f"ORDER BY seq LIMIT {BATCH_SIZE}")
+        position = -1 if after is None else after
+        conn = self.pool.connection()
+        while True:
+            rows = conn.execute(sql, (value, position)).fetchall()
+            for _, data in rows:
+                yield self._load(data)
+            if len(rows) < BATCH_SIZE:
+                return
+            position = rows[-1][0]
+
+    def index_positions(self, attr_name, value):
+        """Set of the positions of the rows holding value."""
+        rows = self.pool.connection().execute(
+            f"SELECT seq FROM {self.table} WHERE {attr_name} IS ?", (value,))
+        return {seq for (seq,) in rows}
+
+    def at_positions(self, positions):
+        """Yield the objects still stored at positions, in the given order."""
+        positions = list(positions)
+        conn = self.pool.connection()
+        for start in range(0, len(positions), BATCH_SIZE):
+            chunk = positions[start:start + BATCH_SIZE]
+            marks = ', '.join('?' * len(chunk))
+            found = dict(conn.execute(
+                f"SELECT seq, data FROM {self.table} WHERE seq IN ({marks})", chunk))
+            for seq in chunk:
+                if seq in found:
+                    yield self._load(found[seq])
+
+    def __len__(self):
+        return self.pool.connection().execute(self._sql_count).fetchone()[0]
+
+    def check_attribute(self, obj, name, value):
+        """Reject an attribute change that would break a unique index."""
+        column = name.lstrip('_')
+        if column in self.unique_indexes and value is not None:
+            row = self.pool.connection().execute(
+                f"SELECT id FROM {self.table} WHERE {column} = ?", (value,)).fetchone()
+            if row and row[0] != obj.id:
+                raise ValueError(f"{column} '{value}' already exists")
+
+    def attribute_changed(self, obj, name):
+        """Write the object back, once per update() when inside one."""
+        self.modifications += 1
+        pending = getattr(self._local, 'pending', None)
+        if pending is not None:
+            pending[obj.id] = obj
+        else:
+            self._write(obj)
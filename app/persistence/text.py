@@ -0,0 +1,120 @@
+import heapq
+import math
+import re
+import unicodedata
+from bisect import bisect_left, insort
+
+_WORD = re.compile(r'\w+')
+
+
+def tokenize(text):
+    """Split text into case- and accent-folded words: 'Frein cassé!' -> ['frein', 'casse']."""
+    decomposed = unicodedata.normalize('NFKD', text)
+    stripped = ''.join(char for char in decomposed if not unicodedata.combining(char))
+    return _WORD.findall(stripped.casefold())
+
+
+class TextIndex:
+    """In-memory inverted index of short documents, ranked with BM25.
+
+    Each term maps to the documents holding it and how often; the terms
+    are also kept in a sorted list, so a query word matches every term it
+    is a prefix of with two binary searches. Every query word must match
+    (exactly or as a prefix) for a document to be returned; an exact match
+    scores higher than a longer word sharing the prefix.
+    """
+
+    K1 = 1.2
+    B = 0.75
+    PREFIX_WEIGHT = 0.5
+
+    def __init__(self):
+        self._postings = {}
+        self._terms = []
+        self._docs = {}
+        self._order = {}
+        self._next = 0
+        self._total_length = 0
+
+    def add(self, doc_id, text):
+        """Index text under doc_id, replacing what was indexed for it before."""
+        self.remove(doc_id)
+        tokens = tokenize(text or '')
+        counts = {}
+        for token in tokens:
+            counts[token] = counts.get(token, 0) + 1
+        for term, count in counts.items():
+            postings = self._postings.get(term)
+            if postings is None:
+                postings = self._postings[term] = {}
+                insort(self._terms, term)
+            postings[doc_id] = count
+        self._docs[doc_id] = (counts, len(tokens))
+        self._order[doc_id] = self._next
+        self._next += 1
+        self._total_length += len(tokens)
+
+    def remove(self, doc_id):
+        entry = self._docs.pop(doc_id, None)
+        if entry is None:
+            return
+        counts, length = entry
+        for term in counts:
+            postings = self._postings[term]
+            del postings[doc_id]
+            if not postings:
+                del self._postings[term]
+                del self._terms[bisect_left(self._terms, term)]
+        del self._order[doc_id]
+        self._total_length -= length
+
+    def expand(self, word):
+        """Indexed terms starting with word, word itself first if indexed."""
+        i = bisect_left(self._terms, word)
+        j = bisect_left(self._terms, word + '\U0010ffff', lo=i)
+        return self._terms[i:j]
+
+    def search(self, query, limit, offset=0):
+        """Ids of the best-ranked documents matching every word of query, with scores.
+
+        Returns up to limit (doc_id, score) pairs skipping the first
+        offset, and whether more follow.
+        """
+        words = list(dict.fromkeys(tokenize(query)))
+        if not words or not self._docs:
+            return [], False
+        n = len(self._docs)
+        average = self._total_length / n or 1
+        k1, b = self.K1, self.B
+        docs = self._docs
+        scores = None
+        # Rarest word first: its matches bound the candidates of the others.
+        for word in sorted(words, key=lambda w: sum(len(self._postings[t]) for t in self.expand(w))):
+            word_scores = {}
+            for term in self.expand(word):
+                postings = self._postings[term]
+                idf = math.log(1 + (n - len(postings) + 0.5) / (len(postings) + 0.5))
+                weight = idf if term == word else idf * self.PREFIX_WEIGHT
+                if scores is None or len(postings) <= len(scores):
+                    matches = postings.items()
+                else:
+                    matches = ((doc_id, postings[doc_id]) for doc_id in scores if doc_id in postings)
+                for doc_id, count in matches:
+                    norm = k1 * (1 - b + b * docs[doc_id][1] / average)
+                    score = weight * count * (k1 + 1) / (count + norm)
+                    if score > word_scores.get(doc_id, 0.0):
+                        word_scores[doc_id] = score
+            if scores is None:
+                scores = word_scores
+            else:
+                scores = {doc_id: scores[doc_id] + score
+                          for doc_id, score in word_scores.items() if doc_id in scores}
+            if not scores:
+                return [], False
+        order = self._order
+        ranked = heapq.nsmallest(offset + limit + 1, scores.items(),
+                                 key=lambda item: (-item[1], order[item[0]]))
+        return ranked[offset:offset + limit], len(ranked) > offset + limit
+
+    def __len__(self):
+        return len(self._docs)
@@ -0,0 +1,185 @@
+"""Profilers producing collapsed stacks.
+
+Stacks are kept collapsed, root first, as flamegraph.pl and speedscope
+read them, with a weight after the last space::
+
+    wsgi_app (flask/app.py:1478);get (app/api/v1/buses.py:212);get_bus (...) 12
+
+A ``Sampler`` thread wakes every ``interval`` seconds and records the
+current stack of each thread it watches, weighting stacks by sample
+count. It costs the watched threads nothing between samples, so it can run
+continuously, but it only sees requests lasting several intervals.
+
+A ``StackTracer`` instead sees every call of the thread it runs in and
+weights stacks by the microseconds spent in their last frame; like
+cProfile, it slows the traced code down several times.
+"""
+import os
+import sys
+import tempfile
+import threading
+from collections import Counter
+from time import perf_counter
+
+
+class Trace(Counter):
+    """Samples of one watched thread: {stack tuple: count}."""
+
+
+class Sampler:
+    def __init__(self, interval):
+        self.interval = interval
+        self._watched = {}
+        self._labels = {}
+        # Held while sampling, so no sample lands in a trace once unwatched.
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='sampler', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+
+    def watch(self, ident, boundary=None):
+        """Start collecting samples of thread ident into a new Trace.
+
+        Frames from the one running ``boundary`` (a code object) up to the
+        thread's root are left out of the stacks.
+        """
+        trace = Trace()
+        self._watched[ident] = (trace, boundary)
+        return trace
+
+    def unwatch(self, ident):
+        with self._lock:
+            entry = self._watched.pop(ident, None)
+        return entry[0] if entry is not None else None
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.sample()
+
+    def sample(self):
+        if not self._watched:
+            return
+        with self._lock:
+            frames = sys._current_frames()
+            for ident, (trace, boundary) in list(self._watched.items()):
+                frame = frames.get(ident)
+                if frame is not None:
+                    trace[self._stack(frame, boundary)] += 1
+
+    def _stack(self, frame, boundary):
+        labels = self._labels
+        stack = []
+        while frame is not None and frame.f_code is not boundary:
+            code = frame.f_code
+            label = labels.get(code)
+            if label is None:
+                label = labels[code] = _label(code)
+            stack.append(label)
+            frame = frame.f_back
+        stack.reverse()
+        return tuple(stack)
+
+
+class StackTracer:
+    """Deterministic profiler of the calling thread, used as a context manager."""
+
+    def __init__(self):
+        self.stacks = Counter()
+        self._labels = {}
+        self._open = []
+
+    def __enter__(self):
+        self._open = []
+        sys.setprofile(self._event)
+        return self
+
+    def __exit__(self, *exc_info):
+        sys.setprofile(None)
+        now = perf_counter()
+        while self._open:
+            self._close(now)
+        for stack in [stack for stack, weight in self.stacks.items() if weight < 1]:
+            del self.stacks[stack]
+        for stack, weight in self.stacks.items():
+            self.stacks[stack] = round(weight)
+
+    def _event(self, frame, event, arg):
+        now = perf_counter()
+        if event == 'call':
+            code = frame.f_code
+            label = self._labels.get(code)
+            if label is None:
+                label = self._labels[code] = _label(code)
+            self._push(label, now)
+        elif event == 'c_call':
+            self._push(f"{getattr(arg, '__qualname__', arg)} (builtin)", now)
+        elif self._open:
+            # return, c_return or c_exception; returns from frames entered
+            # before tracing started find nothing open and are ignored.
+            self._close(now)
+
+    def _push(self, label, now):
+        parent = self._open[-1][0] if self._open else ()
+        self._open.append([parent + (label,), now, 0.0])
+
+    def _close(self, now):
+        stack, started, children = self._open.pop()
+        elapsed = now - started
+        self.stacks[stack] += (elapsed - children) * 1e6
+        if self._open:
+            self._open[-1][2] += elapsed
+
+
+def _label(code):
+    filename = code.co_filename
+    for root in _ROOTS:
+        if filename.startswith(root):
+            filename = filename[len(root):]
+            break
+    # ';' separates frames and the count follows the last space.
+    return f"{code.co_name} ({filename}:{code.co_firstlineno})".replace(';', ',')
+
+
+# Shorten paths to the project or to site-packages, longest prefix first.
+_ROOTS = sorted({os.path.dirname(os.path.dirname(os.path.abspath(__file__))) + os.sep}
+                | {path.rstrip(os.sep) + os.sep for path in sys.path
+                   if path and 'site-packages' in path},
+                key=len, reverse=True)
+
+
+def collapse(samples, root=None):
+    """Collapsed-stack lines for samples, heaviest first, each under root if given."""
+    prefix = f"{root};" if root else ''
+    return [f"{prefix}{';'.join(stack)} {count}" for stack, count in samples.most_common()]
+
+
+def write_atomically(path, text):
+    """Replace path with text, so readers never see a half-written file.
+
+    The text goes to a uniquely named file beside path first, so concurrent
+    writers of the same path never share a temporary file.
+    """
+    directory, name = os.path.split(path)
+    fd, temporary = tempfile.mkstemp(prefix=f"{name}.", suffix='.tmp', dir=directory or '.')
+    try:
+        with os.fdopen(fd, 'w') as handle:
+            handle.write(text)
+        os.replace(temporary, path)
+    except BaseException:
+        try:
+            os.unlink(temporary)
+        except OSError:
+            pass
+        raise
@@ -1,3 +1,6 @@
+import os
+from config import config
 from app.services.facade import Facade
 
-facade = Facade()
+facade = Facade.from_config(config[os.getenv('FLASK_CONFIG', 'default')])
+facade.bind_models()
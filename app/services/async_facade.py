@@ -0,0 +1,106 @@
+import asyncio
+from app.persistence.async_repository import AsyncRepositoryAdapter, run_locked
+
+# Backends whose calls wait on I/O, and so run on executor threads; the
+# others answer from memory and are called inline.
+BLOCKING_BACKENDS = frozenset(('sqlite',))
+
+
+class AsyncFacade:
+    """Coroutine front of a Facade, for serving many connections from one event loop.
+
+    Lookups go through AsyncRepository views of the facade's repositories,
+    so independent ones run concurrently under asyncio.gather. Writes run
+    the facade's own methods, which keep its indexes and relations up to
+    date, on the executor when there is one.
+    """
+
+    def __init__(self, facade, executor=None):
+        self.facade = facade
+        self.executor = executor
+        self.user_repo = AsyncRepositoryAdapter(facade.user_repo, executor, facade.lock)
+        self.bus_repo = AsyncRepositoryAdapter(facade.bus_repo, executor, facade.lock)
+        self.report_repo = AsyncRepositoryAdapter(facade.report_repo, executor, facade.lock)
+        self.route_repo = AsyncRepositoryAdapter(facade.route_repo, executor, facade.lock)
+
+    async def _call(self, method, *args, write=True):
+        """Run a synchronous facade method under its lock (see run_locked)."""
+        return await run_locked(self.facade.lock, write, self.executor, method, *args)
+
+    """user methods"""
+    async def create_user(self, user_data):
+        return await self._call(self.facade.create_user, user_data)
+
+    async def get_user(self, user_id):
+        return await self.user_repo.get(user_id)
+
+    """report methods"""
+    async def create_report(self, report_data):
+        return await self._call(self.facade.create_report, report_data)
+
+    async def get_report(self, report_id):
+        return await self.report_repo.get(report_id)
+
+    """bus methods"""
+    async def create_bus(self, bus_data):
+        """Create a bus, looking its owner, reports and routes up concurrently.
+
+        The lookups run ahead of the write, as they would for a client
+        checking them before a POST: a relation deleted in between is not
+        noticed.
+        """
+        bus_data = dict(bus_data)
+        has_owner = 'owner_id' in bus_data
+        owner_id = bus_data.pop('owner_id', None)
+        route_ids = bus_data.pop('routes', [])
+        owner, reports, routes = await asyncio.gather(
+            self.user_repo.get(owner_id) if has_owner else _none(),
+            self.report_repo.get_many(bus_data.pop('reports', [])),
+            self.route_repo.get_many(route_ids))
+        if has_owner and not owner:
+            raise ValueError("Owner not found")
+        for route_id in route_ids:
+            if route_id not in routes:
+                raise ValueError(f"Route {route_id} does not exist")
+        return await self._call(self.facade._insert_bus, bus_data, owner, list(reports.values()),
+                                [routes[route_id] for route_id in route_ids])
+
+    async def get_bus(self, bus_id):
+        return await self.bus_repo.get(bus_id)
+
+    async def get_all_buses(self):
+        return await self.bus_repo.get_all()
+
+    async def hydrate_buses(self, buses, relations=('owner', 'reports')):
+        """As Facade.hydrate_buses, fetching owners and reports concurrently."""
+        owners, reports = await asyncio.gather(
+            self.user_repo.get_many({vehicle.owner_id for vehicle in buses if vehicle.owner_id})
+            if 'owner' in relations else _none({}),
+            self.report_repo.get_many({aid for vehicle in buses for aid in vehicle.report_ids})
+            if 'reports' in relations else _none({}))
+
+        hydrated = {}
+        for vehicle in buses:
+            entry = {}
+            if 'owner' in relations:
+                entry['owner'] = owners.get(vehicle.owner_id)
+            if 'reports' in relations:
+                entry['reports'] = [reports[aid] for aid in vehicle.report_ids if aid in reports]
+            hydrated[vehicle.id] = entry
+        return hydrated
+
+    """route methods"""
+    async def get_route(self, route_id):
+        return await self.route_repo.get(route_id)
+
+    async def get_routes_by_bus(self, bus_id):
+        route_ids = await self._call(self._route_ids, bus_id, write=False)
+        routes = await self.route_repo.get_many(route_ids)
+        return [routes.get(route_id) for route_id in route_ids]
+
+    def _route_ids(self, bus_id):
+        return self.facade.route_buses.lefts(bus_id)
+
+
+async def _none(value=None):
+    return value
@@ -1,37 +1,276 @@
+import os
 from app.persistence.repository import InMemoryRepository
+from app.persistence.sqlite_repository import ConnectionPool, SqliteRepository
+from app.persistence.journal import JournaledRepository
+from app.persistence.mmap_snapshot import MappedRepository, MappedTable, write_table
+from app.persistence.relation import RelationStore
+from app.persistence.lazy import LazyReference
+from app.persistence.locks import NullLock, RWLock, reads, writes
+from app.persistence.schedule import Schedule, TimeIndex
+from app.persistence.bitmap import FleetIndex
+from app.persistence.columns import FleetColumns
+from app.persistence.query import Query, Eq, parse
+from app.persistence.text import TextIndex
 from app.models.user import User
 from app.models.report import Report
 from app.models.route import Route
 from app.models.bus import Bus
+from app.models.assignment import Assignment
+from app.models.maintenance import Maintenance
+from app.models.booking import Booking
+from app.models.base_model import _now, _to_datetime
+from app.metrics import time_facade, time_repository
 
 
 
 class Facade:
-    def __init__(self):
-        self.user_repo = InMemoryRepository()
-        self.bus_repo = InMemoryRepository()
-        self.route_repo = InMemoryRepository()
-        self.report_repo = InMemoryRepository()
+    def __init__(self, lazy_relations=False, backend='memory', sqlite_path=None,
+                 data_dir=None, fsync_policy='interval', fsync_interval_ms=100,
+                 snapshot_dir=None, thread_safe=False, metrics=False,
+                 metrics_sample=1):
+        # When set, buses keep LazyReference proxies to their owner and
+        # reports instead of the objects, resolved only on attribute access.
+        self.lazy_relations = lazy_relations
+        # Public methods hold this lock: reads share it, writes (including
+        # every read-modify-write) run alone, so each call is atomic.
+        self.lock = RWLock() if thread_safe else NullLock()
+        self.backend = backend
+        self.pool = ConnectionPool(sqlite_path) if backend == 'sqlite' else None
+        self.data_dir = data_dir
+        self.fsync_policy = fsync_policy
+        self.fsync_interval_ms = fsync_interval_ms
+        self.snapshot_dir = snapshot_dir
+        # Time every public method and repository operation, one call in
+        # metrics_sample (see app.metrics).
+        self.metrics = metrics
+        self.metrics_sample = metrics_sample
+        self._tables = {}
+        self._models = {}
+        self.user_repo = self._create_repository('users', User, unique_indexes=('email',))
+        self.bus_repo = self._create_repository('buses', Bus, indexes=('owner_id', 'status', 'engine_type', 'euro_standard'))
+        self.route_repo = self._create_repository('routes', Route)
+        self.report_repo = self._create_repository('reports', Report)
+        self.assignment_repo = self._create_repository('assignments', Assignment, indexes=('bus_id', 'route_id'))
+        self.maintenance_repo = self._create_repository('maintenance', Maintenance, indexes=('bus_id',))
+        self.bus_repo.bind_references(owner=self.user_repo, reports=self.report_repo, routes=self.route_repo)
+        self.route_repo.bind_references(user=self.user_repo, buses=self.bus_repo)
+        for repo in self.repositories():
+            repo.open()
+        self._route_buses = None
+        self._schedule = None
+        self._fleet = None
+        self._columns = None
+        self._maintenance_timeline = None
+        self._report_text = None
+        if metrics:
+            time_facade(self, self.metrics_sample)
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(backend=getattr(config, 'REPOSITORY_BACKEND', 'memory'),
+                   sqlite_path=getattr(config, 'SQLITE_PATH', None),
+                   data_dir=getattr(config, 'DATA_DIR', None),
+                   fsync_policy=getattr(config, 'FSYNC_POLICY', 'interval'),
+                   fsync_interval_ms=getattr(config, 'FSYNC_INTERVAL_MS', 100),
+                   snapshot_dir=getattr(config, 'SNAPSHOT_DIR', None),
+                   thread_safe=getattr(config, 'THREAD_SAFE', False),
+                   metrics=getattr(config, 'METRICS', False),
+                   metrics_sample=getattr(config, 'METRICS_SAMPLE', 1))
+
+    @property
+    def route_buses(self):
+        """Route/bus relation, rebuilt from the stored routes on first use."""
+        if self._route_buses is None:
+            # Built aside and published whole, as concurrent readers may race here.
+            relation = RelationStore()
+            for route in self.route_repo.scan():
+                for bus_id in route.bus_ids:
+                    relation.link(route.id, bus_id)
+            self._route_buses = relation
+        return self._route_buses
+
+    @property
+    def schedule(self):
+        """Per-bus interval index of assignments and maintenance, built on first use.
+
+        Both kinds share one timeline per bus, so a booking of either kind
+        conflicts with the other.
+        """
+        if self._schedule is None:
+            schedule = Schedule()
+            for booking in self._bookings():
+                schedule.add(booking.bus_id, *booking.window, booking)
+            self._schedule = schedule
+        return self._schedule
+
+    @property
+    def maintenance_timeline(self):
+        """Every maintenance window ordered by start, built on first use."""
+        if self._maintenance_timeline is None:
+            timeline = TimeIndex()
+            for maintenance in self.maintenance_repo.scan():
+                timeline.add(maintenance.window[0], maintenance)
+            self._maintenance_timeline = timeline
+        return self._maintenance_timeline
+
+    @property
+    def report_text(self):
+        """Inverted index of the report comments, built on first use."""
+        if self._report_text is None:
+            text = TextIndex()
+            for aeport in self.report_repo.scan():
+                text.add(aeport.id, aeport.comment)
+            self._report_text = text
+        return self._report_text
+
+    @property
+    def fleet(self):
+        """Fleet bitmaps (attributes and busy time slots), built on first use."""
+        if self._fleet is None:
+            fleet = FleetIndex(self.schedule)
+            for vehicle in self.bus_repo.scan():
+                fleet.refresh(vehicle)
+            for booking in self._bookings():
+                fleet.book(booking.bus_id, *booking.window)
+            self._fleet = fleet
+        return self._fleet
+
+    @property
+    def columns(self):
+        """Columnar copy of the buses' numeric and categorical fields, built on first use."""
+        if self._columns is None:
+            columns = FleetColumns()
+            for vehicle in self.bus_repo.scan():
+                columns.refresh(vehicle)
+            self._columns = columns
+        return self._columns
+
+    def repositories(self):
+        return (self.user_repo, self.bus_repo, self.route_repo, self.report_repo,
+                self.assignment_repo, self.maintenance_repo)
+
+    def _bookings(self):
+        yield from self.assignment_repo.scan()
+        yield from self.maintenance_repo.scan()
+
+    def bind_models(self):
+        """Serve the models' ``list`` class method from this facade's repositories."""
+        for model in self._models:
+            model.bind_facade(self)
+
+    @reads
+    def query(self, model, filters=None, order_by=None, limit=None):
+        """Entities of model matching filters (see app.persistence.query), as a list."""
+        return Query(self._models[model], filters, order_by, limit).all()
+
+    @reads
+    def explain(self, model, filters=None, order_by=None, limit=None):
+        """The plan query() would run for these arguments, as text."""
+        return Query(self._models[model], filters, order_by, limit).explain()
+
+    @reads
+    def repository_stats(self):
+        """Object count and modification counter of each repository, by table name."""
+        return {self._tables[id(repo)][0]: (len(repo), repo.modifications)
+                for repo in self.repositories()}
+
+    def collection_version(self, *models):
+        """Modification counters of the repositories of models, for collection ETags."""
+        return tuple(self._models[model].modifications for model in models)
+
+    @reads
+    def export_snapshot(self, directory):
+        """Write every repository as a memory-mappable file in directory."""
+        os.makedirs(directory, exist_ok=True)
+        for repo in self.repositories():
+            table, model, _, indexes = self._tables[id(repo)]
+            write_table(os.path.join(directory, f"{table}.fleet"), model.__name__,
+                        (obj.to_record() for obj in repo.scan()), indexes)
+
+    def close(self):
+        for repo in self.repositories():
+            repo.close()
+        if self.pool:
+            self.pool.close_all()
+
+    def _create_repository(self, table, model, unique_indexes=(), indexes=()):
+        repo = self._open_repository(table, model, unique_indexes, indexes)
+        if self.metrics:
+            time_repository(repo, table, self.metrics_sample)
+        self._tables[id(repo)] = (table, model, unique_indexes, tuple(unique_indexes) + tuple(indexes))
+        self._models[model] = repo
+        return repo
+
+    def _open_repository(self, table, model, unique_indexes, indexes):
+        if self.backend == 'memory':
+            return InMemoryRepository(unique_indexes=unique_indexes, indexes=indexes)
+        if self.backend == 'sqlite':
+            return SqliteRepository(self.pool, table, model, unique_indexes=unique_indexes, indexes=indexes)
+        if self.backend == 'journal':
+            return JournaledRepository(self.data_dir, table, model,
+                                       unique_indexes=unique_indexes, indexes=indexes,
+                                       fsync_policy=self.fsync_policy,
+                                       fsync_interval_ms=self.fsync_interval_ms)
+        if self.backend == 'mmap':
+            path = os.path.join(self.snapshot_dir, f"{table}.fleet")
+            if not os.path.exists(path):
+                os.makedirs(self.snapshot_dir, exist_ok=True)
+                write_table(path, model.__name__, (), tuple(unique_indexes) + tuple(indexes))
+            return MappedRepository(MappedTable(path), model,
+                                    unique_indexes=unique_indexes, indexes=indexes)
+        raise ValueError(f"Unknown repository backend: {self.backend}")
 
     """user methods"""
+    @writes
     def create_user(self, user_data):
         user = User(**user_data)
         self.user_repo.add(user)
         return user
 
+    @writes
+    def create_users_many(self, items):
+        """Create a batch of users, returning an (user, error) pair per item.
+
+        Emails are checked against the store and within the batch, and the
+        valid users are inserted with a single add_many.
+        """
+        emails = set()
+
+        def build(data):
+            user = User(**data)
+            if user.email in emails or self.user_repo.get_by_attribute('email', user.email):
+                raise ValueError("Email already registered")
+            emails.add(user.email)
+            return user
+
+        return self._create_many(self.user_repo, items, build)
+
+    @writes
+    def update_users_many(self, items):
+        return self._update_many(items, self.get_user, self.update_user)
+
+    @reads
     def get_user(self, user_id):
         return self.user_repo.get(user_id)
 
+    @reads
     def get_user_by_email(self, email):
         return self.user_repo.get_by_attribute('email', email)
 
+    @reads
     def get_all_users(self):
         return self.user_repo.get_all() 
+
+    @reads
+    def get_users_page(self, limit, after=None, filters=None, order_by=None):
+        return Query(self.user_repo, filters, order_by).page(limit, after)
     
+    @writes
     def update_user(self, user_id, user_data):
         self.user_repo.update(user_id, user_data)
         return self.user_repo.get(user_id)
     
+    @writes
     def delete_user(self, user_id):
         user = self.get_user(user_id)
         if not user:
@@ -40,70 +279,223 @@ class Facade:
         return user
 
     """aeport methods"""
+    @writes
     def create_report(self, report_data):
         aeport = Report(**report_data)
         self.report_repo.add(aeport)
+        self._index_report(aeport)
         return aeport
 
+    @writes
+    def create_reports_many(self, items):
+        results = self._create_many(self.report_repo, items, lambda data: Report(**data))
+        for aeport, _ in results:
+            if aeport is not None:
+                self._index_report(aeport)
+        return results
+
+    @writes
+    def update_reports_many(self, items):
+        return self._update_many(items, self.get_report, self.update_report)
+
+    @reads
     def get_report(self, report_id):
         aeport = self.report_repo.get(report_id)
         if not aeport:
             return None
         return aeport
 
+    @reads
     def get_all_reports(self):
         return self.report_repo.get_all()
 
+    @reads
+    def get_reports_page(self, limit, after=None, filters=None, order_by=None):
+        return Query(self.report_repo, filters, order_by).page(limit, after)
+
+    def iter_reports(self, filters=None):
+        return iter(Query(self.report_repo, filters))
+
+    @reads
+    def search_reports(self, query, limit, offset=0):
+        """Reports whose comment matches every word of query, best first.
+
+        Returns (report, score) pairs and whether more results follow.
+        """
+        ranked, more = self.report_text.search(query, limit, offset)
+        found = self.report_repo.get_many(doc_id for doc_id, _ in ranked)
+        return [(found[doc_id], score) for doc_id, score in ranked if doc_id in found], more
+
+    @writes
     def update_report(self, report_id, report_data):
         aeport = self.get_report(report_id)
         if not aeport:
             return None
         self.report_repo.update(report_id, report_data)
-        return self.report_repo.get(report_id)
+        aeport = self.report_repo.get(report_id)
+        self._index_report(aeport)
+        return aeport
     
+    @writes
     def delete_report(self, report_id):
         aeport = self.get_report(report_id)
         if not aeport:
             return None
         self.report_repo.delete(report_id)
+        if self._report_text is not None:
+            self._report_text.remove(report_id)
         return aeport
 
+    def _index_report(self, aeport):
+        if self._report_text is not None:
+            self._report_text.add(aeport.id, aeport.comment)
+
     """vehicle methods"""
+    @writes
     def create_bus(self, bus_data):
+        owner = None
         if 'owner_id' in bus_data:
-            owner = self.user_repo.get(bus_data['owner_id'])
+            owner = self.user_repo.get(bus_data.pop('owner_id'))
             if not owner:
                 raise ValueError("Owner not found")
-            bus_data['owner'] = owner
-            del bus_data['owner_id']
 
-        reports_ids = bus_data.pop("reports", [])
+        reports = self.report_repo.get_many(bus_data.pop("reports", [])).values()
+        routes = self._resolve_routes(bus_data.pop("routes", []))
+        return self._insert_bus(bus_data, owner, reports, routes)
+
+    @writes
+    def _insert_bus(self, bus_data, owner, reports, routes):
+        """Store a bus built from bus_data with its relations already looked up."""
+        if owner is not None:
+            bus_data['owner'] = self._reference(self.user_repo, owner)
         vehicle = Bus(**bus_data)
         self.bus_repo.add(vehicle)
+        self._refresh_fleet(vehicle)
+
+        for aeport in reports:
+            vehicle.add_report(self._reference(self.report_repo, aeport))
 
-        for aid in reports_ids:
-            aeport = self.get_report(aid)
-            if aeport:
-                vehicle.add_report(aeport)
+        for route in routes:
+            self._link_route(route, vehicle)
 
         return vehicle
 
-    def get_bus(self, bus_id):
-        vehicle = self.bus_repo.get(bus_id)
-        if not vehicle:
-            return None
+    @writes
+    def create_buses_many(self, items):
+        """Create a batch of buses, returning a (bus, error) pair per item.
 
-        vehicle.owner = self.user_repo.get(vehicle.owner_id)
-        vehicle.reports = [self.report_repo.get(aid) for aid in getattr(vehicle, 'report_ids', [])]
-        return vehicle
+        Owners, reports and routes referenced anywhere in the batch are
+        fetched once with get_many, and the valid buses are inserted with a
+        single add_many before their routes are linked.
+        """
+        def ids(name, many=True):
+            found = set()
+            for data in items:
+                if isinstance(data, dict):
+                    values = (data.get(name) or []) if many else [data.get(name)]
+                    found.update(value for value in values if isinstance(value, str))
+            return found
+
+        owners = self.user_repo.get_many(ids('owner_id', many=False))
+        reports = self.report_repo.get_many(ids('reports'))
+        routes = self.route_repo.get_many(ids('routes'))
+        pending_routes = []
+
+        def build(data):
+            # Every bus needs an existing owner, as POST /api/v1/buses/ requires.
+            owner_id = data.pop('owner_id', None)
+            owner = owners.get(owner_id)
+            if not owner:
+                raise ValueError(f"Owner with ID {owner_id} does not exist")
+            data['owner'] = self._reference(self.user_repo, owner)
+            report_ids = data.pop('reports', [])
+            for report_id in report_ids:
+                if report_id not in reports:
+                    raise ValueError(f"Report {report_id} does not exist")
+            route_ids = data.pop('routes', [])
+            for route_id in route_ids:
+                if route_id not in routes:
+                    raise ValueError(f"Route {route_id} does not exist")
+            data['reports'] = [self._reference(self.report_repo, reports[report_id])
+                               for report_id in report_ids]
+            vehicle = Bus(**data)
+            pending_routes.append((vehicle, route_ids))
+            return vehicle
+
+        results = self._create_many(self.bus_repo, items, build)
+        for vehicle, route_ids in pending_routes:
+            self._refresh_fleet(vehicle)
+            for route_id in route_ids:
+                self._link_route(routes[route_id], vehicle)
+        return results
 
+    @writes
+    def update_buses_many(self, items):
+        return self._update_many(items, self.get_bus, self.update_bus)
+
+    @reads
+    def get_bus(self, bus_id):
+        return self.bus_repo.get(bus_id)
+
+    @reads
     def get_all_buses(self):
-        buses = self.bus_repo.get_all()
+        return self.bus_repo.get_all()
+
+    @reads
+    def get_buses_page(self, limit, after=None, filters=None, order_by=None):
+        """Return a page of buses matching filters, and the next position."""
+        return Query(self.bus_repo, filters, order_by).page(limit, after)
+
+    def iter_buses(self, filters=None):
+        """Lazily yield every bus matching filters, in insertion order.
+
+        The walk runs outside the facade lock, so a long stream never holds
+        back writers; the repository scan tolerates concurrent changes.
+        """
+        return iter(Query(self.bus_repo, filters))
+
+    @reads
+    def hydrate_buses(self, buses, relations=('owner', 'reports')):
+        """Resolve the owners and reports of a batch of buses in one pass.
+
+        Ids are collected across the whole batch and fetched with a single
+        get_many per repository. The buses themselves are left untouched;
+        the result maps each bus id to its resolved relations.
+        """
+        owners = {}
+        reports = {}
+        if 'owner' in relations:
+            owners = self.user_repo.get_many({vehicle.owner_id for vehicle in buses if vehicle.owner_id})
+        if 'reports' in relations:
+            reports = self.report_repo.get_many({aid for vehicle in buses for aid in vehicle.report_ids})
+
+        hydrated = {}
         for vehicle in buses:
-            vehicle.owner = self.user_repo.get(vehicle.owner_id)
-            vehicle.reports = [self.report_repo.get(aid) for aid in getattr(vehicle, 'report_ids', [])]
-        return buses
+            entry = {}
+            if 'owner' in relations:
+                entry['owner'] = owners.get(vehicle.owner_id)
+            if 'reports' in relations:
+                entry['reports'] = [reports[aid] for aid in vehicle.report_ids if aid in reports]
+            hydrated[vehicle.id] = entry
+        return hydrated
+
+    @reads
+    def get_fleet_stats(self, group_by=FleetColumns.CATEGORICAL):
+        """Fleet-wide counts, totals and averages, broken down by each field of group_by."""
+        unknown = set(group_by) - set(FleetColumns.CATEGORICAL)
+        if unknown:
+            raise ValueError(f"Cannot group by {', '.join(sorted(unknown))}")
+        return self.columns.stats(group_by)
+
+    @reads
+    def get_buses_by_owner(self, owner_id):
+        return self.bus_repo.get_all_by_attribute('owner_id', owner_id)
+
+    @reads
+    def get_buses_by_status(self, status):
+        return self.bus_repo.get_all_by_attribute('status', status)
 
+    @writes
     def update_bus(self, bus_id, bus_data):
         vehicle = self.get_bus(bus_id)
         if not vehicle:
@@ -113,7 +505,7 @@ class Facade:
             owner = self.get_user(bus_data['owner_id'])
             if not owner:
                 raise ValueError("Owner not found")
-            bus_data['owner'] = owner
+            bus_data['owner'] = self._reference(self.user_repo, owner)
             del bus_data['owner_id']
 
         if 'reports' in bus_data:
@@ -122,85 +514,316 @@ class Facade:
                 aeport = self.get_report(report_id)
                 if not aeport:
                     raise ValueError(f"Report {report_id} does not exist")
-                valid_reports.append(aeport)
+                valid_reports.append(self._reference(self.report_repo, aeport))
             bus_data['reports'] = valid_reports
 
+        routes = None
+        if 'routes' in bus_data:
+            routes = self._resolve_routes(bus_data.pop('routes'))
+
         self.bus_repo.update(bus_id, bus_data)
+        self._refresh_fleet(vehicle)
+        if routes is not None:
+            for route in self.get_routes_by_bus(bus_id):
+                self._unlink_route(route, vehicle)
+            for route in routes:
+                self._link_route(route, vehicle)
         return self.get_bus(bus_id)
     
+    @writes
     def delete_bus(self, bus_id):
+        vehicle = self.bus_repo.get(bus_id)
+        if vehicle:
+            for route_id in self.route_buses.remove_right(bus_id):
+                route = self.route_repo.get(route_id)
+                if route:
+                    route.remove_bus(vehicle)
+            for booking in self.schedule.remove_key(bus_id):
+                self._release(booking)
+            if self._fleet is not None:
+                self._fleet.remove(bus_id)
+            if self._columns is not None:
+                self._columns.remove(bus_id)
         return self.bus_repo.delete(bus_id)
 
+    def _create_many(self, repo, items, build):
+        """Build one entity per item with build(data), then add the valid ones in one batch."""
+        results = []
+        for data in items:
+            try:
+                results.append((build(dict(data)), None))
+            except (TypeError, ValueError) as e:
+                results.append((None, str(e)))
+        repo.add_many(obj for obj, _ in results if obj is not None)
+        return results
+
+    def _update_many(self, items, get, update):
+        """Apply update(id, data) to each item carrying an id, collecting per-item errors."""
+        results = []
+        for data in items:
+            try:
+                data = dict(data)
+                obj_id = data.pop('id', None)
+                if not isinstance(obj_id, str) or not get(obj_id):
+                    results.append((None, f"{obj_id} not found"))
+                    continue
+                results.append((update(obj_id, data), None))
+            except (TypeError, ValueError) as e:
+                results.append((None, str(e)))
+        return results
+
+    def _reference(self, repo, obj):
+        if self.lazy_relations:
+            return LazyReference(repo, obj.id)
+        return obj
+
+    def _resolve_routes(self, route_ids):
+        routes = []
+        for route_id in route_ids:
+            route = self.route_repo.get(route_id)
+            if not route:
+                raise ValueError(f"Route {route_id} does not exist")
+            routes.append(route)
+        return routes
+
     """route methods"""
+    @writes
     def create_route(self, route_data):
-       text = route_data.get('text')
-       rating = route_data.get('rating')
-       user_id = route_data.get('user_id')
-       bus_id = route_data.get('bus_id')
-
-       if not text or not isinstance(text, str):
-           return None
-       if not isinstance(rating, int) or not (1 <= rating <= 5):
-           return None
-       if not user_id or not bus_id:
-           return None
-       
-       user = self.get_user(user_id)
-       vehicle = self.get_bus(bus_id)
-       if not user:
-           raise ValueError("User not found")
-       if not vehicle:
-           raise ValueError("Vehicle not found")
-       
-       route = Route(text, rating, vehicle, user)
-       self.route_repo.add(route)
-       return route
+        user = self.get_user(route_data.get('user_id'))
+        if not user:
+            raise ValueError("User not found")
+        buses = self._resolve_buses(route_data.get('bus_id'))
 
+        route = Route(route_data.get('route_number'), route_data.get('name'), buses, user)
+        self.route_repo.add(route)
+        for vehicle in buses:
+            self._link_route(route, vehicle)
+        return route
+
+    @reads
     def get_route(self, route_id):
         return self.route_repo.get(route_id)
 
+    @reads
     def get_all_routes(self):
         return self.route_repo.get_all()
 
+    @reads
+    def get_routes_page(self, limit, after=None, filters=None, order_by=None):
+        return Query(self.route_repo, filters, order_by).page(limit, after)
+
+    @reads
     def get_routes_by_bus(self, bus_id):
-        all_routes = self.get_all_routes()
-        matching_routes = []
-        for route in all_routes:
-            if route.bus_id == bus_id:
-                matching_routes.append(route)
-        return matching_routes
+        return [self.route_repo.get(route_id)
+                for route_id in self.route_buses.lefts(bus_id)]
+
+    @reads
+    def get_buses_by_route(self, route_id):
+        return [self.bus_repo.get(bus_id)
+                for bus_id in self.route_buses.rights(route_id)]
 
+    @writes
     def update_route(self, route_id, route_data):
         route = self.get_route(route_id)
         if not route:
             raise ValueError("Route not found")
-        
-        if 'rating' in route_data:
-            rating = route_data['rating']
-            if not isinstance(rating, int) or not (1 <= rating <= 5):
-                raise ValueError("Rating must be between 1 and 5")
 
         if 'user_id' in route_data:
             user = self.get_user(route_data['user_id'])
             if not user:
                 raise ValueError("User not found")
-            route_data['user']= user
+            route_data['user'] = user
             del route_data['user_id']
 
+        buses = None
         if 'bus_id' in route_data:
-            vehicle= self.get_bus(route_data['bus_id'])
-            if not vehicle:
-                raise ValueError("Vehicle not found")
-            route_data['bus_id'] = vehicle
-            del route_data['bus_id']
-        
-        if 'text' in route_data:
-            text = route_data['text']
-            if not text or not isinstance(text, str):
-                raise ValueError("Text is required")
-        
+            buses = self._resolve_buses(route_data.pop('bus_id'))
+
         self.route_repo.update(route_id, route_data)
+        if buses is not None:
+            for vehicle in self.get_buses_by_route(route_id):
+                self._unlink_route(route, vehicle)
+            for vehicle in buses:
+                self._link_route(route, vehicle)
         return self.route_repo.get(route_id)
 
+    @writes
     def delete_route(self, route_id):
+        route = self.get_route(route_id)
+        if not route:
+            return None
+        for bus_id in self.route_buses.remove_left(route_id):
+            vehicle = self.bus_repo.get(bus_id)
+            if vehicle:
+                vehicle.remove_route(route)
+        for assignment in self.assignment_repo.get_all_by_attribute('route_id', route_id):
+            self.schedule.remove(assignment)
+            self._release(assignment)
         self.route_repo.delete(route_id)
+        return route
+
+    def _resolve_buses(self, bus_ids):
+        if isinstance(bus_ids, str):
+            bus_ids = [bus_ids]
+        if not bus_ids:
+            raise ValueError("At least one bus is required")
+        buses = []
+        for bus_id in bus_ids:
+            vehicle = self.bus_repo.get(bus_id)
+            if not vehicle:
+                raise ValueError(f"Bus not found: {bus_id}")
+            buses.append(vehicle)
+        return buses
+
+    def _refresh_fleet(self, vehicle):
+        if self._fleet is not None:
+            self._fleet.refresh(vehicle)
+        if self._columns is not None:
+            self._columns.refresh(vehicle)
+
+    def _book(self, booking, repo):
+        """Check a booking against the bus's schedule, then store and index it."""
+        self.schedule.add(booking.bus_id, *booking.window, booking)
+        repo.add(booking)
+        if self._fleet is not None:
+            self._fleet.book(booking.bus_id, *booking.window)
+        if isinstance(booking, Maintenance) and self._maintenance_timeline is not None:
+            self._maintenance_timeline.add(booking.window[0], booking)
+
+    def _release(self, booking):
+        """Delete a booking already taken out of the schedule."""
+        if isinstance(booking, Maintenance):
+            self.maintenance_repo.delete(booking.id)
+            if self._maintenance_timeline is not None:
+                self._maintenance_timeline.remove(booking.window[0], booking)
+        else:
+            self.assignment_repo.delete(booking.id)
+        if self._fleet is not None:
+            self._fleet.release(booking.bus_id, *booking.window)
+
+    def _link_route(self, route, vehicle):
+        self.route_buses.link(route.id, vehicle.id)
+        route.add_bus(vehicle)
+        vehicle.add_route(route)
+
+    def _unlink_route(self, route, vehicle):
+        self.route_buses.unlink(route.id, vehicle.id)
+        route.remove_bus(vehicle)
+        vehicle.remove_route(route)
+
+    """assignment methods"""
+    @writes
+    def create_assignment(self, assignment_data):
+        """Book a bus on a route for [start, end).
+
+        Raises ValueError for unknown ids or bad times, and ScheduleConflict
+        (a ValueError) when the bus is already booked in that window.
+        """
+        assignment = Assignment(**assignment_data)
+        if not self.bus_repo.get(assignment.bus_id):
+            raise ValueError("Bus not found")
+        if not self.route_repo.get(assignment.route_id):
+            raise ValueError("Route not found")
+        self._book(assignment, self.assignment_repo)
+        return assignment
+
+    @reads
+    def get_assignment(self, assignment_id):
+        return self.assignment_repo.get(assignment_id)
+
+    @reads
+    def get_assignments_page(self, limit, after=None, filters=None, order_by=None):
+        return Query(self.assignment_repo, filters, order_by).page(limit, after)
+
+    @writes
+    def delete_assignment(self, assignment_id):
+        assignment = self.assignment_repo.get(assignment_id)
+        if not assignment:
+            return None
+        self.schedule.remove(assignment)
+        self._release(assignment)
+        return assignment
+
+    @reads
+    def get_bus_availability(self, bus_id, start, end):
+        """Bookings (assignments and maintenance) of a bus overlapping [start, end)
+        and the free gaps between them.
+
+        start and end are datetimes; gaps are returned as (start, end)
+        datetime pairs.
+        """
+        start = Booking.time_validation(start, "from")
+        end = Booking.time_validation(end, "to")
+        if end <= start:
+            raise ValueError("to must be after from")
+        busy = self.schedule.conflicts(bus_id, start, end)
+        free = [(_to_datetime(gap_start), _to_datetime(gap_end))
+                for gap_start, gap_end in self.schedule.free(bus_id, start, end)]
+        return busy, free
+
+    @reads
+    def get_available_buses(self, start, end, filters=None):
+        """Buses matching filters with no booking overlapping [start, end).
+
+        Equality filters on status, engine_type and euro_standard are
+        answered from the fleet bitmaps together with the time slots; any
+        other filter is checked on the resulting buses.
+        """
+        start = Booking.time_validation(start, "from")
+        end = Booking.time_validation(end, "to")
+        if end <= start:
+            raise ValueError("to must be after from")
+        indexed, rest = {}, []
+        for conjunct in (parse(filters).conjuncts() if filters else []):
+            if isinstance(conjunct, Eq) and conjunct.attr in self.fleet.attributes \
+                    and conjunct.attr not in indexed:
+                indexed[conjunct.attr] = conjunct.value
+            else:
+                rest.append(conjunct)
+        found = self.bus_repo.get_many(self.fleet.available(start, end, indexed))
+        return [vehicle for vehicle in found.values()
+                if all(conjunct.matches(vehicle) for conjunct in rest)]
+
+    """maintenance methods"""
+    @writes
+    def create_maintenance(self, maintenance_data):
+        """Schedule maintenance of a bus for [start, end).
+
+        Raises ValueError for an unknown or retired bus, an unknown
+        technician or bad times, and ScheduleConflict when the bus is
+        booked (in service or maintenance) in that window.
+        """
+        maintenance = Maintenance(**maintenance_data)
+        vehicle = self.bus_repo.get(maintenance.bus_id)
+        if not vehicle:
+            raise ValueError("Bus not found")
+        if vehicle.status == -1:
+            raise ValueError("Bus is retired")
+        if maintenance.technician_id and not self.user_repo.get(maintenance.technician_id):
+            raise ValueError("Technician not found")
+        self._book(maintenance, self.maintenance_repo)
+        return maintenance
+
+    @reads
+    def get_maintenance(self, maintenance_id):
+        return self.maintenance_repo.get(maintenance_id)
+
+    @reads
+    def get_maintenance_page(self, limit, after=None, filters=None, order_by=None):
+        return Query(self.maintenance_repo, filters, order_by).page(limit, after)
+
+    @reads
+    def get_upcoming_maintenance(self, days, limit=None, now=None):
+        """Maintenance across the fleet starting within the next days, soonest first."""
+        start = _now() if now is None else Booking.time_validation(now, "now")
+        end = start + int(days * 86_400_000_000)
+        return self.maintenance_timeline.between(start, end, limit)
+
+    @writes
+    def delete_maintenance(self, maintenance_id):
+        maintenance = self.maintenance_repo.get(maintenance_id)
+        if not maintenance:
+            return None
+        self.schedule.remove(maintenance)
+        self._release(maintenance)
+        return maintenance
@@ -61,4 +61,1356 @@ class TestUserEndpoints(unittest.TestCase):
             "string"
             ]
         })
-        self.assertEqual(response.status_code, 400)
\ No newline at end of file
+        self.assertEqual(response.status_code, 400)
+
+class TestRepositoryIndexes(unittest.TestCase):
+
+    def setUp(self):
+        from app.services.facade import Facade
+        self.facade = Facade()
+        self.user = self.facade.create_user({
+            "first_name": "Jane",
+            "last_name": "Doe",
+            "email": "jane.doe@example.com"
+        })
+
+    def test_email_index_follows_setter(self):
+        self.user.email = "jane@example.com"
+        self.assertIsNone(self.facade.get_user_by_email("jane.doe@example.com"))
+        self.assertIs(self.facade.get_user_by_email("jane@example.com"), self.user)
+
+    def test_duplicate_email_rejected(self):
+        with self.assertRaises(ValueError):
+            self.facade.create_user({
+                "first_name": "John",
+                "last_name": "Doe",
+                "email": "jane.doe@example.com"
+            })
+
+    def test_delete_removes_from_index(self):
+        self.facade.delete_user(self.user.id)
+        self.assertIsNone(self.facade.get_user_by_email("jane.doe@example.com"))
+
+
+class TestRouteBusRelation(unittest.TestCase):
+
+    def setUp(self):
+        from app.services.facade import Facade
+        self.facade = Facade()
+        self.user = self.facade.create_user({
+            "first_name": "Jane",
+            "last_name": "Doe",
+            "email": "jane.doe@example.com"
+        })
+        self.bus_a = self.facade.create_bus({"name": "A", "engine_type": "electric", "euro_standard": 6})
+        self.bus_b = self.facade.create_bus({"name": "B", "engine_type": "hybrid", "euro_standard": 5})
+        self.route = self.facade.create_route({
+            "route_number": "12",
+            "name": "Centre",
+            "user_id": self.user.id,
+            "bus_id": [self.bus_a.id, self.bus_b.id]
+        })
+
+    def test_links_both_directions(self):
+        self.assertEqual(self.facade.get_routes_by_bus(self.bus_a.id), [self.route])
+        self.assertEqual(self.facade.get_buses_by_route(self.route.id), [self.bus_a, self.bus_b])
+        self.assertEqual(self.bus_b.to_dict()["routes"], [self.route.id])
+
+    def test_update_replaces_buses(self):
+        self.facade.update_route(self.route.id, {"bus_id": [self.bus_b.id]})
+        self.assertEqual(self.facade.get_routes_by_bus(self.bus_a.id), [])
+        self.assertEqual(self.route.bus_ids, [self.bus_b.id])
+
+    def test_delete_bus_unlinks_route(self):
+        self.facade.delete_bus(self.bus_a.id)
+        self.assertEqual(self.route.bus_ids, [self.bus_b.id])
+        self.facade.delete_route(self.route.id)
+        self.assertEqual(self.facade.get_routes_by_bus(self.bus_b.id), [])
+        self.assertEqual(self.bus_b.routes, [])
+
+
+class TestBusHydration(unittest.TestCase):
+
+    def setUp(self):
+        from app.services.facade import Facade
+        self.facade = Facade(lazy_relations=True)
+        self.owner = self.facade.create_user({
+            "first_name": "Jane",
+            "last_name": "Doe",
+            "email": "jane.doe@example.com"
+        })
+        self.report = self.facade.create_report({"comment": "Brake noise"})
+        self.bus = self.facade.create_bus({
+            "name": "A",
+            "engine_type": "electric",
+            "euro_standard": 6,
+            "owner_id": self.owner.id,
+            "reports": [self.report.id]
+        })
+
+    def test_to_dict_does_not_resolve_lazy_relations(self):
+        data = self.bus.to_dict()
+        self.assertEqual(data["owner_id"], self.owner.id)
+        self.assertEqual(data["reports"], [self.report.id])
+        self.assertFalse(self.bus.owner.resolved)
+        self.assertEqual(self.bus.owner.first_name, "Jane")
+
+    def test_hydrate_buses_resolves_batch_without_mutation(self):
+        owner_before = self.bus.owner
+        hydrated = self.facade.hydrate_buses(self.facade.get_all_buses())
+        self.assertIs(hydrated[self.bus.id]["owner"], self.owner)
+        self.assertEqual(hydrated[self.bus.id]["reports"], [self.report])
+        self.assertIs(self.bus.owner, owner_before)
+
+
+class TestPagination(unittest.TestCase):
+
+    def setUp(self):
+        self.app = create_app()
+        self.client = self.app.test_client()
+        from app.services import facade
+        self.bus_ids = []
+        for i in range(5):
+            bus = facade.create_bus({
+                "name": f"Page {i}",
+                "engine_type": "electric" if i % 2 else "thermal",
+                "euro_standard": 6,
+                "status": 1
+            })
+            self.bus_ids.append(bus.id)
+
+    def tearDown(self):
+        from app.services import facade
+        for bus_id in self.bus_ids:
+            facade.delete_bus(bus_id)
+
+    def test_cursor_walks_all_pages(self):
+        seen = []
+        cursor = None
+        while True:
+            query = {'limit': 2, 'engine_type': 'thermal'}
+            if cursor:
+                query['cursor'] = cursor
+            response = self.client.get('/api/v1/buses/', query_string=query)
+            self.assertEqual(response.status_code, 200)
+            seen += [bus['id'] for bus in response.json['buses']]
+            cursor = response.json['next_cursor']
+            if not cursor:
+                break
+        # Other tests share the store: check only the buses made here.
+        self.assertEqual(len(seen), len(set(seen)))
+        self.assertEqual([bus_id for bus_id in seen if bus_id in self.bus_ids], self.bus_ids[0::2])
+
+    def test_invalid_cursor(self):
+        response = self.client.get('/api/v1/buses/', query_string={'cursor': 'nope'})
+        self.assertEqual(response.status_code, 400)
+
+
+class TestStreaming(unittest.TestCase):
+
+    def setUp(self):
+        self.app = create_app()
+        self.client = self.app.test_client()
+
+    def test_ndjson_stream_of_reports(self):
+        from app.services import facade
+        report = facade.create_report({"comment": "Door stuck"})
+        response = self.client.get('/api/v1/reports/', query_string={'stream': 'ndjson'})
+        self.assertEqual(response.mimetype, 'application/x-ndjson')
+        lines = response.get_data(as_text=True).splitlines()
+        # Other tests share the store, so the report need not be last.
+        import json
+        streamed = [json.loads(line) for line in lines]
+        self.assertEqual([item['comment'] for item in streamed if item['id'] == report.id],
+                         ["Door stuck"])
+        facade.delete_report(report.id)
+
+    def test_unknown_stream_format(self):
+        response = self.client.get('/api/v1/buses/', query_string={'stream': 'xml'})
+        self.assertEqual(response.status_code, 400)
+
+
+class TestBulkEndpoints(unittest.TestCase):
+
+    def setUp(self):
+        self.app = create_app()
+        self.client = self.app.test_client()
+
+    def test_bulk_users_report_each_item(self):
+        response = self.client.post('/api/v1/users/bulk', json=[
+            {"first_name": "Ann", "last_name": "Bulk", "email": "ann.bulk@example.com"},
+            {"first_name": "Bob", "last_name": "Bulk", "email": "ann.bulk@example.com"},
+            {"first_name": "", "last_name": "Bulk", "email": "cid.bulk@example.com"},
+        ])
+        self.assertEqual(response.status_code, 207)
+        self.assertEqual([item['status'] for item in response.json['results']], [201, 400, 400])
+        self.assertEqual(response.json['results'][1]['error'], "Email already registered")
+
+    def test_bulk_buses_link_references(self):
+        from app.services import facade
+        owner = facade.create_user({"first_name": "Fleet", "last_name": "Owner",
+                                    "email": "fleet.bulk@example.com"})
+        report = facade.create_report({"comment": "Checked"})
+        items = [{"name": f"Bulk {i}", "engine_type": "hybrid", "euro_standard": 6,
+                  "owner_id": owner.id, "reports": [report.id]} for i in range(3)]
+        response = self.client.post('/api/v1/buses/bulk', json=items)
+        self.assertEqual(response.status_code, 201)
+        ids = [item['id'] for item in response.json['results']]
+        self.assertEqual(sorted(b.id for b in facade.get_buses_by_owner(owner.id)), sorted(ids))
+        self.assertEqual(facade.get_bus(ids[0]).report_ids, [report.id])
+
+        response = self.client.put('/api/v1/buses/bulk', json=[{"id": ids[0], "status": 1},
+                                                               {"id": "missing", "status": 1}])
+        self.assertEqual(response.status_code, 207)
+        self.assertEqual(facade.get_bus(ids[0]).status, 1)
+        for bus_id in ids:
+            facade.delete_bus(bus_id)
+
+    def test_bulk_buses_require_an_owner_like_post(self):
+        for owner in ({}, {"owner_id": "missing"}):
+            item = dict({"name": "Orphan", "engine_type": "hybrid", "euro_standard": 6}, **owner)
+            single = self.client.post('/api/v1/buses/', json=item)
+            bulk = self.client.post('/api/v1/buses/bulk', json=[item])
+            self.assertEqual(single.status_code, 400)
+            self.assertEqual(bulk.status_code, 400)
+            self.assertEqual(bulk.json['results'][0]['error'], single.json['error'])
+
+    def test_update_rejects_private_fields(self):
+        from app.services import facade
+        bus = facade.create_bus({"name": "Private", "engine_type": "hybrid", "euro_standard": 6})
+        for key in ("_observers", "_version", "_cache", "_created_at", "version"):
+            response = self.client.put(f'/api/v1/buses/{bus.id}', json={key: []})
+            self.assertEqual(response.status_code, 400, key)
+        response = self.client.put('/api/v1/buses/bulk', json=[{"id": bus.id, "_observers": []}])
+        self.assertEqual(response.json['results'][0]['status'], 400)
+        self.assertEqual(self.client.put(f'/api/v1/buses/{bus.id}', json={"status": 1}).status_code, 200)
+        self.assertIn(bus, facade.get_buses_by_status(1))
+        self.assertNotIn(bus, facade.get_buses_by_status(0))
+        facade.delete_bus(bus.id)
+
+    def test_bulk_body_must_be_a_list(self):
+        response = self.client.post('/api/v1/reports/bulk', json={"comment": "Not a list"})
+        self.assertEqual(response.status_code, 400)
+
+
+class TestRWLock(unittest.TestCase):
+
+    def test_readers_share_and_writers_exclude(self):
+        import threading
+        from app.persistence.locks import RWLock
+        lock = RWLock()
+        both_reading = threading.Barrier(2, timeout=5)
+        events = []
+
+        def reader():
+            with lock.read():
+                both_reading.wait()
+                events.append('read')
+
+        def writer():
+            with lock.write():
+                events.append('write')
+
+        readers = [threading.Thread(target=reader) for _ in range(2)]
+        with lock.write():
+            for thread in readers:
+                thread.start()
+            late_writer = threading.Thread(target=writer)
+            late_writer.start()
+            events.append('first write')
+        for thread in readers + [late_writer]:
+            thread.join(5)
+        self.assertEqual(events[0], 'first write')
+        self.assertEqual(sorted(events[1:]), ['read', 'read', 'write'])
+
+    def test_reentrant_and_no_upgrade(self):
+        from app.persistence.locks import RWLock
+        lock = RWLock()
+        with lock.write():
+            with lock.read():
+                with lock.write():
+                    pass
+        with lock.read():
+            with lock.read():
+                pass
+            with self.assertRaises(RuntimeError):
+                with lock.write():
+                    pass
+
+    def test_facade_compound_updates_are_atomic(self):
+        import threading
+        from app.services.facade import Facade
+        facade = Facade(thread_safe=True)
+        owner = facade.create_user({"first_name": "Ann", "last_name": "Lee", "email": "ann@example.com"})
+        route = facade.create_route({"route_number": "1", "name": "Loop", "user_id": owner.id,
+                                     "bus_id": [facade.create_bus({"name": "A", "engine_type": "hybrid",
+                                                                   "euro_standard": 6}).id]})
+        buses = [facade.create_bus({"name": f"B{i}", "engine_type": "hybrid", "euro_standard": 6})
+                 for i in range(8)]
+
+        def relink(vehicle):
+            for _ in range(50):
+                facade.update_bus(vehicle.id, {"routes": [route.id]})
+                facade.update_bus(vehicle.id, {"routes": []})
+            facade.update_bus(vehicle.id, {"routes": [route.id]})
+
+        threads = [threading.Thread(target=relink, args=(vehicle,)) for vehicle in buses]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(sorted(route.bus_ids),
+                         sorted(b.id for b in facade.get_buses_by_route(route.id)))
+        self.assertEqual(len(route.bus_ids), 9)
+
+
+class TestAssignments(unittest.TestCase):
+
+    def setUp(self):
+        from app.services import facade
+        self.app = create_app()
+        self.client = self.app.test_client()
+        self.owner = facade.create_user({"first_name": "Sam", "last_name": "Planner",
+                                         "email": "sam.planner@example.com"})
+        self.bus = facade.create_bus({"name": "Sched", "engine_type": "hybrid", "euro_standard": 6})
+        self.route = facade.create_route({"route_number": "42", "name": "Harbour",
+                                          "user_id": self.owner.id, "bus_id": [self.bus.id]})
+
+    def tearDown(self):
+        from app.services import facade
+        facade.delete_user(self.owner.id)
+        facade.delete_route(self.route.id)
+        facade.delete_bus(self.bus.id)
+
+    def book(self, start, end):
+        return self.client.post('/api/v1/assignments/', json={
+            "bus_id": self.bus.id, "route_id": self.route.id, "start": start, "end": end})
+
+    def test_overlapping_assignment_is_rejected(self):
+        first = self.book("2030-01-01T08:00:00", "2030-01-01T10:00:00")
+        self.assertEqual(first.status_code, 201)
+        self.assertEqual(self.book("2030-01-01T10:00:00", "2030-01-01T11:00:00").status_code, 201)
+        clash = self.book("2030-01-01T09:55:00", "2030-01-01T10:05:00")
+        self.assertEqual(clash.status_code, 409)
+        self.assertEqual(len(clash.json['conflicts']), 2)
+        self.assertEqual(self.book("2030-01-01T12:00:00", "2030-01-01T11:00:00").status_code, 400)
+
+    def test_availability_lists_bookings_and_gaps(self):
+        booking = self.book("2030-01-02T09:00:00", "2030-01-02T10:00:00").json
+        response = self.client.get(f'/api/v1/buses/{self.bus.id}/availability', query_string={
+            'from': "2030-01-02T08:00:00", 'to': "2030-01-02T12:00:00"})
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.json['available'])
+        self.assertEqual([b['id'] for b in response.json['busy']], [booking['id']])
+        self.assertEqual(response.json['free'], [
+            {'start': "2030-01-02T08:00:00", 'end': "2030-01-02T09:00:00"},
+            {'start': "2030-01-02T10:00:00", 'end': "2030-01-02T12:00:00"}])
+
+        self.client.delete(f"/api/v1/assignments/{booking['id']}")
+        response = self.client.get(f'/api/v1/buses/{self.bus.id}/availability', query_string={
+            'from': "2030-01-02T08:00:00", 'to': "2030-01-02T12:00:00"})
+        self.assertTrue(response.json['available'])
+
+    def test_fleet_available_excludes_booked_buses(self):
+        from app.services import facade
+        spare = facade.create_bus({"name": "Spare", "engine_type": "hybrid", "euro_standard": 6,
+                                   "status": 1})
+        facade.update_bus(self.bus.id, {"status": 1})
+        self.book("2030-01-03T09:00:00", "2030-01-03T09:07:00")
+        query = {'engine_type': 'hybrid', 'status': 1}
+
+        def available(start, end):
+            response = self.client.get('/api/v1/buses/available', query_string=dict(
+                query, **{'from': start, 'to': end}))
+            self.assertEqual(response.status_code, 200)
+            return {bus['id'] for bus in response.json['buses']} & {self.bus.id, spare.id}
+
+        self.assertEqual(available("2030-01-03T08:00:00", "2030-01-03T12:00:00"), {spare.id})
+        # Edges inside a partly booked 5-minute slot are resolved exactly.
+        self.assertEqual(available("2030-01-03T09:07:00", "2030-01-03T09:30:00"),
+                         {self.bus.id, spare.id})
+        self.assertEqual(available("2030-01-03T08:00:00", "2030-01-03T09:01:00"), {spare.id})
+        facade.update_bus(spare.id, {"status": 0})
+        self.assertEqual(available("2030-01-03T10:00:00", "2030-01-03T11:00:00"), {self.bus.id})
+        facade.delete_bus(spare.id)
+
+
+class TestMaintenance(unittest.TestCase):
+
+    def setUp(self):
+        from app.services import facade
+        self.app = create_app()
+        self.client = self.app.test_client()
+        self.tech = facade.create_user({"first_name": "Tia", "last_name": "Wrench",
+                                        "email": "tia.wrench@example.com"})
+        self.bus = facade.create_bus({"name": "Depot", "engine_type": "thermal", "euro_standard": 5})
+        self.route = facade.create_route({"route_number": "9", "name": "Ring",
+                                          "user_id": self.tech.id, "bus_id": [self.bus.id]})
+
+    def tearDown(self):
+        from app.services import facade
+        facade.delete_route(self.route.id)
+        facade.delete_bus(self.bus.id)
+        facade.delete_user(self.tech.id)
+
+    def schedule(self, start, end, bus_id=None):
+        return self.client.post('/api/v1/maintenance/', json={
+            "bus_id": bus_id or self.bus.id, "type": "brakes", "start": start, "end": end,
+            "technician_id": self.tech.id})
+
+    def test_maintenance_and_assignments_block_each_other(self):
+        from app.services import facade
+        self.assertEqual(self.schedule("2030-02-01T08:00:00", "2030-02-01T12:00:00").status_code, 201)
+        clash = self.client.post('/api/v1/assignments/', json={
+            "bus_id": self.bus.id, "route_id": self.route.id,
+            "start": "2030-02-01T11:00:00", "end": "2030-02-01T13:00:00"})
+        self.assertEqual(clash.status_code, 409)
+        facade.create_assignment({"bus_id": self.bus.id, "route_id": self.route.id,
+                                  "start": "2030-02-01T12:00:00", "end": "2030-02-01T13:00:00"})
+        self.assertEqual(self.schedule("2030-02-01T12:30:00", "2030-02-01T14:00:00").status_code, 409)
+        busy, _ = facade.get_bus_availability(self.bus.id, "2030-02-01T00:00:00", "2030-02-02T00:00:00")
+        self.assertEqual([booking.kind for booking in busy], ['maintenance', 'assignment'])
+
+        retired = facade.create_bus({"name": "Old", "engine_type": "thermal", "euro_standard": 3,
+                                     "status": -1})
+        self.assertEqual(self.schedule("2030-02-01T08:00:00", "2030-02-01T09:00:00",
+                                       retired.id).status_code, 400)
+        facade.delete_bus(retired.id)
+
+    def test_upcoming_maintenance_is_ordered_by_start(self):
+        from datetime import datetime, timedelta
+        from app.services import facade
+        now = datetime.now().replace(microsecond=0)
+        later = self.schedule((now + timedelta(days=3)).isoformat(),
+                              (now + timedelta(days=3, hours=2)).isoformat()).json
+        sooner = self.schedule((now + timedelta(days=1)).isoformat(),
+                               (now + timedelta(days=1, hours=2)).isoformat()).json
+        self.schedule((now + timedelta(days=30)).isoformat(),
+                      (now + timedelta(days=30, hours=2)).isoformat())
+        response = self.client.get('/api/v1/maintenance/upcoming', query_string={'days': 7})
+        self.assertEqual(response.status_code, 200)
+        ids = [m['id'] for m in response.json['maintenance'] if m['bus_id'] == self.bus.id]
+        self.assertEqual(ids, [sooner['id'], later['id']])
+        facade.delete_maintenance(sooner['id'])
+        self.assertNotIn(sooner['id'], [m.id for m in facade.get_upcoming_maintenance(7)])
+
+
+class TestFleetStats(unittest.TestCase):
+
+    def test_stats_follow_bus_writes(self):
+        from app.services.facade import Facade
+        facade = Facade()
+        first = facade.create_bus({"name": "A", "engine_type": "electric", "euro_standard": 6,
+                                   "price": 100.0, "capacity": 40, "status": 1})
+        facade.create_bus({"name": "B", "engine_type": "thermal", "euro_standard": 5,
+                           "price": 50.0, "capacity": 60, "status": 1})
+        stats = facade.get_fleet_stats()
+        self.assertEqual(stats['count'], 2)
+        self.assertEqual(stats['price'], {'total': 150.0, 'average': 75.0})
+        self.assertEqual(stats['by_engine_type']['electric']['capacity']['total'], 40)
+
+        facade.update_bus(first.id, {"engine_type": "thermal", "price": 150.0})
+        facade.create_bus({"name": "C", "engine_type": "hybrid", "euro_standard": 6})
+        stats = facade.get_fleet_stats(('engine_type',))
+        self.assertNotIn('electric', stats['by_engine_type'])
+        self.assertEqual(stats['by_engine_type']['thermal']['count'], 2)
+        self.assertEqual(stats['by_engine_type']['thermal']['price']['average'], 100.0)
+        self.assertNotIn('by_status', stats)
+
+        facade.delete_bus(first.id)
+        stats = facade.get_fleet_stats()
+        self.assertEqual(stats['count'], 2)
+        self.assertEqual(stats['by_euro_standard'][6]['count'], 1)
+        self.assertEqual(stats['price']['total'], 50.0)
+        with self.assertRaises(ValueError):
+            facade.get_fleet_stats(('name',))
+
+    def test_stats_endpoint(self):
+        client = create_app().test_client()
+        response = client.get('/api/v1/fleet/stats')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('by_euro_standard', response.json)
+        self.assertEqual(client.get('/api/v1/fleet/stats?group_by=price').status_code, 400)
+
+
+class TestQuery(unittest.TestCase):
+
+    def setUp(self):
+        from app.services.facade import Facade
+        self.facade = Facade()
+        engines = ('electric', 'thermal', 'hybrid')
+        self.buses = [self.facade.create_bus({"name": f"Bus {i}", "engine_type": engines[i % 3],
+                                              "euro_standard": 5 + i % 2, "status": i % 4 and 1,
+                                              "price": float(i)})
+                      for i in range(60)]
+
+    def expected(self, predicate):
+        return [bus.id for bus in self.buses if predicate(bus)]
+
+    def test_filters_match_a_scan(self):
+        from app.models.bus import Bus
+        cases = [
+            ({'status': 1, 'engine_type__in': ['electric', 'hybrid'], 'price__lt': 30},
+             lambda b: b.status == 1 and b.engine_type in ('electric', 'hybrid') and b.price < 30),
+            ({'or': [{'engine_type': 'thermal', 'euro_standard': 6}, {'status': 0}],
+              'name__prefix': 'Bus 1'},
+             lambda b: (b.engine_type == 'thermal' and b.euro_standard == 6 or b.status == 0)
+             and b.name.startswith('Bus 1')),
+            ({'price__gte': 10, 'price__lte': 12}, lambda b: 10 <= b.price <= 12),
+        ]
+        for filters, predicate in cases:
+            found = [bus.id for bus in self.facade.query(Bus, filters)]
+            self.assertEqual(found, self.expected(predicate))
+
+    def test_planner_uses_indexes_and_explains(self):
+        from app.models.bus import Bus
+        plan = self.facade.explain(Bus, {'status': 1, 'euro_standard': 6, 'price__gt': 5})
+        self.assertIn('IndexIntersection', plan)
+        self.assertIn('Filter price > 5', plan)
+        self.assertIn('IndexUnion', self.facade.explain(Bus, {'or': [{'status': 0}, {'euro_standard': 5}]}))
+        self.assertIn('FullScan', self.facade.explain(Bus, {'name__prefix': 'Bus'}))
+
+    def test_order_limit_and_pages(self):
+        from app.models.bus import Bus
+        top = self.facade.query(Bus, {'engine_type': 'electric'}, order_by='-price', limit=3)
+        self.assertEqual([bus.price for bus in top], [57.0, 54.0, 51.0])
+        filters = {'engine_type__in': ['electric', 'hybrid'], 'status': 1}
+        first, position = self.facade.get_buses_page(5, None, filters)
+        second, _ = self.facade.get_buses_page(5, position, filters)
+        expected = self.expected(lambda b: b.engine_type in ('electric', 'hybrid') and b.status == 1)
+        self.assertEqual([bus.id for bus in first + second], expected[:10])
+        with self.assertRaises(ValueError):
+            self.facade.get_buses_page(5, position, filters, order_by='price')
+
+    def test_ordered_pages_resume_from_a_keyset(self):
+        from app.api.v1.pagination import decode_cursor, encode_cursor
+        order_by = ['-status', 'euro_standard', '-price']
+        seen, position = [], None
+        while True:
+            page, position = self.facade.get_buses_page(7, position, {'price__lt': 50}, order_by)
+            seen += [bus.id for bus in page]
+            if position is None:
+                break
+            self.assertEqual(decode_cursor(encode_cursor(position)), position)
+        ordered = sorted((bus for bus in self.buses if bus.price < 50),
+                         key=lambda b: (-b.status, b.euro_standard, -b.price))
+        self.assertEqual(seen, [bus.id for bus in ordered])
+        with self.assertRaises(ValueError):
+            self.facade.get_buses_page(7, (1, 5.0), None, order_by)
+        with self.assertRaises(ValueError):
+            self.facade.get_buses_page(7, (1, 5, 3.0, 9), None)
+
+    def test_model_list_and_api_filters(self):
+        from app.models.bus import Bus
+        from app.services import facade
+        bus = facade.create_bus({"name": "Query target", "engine_type": "hydrogen",
+                                 "euro_standard": 6, "price": 123456.0})
+        try:
+            self.assertIn(bus.id, [found.id for found in Bus.list({'name__prefix': 'Query t'})])
+            client = create_app().test_client()
+            response = client.get('/api/v1/buses/?engine_type__in=hydrogen&price__gte=123456'
+                                  '&order_by=-price')
+            self.assertEqual(response.status_code, 200)
+            self.assertIn(bus.id, [found['id'] for found in response.json['buses']])
+            self.assertEqual(client.get('/api/v1/buses/?price__gte=cheap').status_code, 400)
+            self.assertEqual(client.get('/api/v1/buses/?name__gte=A').status_code, 400)
+            self.assertIn('plan', client.get('/api/v1/buses/?status=1&explain=1').json)
+        finally:
+            facade.delete_bus(bus.id)
+
+
+class TestReportSearch(unittest.TestCase):
+
+    def test_search_folds_ranks_and_follows_writes(self):
+        from app.services.facade import Facade
+        facade = Facade()
+        brakes = facade.create_report({"comment": "Brake pads worn, brakes squeal"})
+        door = facade.create_report({"comment": "Rear door stuck"})
+        french = facade.create_report({"comment": "Frein arrière cassé"})
+        facade.create_report({"comment": "Braking feels soft"})
+
+        ranked, more = facade.search_reports("brake", 10)
+        self.assertEqual(ranked[0][0].id, brakes.id)
+        self.assertEqual(len(ranked), 1)  # "brakes" matches the prefix, "braking" does not
+        self.assertFalse(more)
+        self.assertEqual([r.id for r, _ in facade.search_reports("CASSE", 10)[0]], [french.id])
+        self.assertEqual(len(facade.search_reports("bra", 10)[0]), 2)
+        self.assertEqual(facade.search_reports("door brake", 10)[0], [])
+
+        facade.update_report(door.id, {"comment": "Door fixed, brake light out"})
+        self.assertEqual(len(facade.search_reports("door brake", 10)[0]), 1)
+        facade.delete_report(brakes.id)
+        self.assertNotIn(brakes.id, [r.id for r, _ in facade.search_reports("brake", 10)[0]])
+        page, more = facade.search_reports("bra", 1)
+        self.assertTrue(more)
+
+    def test_search_endpoint(self):
+        client = create_app().test_client()
+        created = client.post('/api/v1/reports/', json={"comment": "Wiper motor dead"}).json
+        response = client.get('/api/v1/reports/search', query_string={'q': 'wip'})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(created['id'], [report['id'] for report in response.json['reports']])
+        self.assertEqual(client.get('/api/v1/reports/search?q=%20!').status_code, 400)
+        client.delete(f"/api/v1/reports/{created['id']}")
+        response = client.get('/api/v1/reports/search', query_string={'q': 'wiper'})
+        self.assertNotIn(created['id'], [report['id'] for report in response.json['reports']])
+
+    def test_search_cursor_is_an_offset(self):
+        from app.api.v1.pagination import encode_cursor
+        client = create_app().test_client()
+        for position in (-5, ('2024', 3)):
+            response = client.get('/api/v1/reports/search',
+                                  query_string={'q': 'wiper', 'cursor': encode_cursor(position)})
+            self.assertEqual(response.status_code, 400)
+        response = client.get('/api/v1/reports/search',
+                              query_string={'q': 'wiper', 'cursor': encode_cursor(2)})
+        self.assertEqual(response.status_code, 200)
+
+
+class TestConditionalGet(unittest.TestCase):
+
+    def setUp(self):
+        self.client = create_app().test_client()
+
+    def test_entity_etag_follows_changes(self):
+        from unittest import mock
+        from app.services import facade
+        bus = facade.create_bus({"name": "Tagged", "engine_type": "electric", "euro_standard": 6})
+        try:
+            first = self.client.get(f'/api/v1/buses/{bus.id}')
+            tag = first.headers['ETag']
+            with mock.patch.object(type(bus), 'to_dict') as to_dict:
+                again = self.client.get(f'/api/v1/buses/{bus.id}', headers={'If-None-Match': tag})
+                to_dict.assert_not_called()
+            self.assertEqual(again.status_code, 304)
+            self.assertEqual(again.headers['ETag'], tag)
+            self.assertNotEqual(
+                self.client.get(f'/api/v1/buses/{bus.id}?expand=owner').headers['ETag'], tag)
+
+            facade.update_bus(bus.id, {"name": "Retagged"})
+            changed = self.client.get(f'/api/v1/buses/{bus.id}', headers={'If-None-Match': tag})
+            self.assertEqual(changed.status_code, 200)
+            self.assertEqual(changed.json['name'], 'Retagged')
+        finally:
+            facade.delete_bus(bus.id)
+
+    def test_collection_etag_follows_repository_writes(self):
+        from app.services import facade
+        tag = self.client.get('/api/v1/reports/?limit=5').headers['ETag']
+        self.assertEqual(self.client.get('/api/v1/reports/?limit=5',
+                                         headers={'If-None-Match': tag}).status_code, 304)
+        self.assertEqual(self.client.get('/api/v1/reports/?limit=6',
+                                         headers={'If-None-Match': tag}).status_code, 200)
+        report = facade.create_report({"comment": "Mirror loose"})
+        self.assertEqual(self.client.get('/api/v1/reports/?limit=5',
+                                         headers={'If-None-Match': tag}).status_code, 200)
+        tag = self.client.get('/api/v1/reports/?limit=5').headers['ETag']
+        facade.update_report(report.id, {"comment": "Mirror fixed"})
+        self.assertEqual(self.client.get('/api/v1/reports/?limit=5',
+                                         headers={'If-None-Match': tag}).status_code, 200)
+        facade.delete_report(report.id)
+
+
+class TestCompression(unittest.TestCase):
+
+    def setUp(self):
+        from app.services import facade
+        self.client = create_app().test_client()
+        self.reports = [report for report, _ in facade.create_reports_many(
+            [{"comment": f"Door {i} sticks when closing"} for i in range(40)])]
+
+    def tearDown(self):
+        from app.services import facade
+        for report in self.reports:
+            facade.delete_report(report.id)
+
+    def test_negotiated_encodings(self):
+        import gzip
+        import json
+        import zlib
+        plain = self.client.get('/api/v1/reports/?limit=40')
+        self.assertNotIn('Content-Encoding', plain.headers)
+        self.assertIn('Accept-Encoding', plain.headers['Vary'])
+
+        zipped = self.client.get('/api/v1/reports/?limit=40', headers={'Accept-Encoding': 'gzip'})
+        self.assertEqual(zipped.headers['Content-Encoding'], 'gzip')
+        self.assertLess(len(zipped.data), len(plain.data))
+        self.assertEqual(json.loads(gzip.decompress(zipped.data)), plain.json)
+        self.assertEqual(zipped.headers['ETag'], plain.headers['ETag'][:-1] + '-gzip"')
+        revalidated = self.client.get('/api/v1/reports/?limit=40', headers={
+            'Accept-Encoding': 'gzip', 'If-None-Match': zipped.headers['ETag']})
+        self.assertEqual(revalidated.status_code, 304)
+        self.assertEqual(revalidated.headers['ETag'], zipped.headers['ETag'])
+
+        deflated = self.client.get('/api/v1/reports/?limit=40',
+                                   headers={'Accept-Encoding': 'gzip;q=0.5, deflate'})
+        self.assertEqual(deflated.headers['Content-Encoding'], 'deflate')
+        self.assertEqual(json.loads(zlib.decompress(deflated.data)), plain.json)
+        self.assertEqual(deflated.headers['ETag'], plain.headers['ETag'][:-1] + '-deflate"')
+
+        small = self.client.get('/api/v1/reports/?limit=1', headers={'Accept-Encoding': 'gzip'})
+        self.assertNotIn('Content-Encoding', small.headers)
+
+    def test_streamed_body_is_compressed(self):
+        import gzip
+        plain = self.client.get('/api/v1/reports/?stream=ndjson')
+        zipped = self.client.get('/api/v1/reports/?stream=ndjson', headers={'Accept-Encoding': 'gzip'})
+        self.assertEqual(zipped.headers['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(zipped.data), plain.data)
+
+    def test_encoders_agree(self):
+        import json
+        from datetime import datetime
+        from app.api.v1 import serialization
+        data = {"when": datetime(2024, 5, 1, 8, 30, 0, 250), "items": [1, 2.5, None, "é"]}
+        encoded = {name: dumps(data) for name, dumps in serialization.ENCODERS.items()}
+        for body in encoded.values():
+            self.assertEqual(body, encoded['json'])
+        floats = [1e16, 1e-7, 0.1, float('nan'), float('inf'), -float('inf')]
+        for name, dumps in serialization.ENCODERS.items():
+            self.assertEqual(json.loads(dumps(floats)), [1e16, 1e-7, 0.1, None, None, None], name)
+        with self.assertRaises(ValueError):
+            serialization.get_encoder('no-such-encoder')
+
+    def test_encoder_is_chosen_per_app(self):
+        from unittest import mock
+        from config import Config
+        from app.api.v1 import serialization
+        with mock.patch.object(Config, 'JSON_ENCODER', 'json'):
+            stdlib_app = create_app()
+        with mock.patch.object(Config, 'JSON_ENCODER', 'auto'):
+            app = create_app()
+        self.assertIs(stdlib_app.config['JSON_DUMPS'], serialization.ENCODERS['json'])
+        self.assertIs(app.config['JSON_DUMPS'], serialization.get_encoder('auto'))
+        with stdlib_app.app_context():
+            self.assertIs(serialization.app_encoder(), serialization.ENCODERS['json'])
+
+
+class TestMetrics(unittest.TestCase):
+
+    def test_histogram_sums_threads(self):
+        import threading
+        from app.metrics import Histogram
+        histogram = Histogram('demo_seconds', 'Demo.', ('kind',), buckets=(0.1, 1.0))
+        histogram.observe(0.05, ('a',))
+        worker = threading.Thread(target=lambda: [histogram.observe(value, ('a',)) for value in (0.5, 3.0)])
+        worker.start()
+        worker.join()
+        self.assertEqual(histogram.collect(), {('a',): [1, 1, 1, 3.55]})
+        lines = histogram.render()
+        self.assertIn('demo_seconds_bucket{kind="a",le="1"} 2', lines)
+        self.assertIn('demo_seconds_bucket{kind="a",le="+Inf"} 3', lines)
+        self.assertIn('demo_seconds_count{kind="a"} 3', lines)
+
+    def test_facade_and_repository_timers(self):
+        import os
+        import tempfile
+        from app.services.facade import Facade
+        from app.metrics import FACADE_SECONDS, REPOSITORY_SECONDS
+
+        def count(histogram, labels):
+            return sum(histogram.collect().get(labels, [0, 0])[:-1])
+
+        facade = Facade(metrics=True)
+        adds = count(REPOSITORY_SECONDS, ('buses', 'add'))
+        bus = facade.create_bus({"name": "Timed", "engine_type": "electric", "euro_standard": 6})
+        self.assertEqual(count(REPOSITORY_SECONDS, ('buses', 'add')), adds + 1)
+        calls = count(FACADE_SECONDS, ('get_bus',))
+        reads = count(REPOSITORY_SECONDS, ('buses', 'get'))
+        facade.get_bus(bus.id)
+        self.assertEqual(count(FACADE_SECONDS, ('get_bus',)), calls + 1)
+        self.assertEqual(count(REPOSITORY_SECONDS, ('buses', 'get')), reads + 1)
+        Facade().get_bus(bus.id)
+        self.assertEqual(count(FACADE_SECONDS, ('get_bus',)), calls + 1)
+
+        with tempfile.TemporaryDirectory() as tmp:
+            stored = Facade(backend='sqlite', sqlite_path=os.path.join(tmp, 'timed.db'), metrics=True)
+            bus = stored.create_bus({"name": "Timed", "engine_type": "electric", "euro_standard": 6})
+            stored.get_bus(bus.id)
+            self.assertEqual(count(REPOSITORY_SECONDS, ('buses', 'get')), reads + 2)
+            stored.close()
+
+    def test_sampled_timers_count_every_call(self):
+        from app.metrics import Histogram, timed
+        histogram = Histogram('sampled_seconds', 'Demo.', ('kind',))
+        double = timed(histogram, ('a',), sample=4)(lambda x: x * 2)
+        self.assertEqual([double(i) for i in range(8)], [0, 2, 4, 6, 8, 10, 12, 14])
+        # The first and fifth calls are timed, each standing for four.
+        self.assertEqual(sum(histogram.collect()[('a',)][:-1]), 8)
+
+    def test_metrics_endpoint(self):
+        from unittest import mock
+        from config import Config
+        with mock.patch.object(Config, 'METRICS', True):
+            client = create_app().test_client()
+        client.get('/api/v1/buses/missing')
+        response = client.get('/metrics')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.content_type.startswith('text/plain; version=0.0.4'))
+        text = response.get_data(as_text=True)
+        self.assertIn('http_request_duration_seconds_count{method="GET",'
+                      'route="/api/v1/buses/<string:bus_id>",status="404"}', text)
+        self.assertIn('repository_objects{repository="buses"}', text)
+        self.assertIn('# TYPE serialization_cache_requests_total counter', text)
+
+
+class TestProfiling(unittest.TestCase):
+
+    def setUp(self):
+        import tempfile
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        import shutil
+        shutil.rmtree(self.directory)
+
+    def test_token_gated_profiles(self):
+        import os
+        import pstats
+        from app.api.v1.profiling import Profiler
+        from app.services import facade
+        app = create_app()
+        app.wsgi_app = Profiler(app.wsgi_app, self.directory, token='s3cret')
+        client = app.test_client()
+        bus = facade.create_bus({"name": "Profiled", "engine_type": "electric", "euro_standard": 6})
+        try:
+            for headers in ({}, {'X-Profile': 'guess'}):
+                self.assertNotIn('X-Profile-File', client.get(f'/api/v1/buses/{bus.id}', headers=headers).headers)
+            self.assertEqual(os.listdir(self.directory), [])
+
+            response = client.get(f'/api/v1/buses/{bus.id}', headers={'X-Profile': 's3cret'})
+            self.assertEqual(response.status_code, 200)
+            stats = pstats.Stats(os.path.join(self.directory, response.headers['X-Profile-File']))
+            self.assertTrue(any(name == 'get_bus' for _, _, name in stats.stats))
+
+            response = client.get(f'/api/v1/buses/{bus.id}',
+                                  headers={'X-Profile': 's3cret', 'X-Profile-Format': 'collapsed'})
+            with open(os.path.join(self.directory, response.headers['X-Profile-File'])) as folded:
+                lines = folded.read().splitlines()
+            self.assertTrue(all(line.rsplit(' ', 1)[1].isdigit() for line in lines))
+            self.assertTrue(any('get_bus (app/services/facade.py' in line for line in lines))
+        finally:
+            facade.delete_bus(bus.id)
+
+    def test_slow_requests_logged_with_samples(self):
+        import os
+        import time
+        from app.api.v1.profiling import Profiler
+
+        def slow_app(environ, start_response):
+            time.sleep(0.05)
+            start_response('200 OK', [])
+            return [b'done']
+
+        def fast_app(environ, start_response):
+            start_response('200 OK', [])
+            return [b'done']
+
+        profiler = Profiler(slow_app, self.directory, sample_interval=0.002, slow_ms=20)
+        profiler({'REQUEST_METHOD': 'GET', 'PATH_INFO': '/slow'}, lambda *args: None)
+        profiler.wsgi_app = fast_app
+        profiler({'REQUEST_METHOD': 'GET', 'PATH_INFO': '/fast'}, lambda *args: None)
+        profiler.close()
+        with open(os.path.join(self.directory, 'slow.log')) as log:
+            entry = log.read()
+        self.assertIn('GET unmatched 200', entry)
+        self.assertIn('/slow', entry)
+        self.assertNotIn('/fast', entry)
+        self.assertIn('slow_app (app/test.py', entry)
+        with open(os.path.join(self.directory, 'sampled.folded')) as folded:
+            self.assertTrue(folded.read().startswith('GET unmatched;slow_app'))
+
+    def test_concurrent_atomic_writes(self):
+        import os
+        import threading
+        from app.profiling import write_atomically
+        path = os.path.join(self.directory, 'sampled.folded')
+        errors = []
+
+        def write(n):
+            try:
+                for _ in range(50):
+                    write_atomically(path, f"writer {n}\n")
+            except OSError as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=write, args=(n,)) for n in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+        self.assertEqual(os.listdir(self.directory), ['sampled.folded'])
+
+    def test_write_failures_are_logged_not_raised(self):
+        import os
+        import shutil
+        import time
+        from app.api.v1.profiling import Profiler
+
+        def slow_app(environ, start_response):
+            time.sleep(0.03)
+            start_response('200 OK', [])
+            return [b'done']
+
+        profiler = Profiler(slow_app, self.directory, sample_interval=0.002, slow_ms=10)
+        shutil.rmtree(self.directory)
+        try:
+            with self.assertLogs('app.api.v1.profiling', 'ERROR') as logged:
+                body = profiler({'REQUEST_METHOD': 'GET', 'PATH_INFO': '/slow'}, lambda *args: None)
+                profiler.close()
+        finally:
+            os.makedirs(self.directory)
+        self.assertEqual(body, [b'done'])
+        self.assertEqual(len(logged.records), 2)
+
+
+class TestBenchmarkSuite(unittest.TestCase):
+    def test_fleet_is_deterministic_and_loads(self):
+        from app.services.facade import Facade
+        from benchmarks.fleet import generate, populate
+        fleet = generate(20, seed=3)
+        self.assertEqual(generate(20, seed=3).buses, fleet.buses)
+        self.assertNotEqual(generate(20, seed=4).buses, fleet.buses)
+
+        facade = Facade()
+        ids = populate(facade, fleet)
+        self.assertEqual({kind: len(values) for kind, values in ids.items()}, fleet.counts())
+        for data, bus_id in zip(fleet.buses, ids['buses']):
+            self.assertEqual(len(facade.get_bus(bus_id).report_ids), len(data['reports']))
+        route_id = ids['routes'][0]
+        self.assertEqual(len(facade.get_buses_by_route(route_id)), len(fleet.routes[0]['buses']))
+
+    def test_compare_flags_regressions_beyond_tolerance(self):
+        from benchmarks.suite import compare
+        rows = compare({'100': {'a': 1.0, 'b': 1.0, 'gone': 1.0}},
+                       {'100': {'a': 1.05, 'b': 1.5, 'new': 1.0}}, 0.1)
+        self.assertEqual([(name, regressed) for _, name, _, _, _, regressed in rows],
+                         [('a', False), ('b', True)])
+
+    def test_latency_histogram_percentiles(self):
+        from benchmarks.load import LatencyHistogram
+        histogram = LatencyHistogram()
+        for micros in range(1, 100001):
+            histogram.record(micros)
+        for percent in (50, 95, 99):
+            self.assertAlmostEqual(histogram.percentile(percent), percent * 1000, delta=percent * 10)
+        self.assertEqual(histogram.percentile(100), 100000)
+        self.assertLess(len(histogram.counts), 1000)
+
+    def test_load_run_replays_a_trace_without_errors(self):
+        from benchmarks.load import InProcess, run, seed_fleet, workload
+        requests = workload(200, users=5, seed=1, write_ratio=0.5)
+        self.assertEqual(workload(200, users=5, seed=1, write_ratio=0.5), requests)
+        target = InProcess()
+        ids = seed_fleet(target, 5, 1)
+        histograms, errors, _ = run(target, ids, requests, workers=3)
+        self.assertEqual(errors, {})
+        self.assertEqual(sum(histogram.total for histogram in histograms.values()), 200)
+
+
+class TestAsgi(unittest.TestCase):
+    def setUp(self):
+        from app.asgi import create_asgi_app
+        self.app = create_asgi_app()
+        self.client = self.app.bridge.wsgi_app.test_client()
+
+    def tearDown(self):
+        self.app.executor.shutdown()
+
+    def call(self, method, path, query=b'', headers=(), body=b''):
+        import asyncio
+        scope = {'type': 'http', 'method': method, 'path': path, 'root_path': '',
+                 'query_string': query, 'headers': list(headers), 'http_version': '1.1',
+                 'scheme': 'http'}
+        sent = []
+
+        async def receive():
+            return {'type': 'http.request', 'body': body}
+
+        async def send(message):
+            sent.append(message)
+
+        asyncio.run(self.app(scope, receive, send))
+        return (sent[0]['status'], dict(sent[0]['headers']),
+                b''.join(message.get('body', b'') for message in sent[1:]))
+
+    def test_native_endpoints_answer_as_flask_does(self):
+        import asyncio
+        import json
+        status, _, body = self.call('POST', '/api/v1/users/', body=json.dumps({
+            'first_name': 'Asgi', 'last_name': 'Owner', 'email': 'asgi.owner@example.com'}).encode(),
+            headers=[(b'content-type', b'application/json')])
+        self.assertEqual(status, 201)
+        owner_id = json.loads(body)['id']
+        report = self.client.post('/api/v1/reports/', json={'comment': 'Brake check'}).json
+        bus = asyncio.run(self.app.api.create_bus({
+            'name': 'Asgi', 'engine_type': 'electric', 'euro_standard': 6,
+            'owner_id': owner_id, 'reports': [report['id']]}))
+
+        path = f'/api/v1/buses/{bus.id}'
+        status, headers, body = self.call('GET', path, query=b'expand=owner,reports')
+        expected = self.client.get(f'{path}?expand=owner,reports')
+        self.assertEqual((status, body), (200, expected.data))
+        self.assertEqual(headers[b'etag'].decode(), expected.headers['ETag'])
+        status, _, body = self.call('GET', path, query=b'expand=owner,reports',
+                                    headers=[(b'if-none-match', headers[b'etag'])])
+        self.assertEqual((status, body), (304, b''))
+        min_size, self.app.compress_min_size = self.app.compress_min_size, 0
+        try:
+            status, zipped, _ = self.call('GET', path, headers=[(b'accept-encoding', b'gzip')])
+        finally:
+            self.app.compress_min_size = min_size
+        self.assertEqual(zipped[b'etag'].decode(), self.client.get(path).headers['ETag'][:-1] + '-gzip"')
+        status, headers, _ = self.call('GET', path, headers=[(b'accept-encoding', b'gzip'),
+                                                             (b'if-none-match', zipped[b'etag'])])
+        self.assertEqual((status, headers[b'etag']), (304, zipped[b'etag']))
+        self.assertEqual(self.call('GET', '/api/v1/buses/missing')[0], 404)
+        # Static paths next to native ones are still Flask's.
+        self.assertEqual(self.call('GET', '/api/v1/buses/available')[2],
+                         self.client.get('/api/v1/buses/available').data)
+
+    def test_inline_calls_never_wait_for_the_lock_on_the_loop(self):
+        import asyncio
+        import threading
+        from app.services.facade import Facade
+        from app.services.async_facade import AsyncFacade
+        facade = Facade(thread_safe=True)
+        bus = facade.create_bus({"name": "Inline", "engine_type": "hybrid", "euro_standard": 6})
+        api = AsyncFacade(facade)
+
+        def hold(section, held, release):
+            with section():
+                held.set()
+                release.wait(5)
+
+        async def blocked_call(section, call):
+            held, release = threading.Event(), threading.Event()
+            holder = threading.Thread(target=hold, args=(section, held, release))
+            holder.start()
+            held.wait()
+            task = asyncio.ensure_future(call)
+            # The loop keeps running while the call waits for the lock.
+            await asyncio.sleep(0.05)
+            self.assertFalse(task.done())
+            release.set()
+            result = await task
+            holder.join()
+            return result
+
+        self.assertIs(asyncio.run(blocked_call(facade.lock.write, api.get_bus(bus.id))), bus)
+        report = asyncio.run(blocked_call(facade.lock.read, api.create_report({"comment": "Queued"})))
+        self.assertIs(facade.get_report(report.id), report)
+        # Uncontended calls still run inline.
+        self.assertIs(asyncio.run(api.get_bus(bus.id)), bus)
+
+    def test_async_create_bus_checks_relations(self):
+        import asyncio
+        from concurrent.futures import ThreadPoolExecutor
+        from app.services import facade
+        from app.services.async_facade import AsyncFacade
+        with ThreadPoolExecutor(4) as executor:
+            api = AsyncFacade(facade, executor)
+            owner = facade.create_user({'first_name': 'Async', 'last_name': 'Owner',
+                                        'email': 'async.owner@example.com'})
+
+            async def create():
+                return await asyncio.gather(*(api.create_bus({
+                    'name': f'Async {i}', 'engine_type': 'hybrid', 'euro_standard': 5,
+                    'owner_id': owner.id}) for i in range(5)))
+
+            buses = asyncio.run(create())
+            self.assertEqual({vehicle.owner_id for vehicle in buses}, {owner.id})
+            self.assertEqual(len({vehicle.id for vehicle in facade.get_buses_by_owner(owner.id)}), 5)
+            with self.assertRaisesRegex(ValueError, 'Owner not found'):
+                asyncio.run(api.create_bus({'name': 'Orphan', 'engine_type': 'hybrid',
+                                            'euro_standard': 5, 'owner_id': 'missing'}))
+            with self.assertRaisesRegex(ValueError, 'Route missing does not exist'):
+                asyncio.run(api.create_bus({'name': 'Lost', 'engine_type': 'hybrid',
+                                            'euro_standard': 5, 'routes': ['missing']}))
+
+
+class TestCompactModels(unittest.TestCase):
+
+    def test_default_lists_not_shared(self):
+        from app.models.bus import Bus
+        first = Bus("A", "electric", 6)
+        second = Bus("B", "electric", 6)
+        self.assertIsNot(first.routes, second.routes)
+        self.assertIsNot(first.reports, second.reports)
+
+    def test_engine_type_interned_and_validated(self):
+        from app.models.bus import Bus
+        bus = Bus("A", "electric", 6)
+        bus.engine_type = "".join(["hy", "brid"])
+        self.assertIs(bus.engine_type, Bus("B", "hybrid", 6).engine_type)
+        with self.assertRaises(TypeError):
+            bus.engine_type = "diesel"
+        with self.assertRaises(ValueError):
+            bus.length = 30
+
+    def test_timestamps_round_trip(self):
+        from app.models.report import Report
+        report = Report("Brake noise")
+        self.assertFalse(hasattr(report, "__dict__"))
+        before = report.updated_at
+        report.updated_at = before
+        self.assertEqual(report.updated_at, before)
+        self.assertEqual(report.to_dict()["created_at"], report.created_at.isoformat())
+
+
+class TestSerializationCache(unittest.TestCase):
+
+    def setUp(self):
+        from app.services.facade import Facade
+        self.facade = Facade()
+        self.user = self.facade.create_user({
+            "first_name": "Jane",
+            "last_name": "Doe",
+            "email": "jane.doe@example.com"
+        })
+        self.bus = self.facade.create_bus({"name": "A", "engine_type": "electric", "euro_standard": 6})
+        self.route = self.facade.create_route({
+            "route_number": "12",
+            "name": "Centre",
+            "user_id": self.user.id,
+            "bus_id": [self.bus.id]
+        })
+
+    def test_cached_until_changed(self):
+        from app.models.base_model import BaseModel
+        first = self.bus.to_dict()
+        hits = BaseModel.cache_stats()["Bus"]["hits"]
+        self.assertIs(self.bus.to_dict(), first)
+        self.assertEqual(BaseModel.cache_stats()["Bus"]["hits"], hits + 1)
+        self.bus.name = "B"
+        self.assertEqual(self.bus.to_dict()["name"], "B")
+
+    def test_relationship_mutators_invalidate(self):
+        report = self.facade.create_report({"comment": "Door stuck"})
+        self.bus.to_dict()
+        self.bus.add_report(report)
+        self.assertEqual(self.bus.to_dict()["reports"], [report.id])
+
+    def test_route_invalidated_by_embedded_bus(self):
+        self.route.to_dict()
+        self.facade.update_bus(self.bus.id, {"status": 1})
+        self.assertEqual(self.route.to_dict()["buses"][0]["status"], 1)
+        self.user.first_name = "Janet"
+        self.assertEqual(self.route.to_dict()["user"]["first_name"], "Janet")
+
+
+class TestSqliteRepository(unittest.TestCase):
+
+    def setUp(self):
+        import os
+        import tempfile
+        from app.services.facade import Facade
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, 'fleet.db')
+        self.facade = Facade(backend='sqlite', sqlite_path=self.path)
+
+    def tearDown(self):
+        self.facade.pool.close_all()
+        self.tmp.cleanup()
+
+    def test_data_survives_restart(self):
+        from app.services.facade import Facade
+        user = self.facade.create_user({
+            "first_name": "Jane",
+            "last_name": "Doe",
+            "email": "jane.doe@example.com"
+        })
+        bus = self.facade.create_bus({"name": "A", "engine_type": "electric",
+                                      "euro_standard": 6, "owner_id": user.id})
+        self.facade.update_bus(bus.id, {"status": 1})
+
+        restarted = Facade(backend='sqlite', sqlite_path=self.path)
+        loaded = restarted.get_bus(bus.id)
+        self.assertEqual(loaded.status, 1)
+        self.assertEqual(loaded.owner.email, "jane.doe@example.com")
+        self.assertEqual(restarted.get_buses_by_status(1), [loaded])
+        restarted.pool.close_all()
+
+    def test_unique_email(self):
+        self.facade.create_user({"first_name": "Jane", "last_name": "Doe",
+                                 "email": "jane.doe@example.com"})
+        with self.assertRaises(ValueError):
+            self.facade.create_user({"first_name": "John", "last_name": "Doe",
+                                     "email": "jane.doe@example.com"})
+
+    def test_add_many_reports_duplicates_like_add(self):
+        from app.models.user import User
+        self.facade.create_user({"first_name": "Jane", "last_name": "Doe",
+                                 "email": "jane.doe@example.com"})
+        batch = [User("Ann", "Lee", "ann@example.com"), User("John", "Doe", "jane.doe@example.com")]
+        with self.assertRaisesRegex(ValueError, "^email 'jane.doe@example.com' already exists$"):
+            self.facade.user_repo.add_many(batch)
+        with self.assertRaisesRegex(ValueError, "^email 'jane.doe@example.com' already exists$"):
+            self.facade.user_repo.add(batch[1])
+
+    def test_add_replaces_a_stored_id(self):
+        from app.models.user import User
+        repo = self.facade.user_repo
+        user = self.facade.create_user({"first_name": "Jane", "last_name": "Doe",
+                                        "email": "jane.doe@example.com"})
+        self.facade.create_user({"first_name": "Ann", "last_name": "Lee", "email": "ann@example.com"})
+        replacement = User("Janet", "Doe", "janet@example.com")
+        replacement.id = user.id
+        repo.add(replacement)
+        self.assertIs(repo.get(user.id), replacement)
+        self.assertEqual(len(repo), 2)
+        self.assertIsNone(repo.get_by_attribute('email', "jane.doe@example.com"))
+        user.first_name = "Stale"  # no longer stored, so not written back
+        self.assertEqual(repo.get(user.id).first_name, "Janet")
+        clash = User("Ann", "Again", "ann@example.com")
+        clash.id = user.id
+        with self.assertRaises(ValueError):
+            repo.add(clash)
+        self.assertEqual(repo.get_by_attribute('email', "janet@example.com"), replacement)
+        repo.add_many([replacement, User("Bo", "Lee", "bo@example.com")])
+        self.assertEqual(len(repo), 3)
+
+    def test_planner_reads_sql_indexes(self):
+        from app.models.bus import Bus
+        buses = [self.facade.create_bus({"name": f"Bus {i}", "engine_type": ('electric', 'hybrid')[i % 2],
+                                         "euro_standard": 5 + i % 3 // 2, "status": i % 4 and 1})
+                 for i in range(30)]
+        filters = {'status': 1, 'euro_standard': 6, 'engine_type__in': ['electric', 'hybrid']}
+        self.assertIn('IndexScan', self.facade.explain(Bus, filters))
+        expected = [bus.id for bus in buses if bus.status == 1 and bus.euro_standard == 6]
+        self.assertEqual([bus.id for bus in self.facade.query(Bus, filters)], expected)
+        first, position = self.facade.get_buses_page(3, None, filters)
+        second, _ = self.facade.get_buses_page(3, position, filters)
+        self.assertEqual([bus.id for bus in first + second], expected[:6])
+
+
+class TestJournaledRepository(unittest.TestCase):
+
+    def setUp(self):
+        import tempfile
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def open_facade(self):
+        from app.services.facade import Facade
+        return Facade(backend='journal', data_dir=self.tmp.name, fsync_policy='os')
+
+    def test_replays_journal_after_snapshot(self):
+        facade = self.open_facade()
+        facade.bus_repo.compact_min_bytes = 0
+        bus = facade.create_bus({"name": "A", "engine_type": "electric", "euro_standard": 6})
+        facade.update_bus(bus.id, {"status": 1})
+        removed = facade.create_bus({"name": "B", "engine_type": "hybrid", "euro_standard": 5})
+        facade.delete_bus(removed.id)
+        facade.close()
+
+        restarted = self.open_facade()
+        self.assertEqual([b.id for b in restarted.get_all_buses()], [bus.id])
+        self.assertEqual(restarted.get_buses_by_status(1)[0].name, "A")
+        restarted.close()
+
+    def test_torn_tail_is_ignored(self):
+        import glob
+        import os
+        facade = self.open_facade()
+        report = facade.create_report({"comment": "Brake noise"})
+        facade.close()
+        journal = glob.glob(os.path.join(self.tmp.name, "reports.*.journal"))[0]
+        with open(journal, "ab") as f:
+            f.write(b"\x40\x00")
+
+        restarted = self.open_facade()
+        self.assertEqual(restarted.get_report(report.id).comment, "Brake noise")
+        restarted.create_report({"comment": "Door stuck"})
+        restarted.close()
+        reopened = self.open_facade()
+        self.assertEqual(len(reopened.report_repo), 2)
+        reopened.close()
+
+
+class TestMappedSnapshot(unittest.TestCase):
+
+    def setUp(self):
+        import tempfile
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_serves_exported_snapshot(self):
+        from app.services.facade import Facade
+        source = Facade()
+        owner = source.create_user({"first_name": "Ann", "last_name": "Lee", "email": "ann@example.com"})
+        electric = source.create_bus({"name": "A", "engine_type": "electric", "euro_standard": 6, "owner_id": owner.id})
+        source.create_bus({"name": "B", "engine_type": "thermal", "euro_standard": 5})
+        route = source.create_route({"route_number": "7", "name": "Loop", "user_id": owner.id, "bus_id": [electric.id]})
+        source.export_snapshot(self.tmp.name)
+
+        mapped = Facade(backend='mmap', snapshot_dir=self.tmp.name)
+        self.assertEqual(mapped.get_bus(electric.id).owner.email, "ann@example.com")
+        self.assertEqual([b.id for b in mapped.get_buses_by_owner(owner.id)], [electric.id])
+        self.assertEqual([b.id for b in mapped.get_buses_by_route(route.id)], [electric.id])
+        with self.assertRaises(ValueError):
+            mapped.create_user({"first_name": "Bob", "last_name": "Lee", "email": "ann@example.com"})
+        added = mapped.create_bus({"name": "C", "engine_type": "hybrid", "euro_standard": 6})
+        mapped.delete_bus(electric.id)
+        self.assertEqual([b.name for b in mapped.get_all_buses()], ["B", "C"])
+        self.assertEqual(len(mapped.bus_repo), 2)
+        self.assertEqual(mapped.get_bus(added.id).name, "C")
+        mapped.close()
+
+    def test_concurrent_reads_decode_each_row_once(self):
+        import sys
+        import threading
+        from app.services.facade import Facade
+        source = Facade()
+        owner = source.create_user({"first_name": "Ann", "last_name": "Lee", "email": "ann@example.com"})
+        ids = [bus.id for bus, _ in source.create_buses_many(
+            [{"name": f"Bus {i}", "engine_type": "hybrid", "euro_standard": 6, "owner_id": owner.id}
+             for i in range(3000)])]
+        source.export_snapshot(self.tmp.name)
+
+        mapped = Facade(backend='mmap', snapshot_dir=self.tmp.name, thread_safe=True)
+        seen = [None] * 8
+
+        def read(slot):
+            seen[slot] = [mapped.get_bus(bus_id) for bus_id in ids]
+
+        interval = sys.getswitchinterval()
+        sys.setswitchinterval(1e-6)
+        try:
+            threads = [threading.Thread(target=read, args=(slot,)) for slot in range(8)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        finally:
+            sys.setswitchinterval(interval)
+        for buses in seen[1:]:
+            self.assertTrue(all(a is b for a, b in zip(buses, seen[0])))
+        self.assertEqual(len(mapped.bus_repo), 3000)
+        self.assertEqual([bus.id for bus in mapped.get_all_buses()], ids)
+        mapped.close()
+
+    def test_decoded_rows_stay_out_of_the_scan_order(self):
+        from app.services.facade import Facade
+        source = Facade()
+        owner = source.create_user({"first_name": "Ann", "last_name": "Lee", "email": "ann@example.com"})
+        ids = [bus.id for bus, _ in source.create_buses_many(
+            [{"name": f"Bus {i}", "engine_type": "hybrid", "euro_standard": 6, "owner_id": owner.id}
+             for i in range(50)])]
+        source.export_snapshot(self.tmp.name)
+
+        mapped = Facade(backend='mmap', snapshot_dir=self.tmp.name)
+        added = mapped.create_bus({"name": "New", "engine_type": "electric", "euro_standard": 6})
+        for bus_id in reversed(ids):
+            mapped.get_bus(bus_id)
+        self.assertEqual(mapped.bus_repo._order, [mapped.bus_repo.position(added)])
+        self.assertEqual([bus.id for bus in mapped.get_all_buses()], ids + [added.id])
+        page, position = mapped.get_buses_page(30)
+        rest, _ = mapped.get_buses_page(30, position)
+        self.assertEqual([bus.id for bus in page + rest], ids + [added.id])
+        mapped.close()
@@ -0,0 +1,71 @@
+"""Concurrent dashboard reads through the ASGI entry point, native or bridged.
+
+Starts ``--connections`` requests for GET /api/v1/buses/<id>?expand=owner,reports
+at once on one event loop, and times until all are answered: once
+through the native handlers on the AsyncFacade, once through WsgiBridge
+to the Flask app, as the endpoints without a native handler are served.
+The backend is the configured one (set ``REPOSITORY_BACKEND=sqlite`` to
+see blocking lookups overlap).
+
+    python -m benchmarks.bench_asgi [--connections 2000] [--buses 1000] [--rounds 3]
+"""
+import argparse
+import asyncio
+import time
+
+from app.asgi import create_asgi_app
+from app.services import facade
+
+
+def scope(path):
+    return {'type': 'http', 'method': 'GET', 'path': path, 'root_path': '',
+            'query_string': b'expand=owner,reports', 'headers': [], 'http_version': '1.1',
+            'scheme': 'http'}
+
+
+async def request(app, path):
+    async def receive():
+        return {'type': 'http.request', 'body': b''}
+
+    status = None
+
+    async def send(message):
+        nonlocal status
+        if message['type'] == 'http.response.start':
+            status = message['status']
+
+    await app(scope(path), receive, send)
+    assert status == 200, status
+
+
+async def burst(app, paths):
+    start = time.perf_counter()
+    await asyncio.gather(*(request(app, path) for path in paths))
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--connections', type=int, default=2000)
+    parser.add_argument('--buses', type=int, default=1000)
+    parser.add_argument('--rounds', type=int, default=3)
+    args = parser.parse_args()
+
+    app = create_asgi_app()
+    owner = facade.create_user({'first_name': 'Depot', 'last_name': 'Owner',
+                                'email': 'depot@bench.example.com'})
+    reports = [facade.create_report({'comment': f"Inspection {i}"}).id for i in range(20)]
+    buses = [facade.create_bus({'name': f"Bus {i}", 'engine_type': 'electric', 'euro_standard': 6,
+                                'owner_id': owner.id, 'reports': reports[i % 20:i % 20 + 3]}).id
+             for i in range(args.buses)]
+    paths = [f"/api/v1/buses/{buses[i % len(buses)]}" for i in range(args.connections)]
+
+    print(f"{'path':>8} {'seconds':>9} {'req/s':>9}")
+    for name, target in (('native', app), ('bridged', app.bridge)):
+        best = min(asyncio.run(burst(target, paths)) for _ in range(args.rounds))
+        print(f"{name:>8} {best:>9.3f} {args.connections / best:>9,.0f}")
+    app.executor.shutdown()
+
+
+if __name__ == '__main__':
+    main()
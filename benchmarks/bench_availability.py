@@ -0,0 +1,101 @@
+"""Fleet-wide "which buses are free" query: bitmaps against per-bus scans.
+
+Books ``--per-bus`` random assignments (5-minute aligned, 5 to 60
+minutes long) for each of ``--buses`` buses over a year, then answers
+"active electric buses free between T1 and T2" for windows of an hour, a
+day and a week three ways:
+
+- bitmap: FleetIndex masks, the path behind GET /api/v1/buses/available
+- per-bus: walk the buses matching the filters, one Schedule lookup each
+- naive: walk the buses and their assignments
+
+    python -m benchmarks.bench_availability [--buses 2000] [--per-bus 200]
+"""
+import argparse
+import random
+import time
+from datetime import datetime, timedelta
+
+from app.services.facade import Facade
+
+SLOT = timedelta(minutes=5)
+YEAR_SLOTS = 365 * 24 * 12
+EPOCH = datetime(2030, 1, 1)
+WINDOWS = (('1 hour', 12), ('1 day', 288), ('1 week', 2016))
+FILTERS = {'status': 1, 'engine_type': 'electric'}
+
+
+def populate(buses, per_bus, rng):
+    facade = Facade()
+    owner = facade.create_user({'first_name': 'Depot', 'last_name': 'Owner',
+                                'email': 'depot@example.com'})
+    engines = ('electric', 'hybrid', 'thermal', 'hydrogen')
+    bus_ids = [facade.create_bus({'name': f"Bus {i}", 'engine_type': engines[i % 4],
+                                  'euro_standard': 6, 'status': rng.choice((0, 1, 1, 1))}).id
+               for i in range(buses)]
+    route_id = facade.create_route({'route_number': '1', 'name': 'Line 1',
+                                    'user_id': owner.id, 'bus_id': bus_ids[0]}).id
+    stride = YEAR_SLOTS // per_bus
+    for bus_id in bus_ids:
+        for n in range(per_bus):
+            slot = n * stride + rng.randrange(stride - 12)
+            facade.create_assignment({'bus_id': bus_id, 'route_id': route_id,
+                                      'start': EPOCH + SLOT * slot,
+                                      'end': EPOCH + SLOT * (slot + rng.randint(1, 12))})
+    return facade
+
+
+def bitmap(facade, start, end):
+    return facade.fleet.available(start, end, FILTERS)
+
+
+def per_bus(facade, start, end):
+    return [bus.id for bus in facade.bus_repo.scan(filters=FILTERS)
+            if not facade.schedule.conflicts(bus.id, start, end)]
+
+
+def naive(facade, start, end):
+    by_bus = {}
+    for assignment in facade.assignment_repo.scan():
+        by_bus.setdefault(assignment.bus_id, []).append(assignment.window)
+    return [bus.id for bus in facade.bus_repo.scan()
+            if bus.status == 1 and bus.engine_type == 'electric'
+            and not any(s < end and e > start for s, e in by_bus.get(bus.id, ()))]
+
+
+def timed(fn, facade, windows):
+    start = time.perf_counter()
+    results = [fn(facade, s, e) for s, e in windows]
+    return (time.perf_counter() - start) / len(windows) * 1e6, results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--buses', type=int, default=2000)
+    parser.add_argument('--per-bus', type=int, default=200)
+    parser.add_argument('--queries', type=int, default=200)
+    args = parser.parse_args()
+    rng = random.Random(11)
+
+    facade = populate(args.buses, args.per_bus, rng)
+    facade.fleet  # build the bitmaps before timing
+    print(f"{args.buses:,} buses, {len(facade.assignment_repo):,} assignments")
+    print(f"{'window':>8} {'bitmap us':>10} {'per-bus us':>11} {'naive us':>10} {'free':>6}")
+    to_us = lambda moment: int(moment.timestamp()) * 1_000_000
+    for label, slots in WINDOWS:
+        windows = []
+        for _ in range(args.queries):
+            # Unaligned starts so the exact edge check is part of the cost.
+            start = EPOCH + SLOT * rng.randrange(YEAR_SLOTS - slots) + timedelta(minutes=2)
+            windows.append((to_us(start), to_us(start + SLOT * slots)))
+        bitmap_us, expected = timed(bitmap, facade, windows)
+        per_bus_us, results = timed(per_bus, facade, windows)
+        assert [sorted(r) for r in results] == [sorted(r) for r in expected]
+        naive_us, results = timed(naive, facade, windows[:5])
+        assert [sorted(r) for r in results] == [sorted(r) for r in expected[:5]]
+        free = sum(map(len, expected)) / len(expected)
+        print(f"{label:>8} {bitmap_us:>10.1f} {per_bus_us:>11.1f} {naive_us:>10.0f} {free:>6.0f}")
+
+
+if __name__ == '__main__':
+    main()
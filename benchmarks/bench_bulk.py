@@ -0,0 +1,58 @@
+"""Bus onboarding throughput: one POST per bus against POST /buses/bulk.
+
+Both paths go through the Flask test client with the same payloads: each
+bus has an owner and two reports. The backend is the configured one
+(set ``REPOSITORY_BACKEND`` to compare).
+
+    python -m benchmarks.bench_bulk [--buses 5000] [--batch 1000]
+"""
+import argparse
+import time
+
+from app import create_app
+from app.services import facade
+
+
+def payloads(buses):
+    owners = [facade.create_user({'first_name': 'Depot', 'last_name': f"Owner{i}",
+                                  'email': f"owner{i}@depot.example.com"}).id
+              for i in range(max(1, buses // 100))]
+    reports = [facade.create_report({'comment': f"Inspection {i}"}).id for i in range(50)]
+    return [{'name': f"Bus {i}", 'engine_type': 'electric', 'euro_standard': 6,
+             'price': 1.0, 'length': 12.0, 'status': 1,
+             'owner_id': owners[i % len(owners)],
+             'reports': [reports[i % 50], reports[(i + 1) % 50]]}
+            for i in range(buses)]
+
+
+def run(client, items, batch):
+    start = time.perf_counter()
+    if batch:
+        for offset in range(0, len(items), batch):
+            response = client.post('/api/v1/buses/bulk', json=items[offset:offset + batch])
+            assert response.status_code == 201, response.json
+    else:
+        for item in items:
+            response = client.post('/api/v1/buses/', json=item)
+            assert response.status_code == 201, response.json
+    return len(items) / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--buses', type=int, default=5000)
+    parser.add_argument('--batch', type=int, default=1000)
+    args = parser.parse_args()
+
+    client = create_app().test_client()
+    print(f"{'path':>10} {'buses/s':>10}")
+    results = {}
+    items = payloads(args.buses)
+    for name, batch in (('single', 0), ('bulk', args.batch)):
+        results[name] = run(client, items, batch)
+        print(f"{name:>10} {results[name]:>10,.0f}")
+    print(f"speed-up: {results['bulk'] / results['single']:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
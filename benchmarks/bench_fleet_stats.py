@@ -0,0 +1,69 @@
+"""Fleet statistics from the columnar shadow store against walking every bus.
+
+Creates ``--buses`` buses, then times GET /api/v1/fleet/stats's facade
+call (running aggregates over the columns) against computing the same
+figures from ``get_all_buses()``, and the cost the columns add to a bus
+update.
+
+    python -m benchmarks.bench_fleet_stats [--buses 100000]
+"""
+import argparse
+import random
+import time
+
+from app.services.facade import Facade
+
+ENGINES = ('electric', 'hybrid', 'thermal', 'hydrogen')
+
+
+def naive_stats(facade):
+    stats = {}
+    for vehicle in facade.get_all_buses():
+        group = stats.setdefault(vehicle.engine_type, [0, 0.0, 0.0])
+        group[0] += 1
+        group[1] += vehicle.price
+        group[2] += vehicle.capacity
+    return stats
+
+
+def timed(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--buses', type=int, default=100_000)
+    args = parser.parse_args()
+    rng = random.Random(5)
+
+    facade = Facade()
+    ids = [facade.create_bus({'name': f"Bus {i}", 'engine_type': rng.choice(ENGINES),
+                              'euro_standard': rng.randint(3, 6), 'status': rng.choice((-1, 0, 1)),
+                              'price': rng.uniform(1e5, 6e5), 'capacity': rng.randint(20, 120)}).id
+           for i in range(args.buses)]
+    start = time.perf_counter()
+    facade.columns
+    print(f"{args.buses:,} buses, columns built in {(time.perf_counter() - start) * 1e3:.0f} ms")
+
+    stats = facade.get_fleet_stats()
+    naive = naive_stats(facade)
+    for engine, (count, price, _) in naive.items():
+        assert stats['by_engine_type'][engine]['count'] == count
+        assert abs(stats['by_engine_type'][engine]['price']['total'] - price) < 1e-3 * price
+
+    print(f"stats (columns)  {timed(facade.get_fleet_stats, 1000):>10.1f} us")
+    print(f"stats (walk)     {timed(lambda: naive_stats(facade), 5):>10.1f} us")
+
+    it = iter(rng.choice(ids) for _ in range(20_000))
+    update = lambda: facade.update_bus(next(it), {'price': rng.uniform(1e5, 6e5)})
+    with_columns = timed(update, 10_000)
+    facade._columns = None
+    print(f"update (columns) {with_columns:>10.1f} us")
+    print(f"update (none)    {timed(update, 10_000):>10.1f} us")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+"""Write throughput, write amplification and restart time of the journal backend.
+
+Creates a fleet of buses, then applies N status updates spread over it,
+for each fsync policy. Write amplification is the bytes written to
+journals and snapshots divided by the bytes of journal entries alone
+(1.0 means snapshots cost nothing extra).
+
+    python -m benchmarks.bench_journal [--buses 10000] [--ops 200000]
+"""
+import argparse
+import tempfile
+import time
+
+from app.services.facade import Facade
+
+
+def run(policy, buses, ops, directory):
+    facade = Facade(backend='journal', data_dir=directory, fsync_policy=policy)
+    ids = [facade.create_bus({'name': f"Bus {i}", 'engine_type': 'electric',
+                              'euro_standard': 6}).id
+           for i in range(buses)]
+
+    start = time.perf_counter()
+    for i in range(ops):
+        facade.update_bus(ids[i % buses], {'status': i % 3 - 1})
+    elapsed = time.perf_counter() - start
+
+    repo = facade.bus_repo
+    journal, snapshots = repo.journal_bytes_written, repo.snapshot_bytes_written
+    facade.close()
+
+    start = time.perf_counter()
+    restarted = Facade(backend='journal', data_dir=directory)
+    restart = time.perf_counter() - start
+    assert len(restarted.bus_repo) == buses
+    restarted.close()
+    return ops / elapsed, (journal + snapshots) / journal, restart
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--buses', type=int, default=10_000)
+    parser.add_argument('--ops', type=int, default=200_000)
+    parser.add_argument('--policies', default='os,interval,always')
+    args = parser.parse_args()
+
+    print(f"{'policy':>10} {'updates/s':>12} {'write amp':>10} {'restart ms':>11}")
+    for policy in args.policies.split(','):
+        ops = args.ops if policy != 'always' else min(args.ops, 5_000)
+        with tempfile.TemporaryDirectory() as directory:
+            throughput, amplification, restart = run(policy, args.buses, ops, directory)
+        print(f"{policy:>10} {throughput:>12,.0f} {amplification:>10.2f} {restart * 1e3:>11.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+"""Resident bytes per entity for a fleet of buses.
+
+Measures the traced allocations of N buses on their own and once stored
+in an ``InMemoryRepository`` with the facade's indexes, for the current
+``Bus`` and for ``DictBus``, a copy of the layout it had before __slots__
+and integer timestamps: a per-instance __dict__, datetime timestamps and
+each bus's own copy of its engine type.
+
+    python -m benchmarks.bench_memory [--buses 100000]
+"""
+import argparse
+import gc
+import json
+import tracemalloc
+import uuid
+from datetime import datetime
+
+from app.models.bus import Bus
+from app.services.facade import Facade
+
+ENGINE_TYPES = ('thermal', 'hybrid', 'hydrogen', 'electric')
+
+
+class DictBus:
+    """The bus layout before __slots__, with just what the repository reads."""
+
+    _observers = ()
+
+    def __init__(self, name, engine_type, euro_standard, description="", price=0.0, length=0.0,
+                 status=0, capacity=0.0, owner=None):
+        self.id = str(uuid.uuid4())
+        self.created_at = datetime.now()
+        self.updated_at = datetime.now()
+        self._name = name
+        self.description = description
+        self._price = price
+        self._length = length
+        self._engine_type = engine_type
+        self._euro_standard = euro_standard
+        self._capacity = capacity
+        self._status = status
+        self._owner = owner
+        self.owner_id = owner.id if owner else None
+        self.routes = []
+        self.reports = []
+
+    @property
+    def engine_type(self):
+        return self._engine_type
+
+    @property
+    def euro_standard(self):
+        return self._euro_standard
+
+    @property
+    def status(self):
+        return self._status
+
+    def add_observer(self, observer):
+        if observer not in self._observers:
+            self._observers = self._observers + (observer,)
+
+
+def make_bus(model, i):
+    # Round-trip the enum-like fields through JSON, as API payloads do, so
+    # every bus starts with its own copy of the string.
+    payload = json.loads(json.dumps({'engine_type': ENGINE_TYPES[i % 4]}))
+    return model(f"Bus {i}", payload['engine_type'], 6, description="",
+                 price=250000.0, length=12.0, status=i % 3 - 1, capacity=90.0)
+
+
+def measure(model, count, store):
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    if store:
+        facade = Facade()
+        for i in range(count):
+            facade.bus_repo.add(make_bus(model, i))
+        keep = facade
+    else:
+        keep = [make_bus(model, i) for i in range(count)]
+    gc.collect()
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    del keep
+    return used / count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--buses', type=int, default=100_000)
+    args = parser.parse_args()
+
+    print(f"{'layout':>12} {'before':>10} {'after':>10}  (bytes/bus)")
+    for name, store in (('objects', False), ('repository', True)):
+        print(f"{name:>12} {measure(DictBus, args.buses, store):>10.0f} "
+              f"{measure(Bus, args.buses, store):>10.0f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+"""Cost of the metrics instrumentation on GET /api/v1/buses/<id>.
+
+Builds the app with METRICS=1, then sends requests alternately with the
+instrumentation in place and stripped off (the request timer unwrapped,
+the timed facade and repository methods removed), all in one process:
+separate processes, or even blocks of requests a few milliseconds apart,
+differ by more than the cost being measured. Each request is paired with
+its neighbour, and the median difference of the pairs is the cost. Note
+that switching between requests leaves the instrumentation's code and
+data out of the CPU caches, which a server timing every request does not
+pay: the figure errs high. ``--sample`` sets METRICS_SAMPLE, ``--http``
+goes through a real HTTP server on localhost with a keep-alive connection
+instead of calling the WSGI app directly.
+
+    python -m benchmarks.bench_metrics [--requests 20000] [--sample 8] [--http]
+"""
+import argparse
+import logging
+import os
+import statistics
+import threading
+from http.client import HTTPConnection
+from time import perf_counter_ns
+
+
+class Instrumentation:
+    """Switch the metrics wrappers of an app and its facade off and back on."""
+
+    def __init__(self, app, facade):
+        self.app = app
+        self.timer = app.wsgi_app
+        self.timed = {}
+        for obj in [facade] + list(facade._models.values()):
+            # timed() wraps with functools.wraps, which sets __wrapped__.
+            self.timed[obj] = {name: value for name, value in vars(obj).items()
+                               if hasattr(value, '__wrapped__')}
+
+    def enable(self, on):
+        self.app.wsgi_app = self.timer if on else self.timer.wsgi_app
+        for obj, methods in self.timed.items():
+            for name, wrapper in methods.items():
+                if on:
+                    setattr(obj, name, wrapper)
+                else:
+                    vars(obj).pop(name, None)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=int, default=20000)
+    parser.add_argument('--sample', type=int)
+    parser.add_argument('--http', action='store_true')
+    args = parser.parse_args()
+
+    os.environ['METRICS'] = '1'
+    if args.sample:
+        os.environ['METRICS_SAMPLE'] = str(args.sample)
+    from werkzeug.serving import WSGIRequestHandler, make_server
+    from werkzeug.test import EnvironBuilder
+    from app import create_app
+    from app.services import facade
+
+    app = create_app()
+    sample = app.wsgi_app.sample
+    instrumentation = Instrumentation(app, facade)
+    bus = facade.create_bus({'name': 'Bench', 'engine_type': 'electric', 'euro_standard': 6})
+    path = f'/api/v1/buses/{bus.id}'
+    if args.http:
+        WSGIRequestHandler.protocol_version = 'HTTP/1.1'
+        logging.getLogger('werkzeug').setLevel(logging.ERROR)
+        # The server calls app.wsgi_app through the app, so switching it takes effect.
+        server = make_server('127.0.0.1', 0, app, threaded=False)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        connection = HTTPConnection('127.0.0.1', server.server_port)
+
+        def request():
+            connection.request('GET', path)
+            connection.getresponse().read()
+    else:
+        environ = EnvironBuilder(path=path).get_environ()
+
+        def start_response(status, headers, exc_info=None):
+            pass
+
+        def request():
+            body = app(dict(environ), start_response)
+            for _ in body:
+                pass
+            body.close()
+
+    for _ in range(1000):
+        request()
+    times = {True: [], False: []}
+    for pair in range(args.requests // 2):
+        # Alternate which setting goes first, so drift hits both alike.
+        for on in (True, False) if pair % 2 else (False, True):
+            instrumentation.enable(on)
+            start = perf_counter_ns()
+            request()
+            times[on].append((perf_counter_ns() - start) / 1e3)
+    instrumentation.enable(True)
+
+    on, off = statistics.median(times[True]), statistics.median(times[False])
+    cost = statistics.median(a - b for a, b in zip(times[True], times[False]))
+    print(f"{'http' if args.http else 'wsgi'}, 1 call in {sample} timed: "
+          f"{off:.1f} us without metrics, {on:.1f} us with; "
+          f"paired cost {cost:+.1f} us ({cost / off * 100:+.2f}%)")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+"""Startup time and first-request latency of the mmap backend against the journal.
+
+Writes a synthetic dataset (users and buses, ``--entities`` in total) once
+as memory-mapped tables and once as a journal snapshot, then measures, for
+each backend, how long the Facade takes to open and how long the first
+lookups take afterwards.
+
+    python -m benchmarks.bench_mmap [--entities 500000]
+"""
+import argparse
+import os
+import pickle
+import tempfile
+import time
+import uuid
+
+from app.persistence.mmap_snapshot import write_table
+from app.services.facade import Facade
+
+ENGINES = ('thermal', 'electric', 'hybrid', 'hydrogen')
+
+
+def generate(entities):
+    users = max(1, entities // 10)
+    now = int(time.time() * 1e6)
+    user_records = [{"id": str(uuid.uuid4()), "created_at": now, "updated_at": now,
+                     "first_name": "First", "last_name": f"Last{i}",
+                     "email": f"user{i}@example.com", "is_admin": False}
+                    for i in range(users)]
+    bus_records = [{"id": str(uuid.uuid4()), "created_at": now, "updated_at": now,
+                    "name": f"Bus {i}", "description": "", "price": 250000.0, "length": 12.0,
+                    "capacity": 80.0, "engine_type": ENGINES[i % len(ENGINES)],
+                    "euro_standard": 6, "status": i % 3 - 1,
+                    "owner_id": user_records[i % users]["id"], "route_ids": [], "report_ids": []}
+                   for i in range(entities - users)]
+    return user_records, bus_records
+
+
+def write_mmap(directory, users, buses):
+    write_table(os.path.join(directory, "users.fleet"), "User", users, ('email',))
+    write_table(os.path.join(directory, "buses.fleet"), "Bus", buses,
+                ('owner_id', 'status', 'engine_type', 'euro_standard'))
+
+
+def write_journal(directory, users, buses):
+    for name, records in (("users", users), ("buses", buses)):
+        with open(os.path.join(directory, f"{name}.snapshot"), 'wb') as f:
+            pickler = pickle.Pickler(f, protocol=pickle.HIGHEST_PROTOCOL)
+            pickler.dump({"generation": 0})
+            for record in records:
+                pickler.dump(record)
+            pickler.dump(None)
+
+
+def measure(options, bus_ids):
+    start = time.perf_counter()
+    facade = Facade(**options)
+    startup = time.perf_counter() - start
+
+    start = time.perf_counter()
+    bus = facade.get_bus(bus_ids[len(bus_ids) // 2])
+    bus.owner.email
+    first_get = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for bus_id in bus_ids[:1000]:
+        facade.get_bus(bus_id)
+    gets = (time.perf_counter() - start) / 1000
+    facade.close()
+    return startup, first_get, gets
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--entities', type=int, default=500_000)
+    args = parser.parse_args()
+
+    users, buses = generate(args.entities)
+    bus_ids = [record["id"] for record in buses]
+    print(f"{len(users):,} users, {len(buses):,} buses")
+    print(f"{'backend':>8} {'startup ms':>11} {'first get ms':>13} {'get us':>8}")
+    with tempfile.TemporaryDirectory() as directory:
+        write_mmap(directory, users, buses)
+        startup, first_get, gets = measure({'backend': 'mmap', 'snapshot_dir': directory}, bus_ids)
+        print(f"{'mmap':>8} {startup * 1e3:>11.1f} {first_get * 1e3:>13.3f} {gets * 1e6:>8.1f}")
+    with tempfile.TemporaryDirectory() as directory:
+        write_journal(directory, users, buses)
+        startup, first_get, gets = measure({'backend': 'journal', 'data_dir': directory,
+                                            'fsync_policy': 'os'}, bus_ids)
+        print(f"{'journal':>8} {startup * 1e3:>11.1f} {first_get * 1e3:>13.3f} {gets * 1e6:>8.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+"""CRUD throughput of InMemoryRepository against SqliteRepository.
+
+Each operation runs over N users; the table reports operations per second.
+SQLite reads run after the inserted objects are released, so they load
+rows from the database instead of the identity map.
+
+    python -m benchmarks.bench_repositories [--users 20000]
+"""
+import argparse
+import gc
+import os
+import tempfile
+import time
+
+from app.models.user import User
+from app.persistence.repository import InMemoryRepository
+from app.persistence.sqlite_repository import ConnectionPool, SqliteRepository
+
+
+def make_users(count, prefix):
+    return [User("Jane", "Doe", f"{prefix}{i}@example.com") for i in range(count)]
+
+
+def timed(operation, count):
+    start = time.perf_counter()
+    operation()
+    return count / (time.perf_counter() - start)
+
+
+def run(make_repo, count):
+    results = {}
+    repo = make_repo()
+
+    users = make_users(count, "single")
+    results['add'] = timed(lambda: [repo.add(user) for user in users], count)
+    ids = [user.id for user in users]
+    emails = [user.email for user in users]
+    del users
+    gc.collect()
+
+    bulk = make_users(count, "bulk")
+    results['add_many'] = timed(lambda: repo.add_many(bulk), count)
+    del bulk
+    gc.collect()
+
+    results['get'] = timed(lambda: [repo.get(obj_id) for obj_id in ids], count)
+    gc.collect()
+    results['get_by_attribute'] = timed(
+        lambda: [repo.get_by_attribute('email', email) for email in emails], count)
+    results['update'] = timed(
+        lambda: [repo.update(obj_id, {'first_name': 'Janet'}) for obj_id in ids], count)
+    results['delete'] = timed(lambda: [repo.delete(obj_id) for obj_id in ids], count)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=20_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        pool = ConnectionPool(os.path.join(tmp, 'bench.db'))
+        memory = run(lambda: InMemoryRepository(unique_indexes=('email',)), args.users)
+        sqlite = run(lambda: SqliteRepository(pool, 'users', User, unique_indexes=('email',)),
+                     args.users)
+        pool.close_all()
+
+    print(f"{'operation':>18} {'memory ops/s':>14} {'sqlite ops/s':>14}")
+    for operation in memory:
+        print(f"{operation:>18} {memory[operation]:>14,.0f} {sqlite[operation]:>14,.0f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+"""Assignment booking and availability latency as schedules fill up.
+
+Books ``--per-bus`` assignments for each of ``--buses`` buses through the
+facade, then packs one extra bus with a full year of back-to-back
+5-minute assignments (105,120 of them). For both, it times a conflict
+check, a booking and an availability query against the per-bus schedule
+index, and compares the query with a naive scan of the bus's
+assignments.
+
+    python -m benchmarks.bench_schedule [--buses 2000] [--per-bus 100]
+"""
+import argparse
+import random
+import time
+from datetime import datetime, timedelta
+
+from app.services.facade import Facade
+
+SLOT = timedelta(minutes=5)
+YEAR_SLOTS = 365 * 24 * 12
+EPOCH = datetime(2030, 1, 1)
+
+
+def timed(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1e6
+
+
+def naive_busy(assignments, start, end):
+    return [a for a in assignments if a.start < end and a.end > start]
+
+
+def measure(facade, bus_id, route_id, rng, repeat=2000):
+    assignments = facade.assignment_repo.get_all_by_attribute('bus_id', bus_id)
+    windows = []
+    for _ in range(repeat):
+        start = EPOCH + SLOT * rng.randrange(YEAR_SLOTS - 24)
+        windows.append((start, start + SLOT * 24))
+    it = iter(windows * 2)
+
+    def indexed():
+        start, end = next(it)
+        facade.get_bus_availability(bus_id, start, end)
+
+    def naive():
+        start, end = next(it)
+        naive_busy(assignments, start, end)
+
+    indexed_us = timed(indexed, repeat)
+    naive_us = timed(naive, min(repeat, 200))
+
+    # Book and cancel a slot just past the end of the year each time.
+    def book():
+        assignment = facade.create_assignment({
+            'bus_id': bus_id, 'route_id': route_id,
+            'start': EPOCH + SLOT * (YEAR_SLOTS + 1), 'end': EPOCH + SLOT * (YEAR_SLOTS + 2)})
+        facade.delete_assignment(assignment.id)
+
+    book_us = timed(book, repeat)
+    return len(assignments), indexed_us, naive_us, book_us
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--buses', type=int, default=2000)
+    parser.add_argument('--per-bus', type=int, default=100)
+    args = parser.parse_args()
+    rng = random.Random(7)
+
+    facade = Facade()
+    owner = facade.create_user({'first_name': 'Depot', 'last_name': 'Owner',
+                                'email': 'depot@example.com'})
+    bus_ids = [facade.create_bus({'name': f"Bus {i}", 'engine_type': 'electric',
+                                  'euro_standard': 6}).id for i in range(args.buses + 1)]
+    route_id = facade.create_route({'route_number': '1', 'name': 'Line 1',
+                                    'user_id': owner.id, 'bus_id': bus_ids[0]}).id
+
+    start = time.perf_counter()
+    booked = 0
+    stride = YEAR_SLOTS // args.per_bus
+    for bus_id in bus_ids[:-1]:
+        for n in range(args.per_bus):
+            slot = n * stride + rng.randrange(stride - 12)
+            facade.create_assignment({'bus_id': bus_id, 'route_id': route_id,
+                                      'start': EPOCH + SLOT * slot,
+                                      'end': EPOCH + SLOT * (slot + rng.randint(1, 12))})
+            booked += 1
+    dense = bus_ids[-1]
+    for slot in range(YEAR_SLOTS):
+        facade.create_assignment({'bus_id': dense, 'route_id': route_id,
+                                  'start': EPOCH + SLOT * slot, 'end': EPOCH + SLOT * (slot + 1)})
+        booked += 1
+    elapsed = time.perf_counter() - start
+    print(f"booked {booked:,} assignments in {elapsed:.1f}s "
+          f"({elapsed / booked * 1e6:.1f} us each)")
+
+    print(f"{'bus':>8} {'bookings':>9} {'query us':>9} {'naive us':>9} {'book us':>8}")
+    for label, bus_id in (('typical', bus_ids[0]), ('full', dense)):
+        count, indexed_us, naive_us, book_us = measure(facade, bus_id, route_id, rng)
+        print(f"{label:>8} {count:>9,} {indexed_us:>9.1f} {naive_us:>9.1f} {book_us:>8.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+"""Encoding time and bytes on the wire of the full bus listing, per encoder and coding.
+
+Creates ``--buses`` buses and times encoding the listing body with each
+installed JSON encoder, with a cold serialization cache (every entity runs
+``serialize``) and a warm one. Then compresses the body with each coding the
+API negotiates, and finally fetches ``/api/v1/buses/?stream=json`` through
+the app for the end-to-end figure.
+
+    python -m benchmarks.bench_serialization [--buses 10000]
+"""
+import argparse
+import time
+import zlib
+
+from app import create_app
+from app.api.v1 import serialization
+from app.api.v1.compression import COMPRESS_LEVEL, _WBITS
+from app.services import facade
+
+
+def timed(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = fn()
+    return (time.perf_counter() - start) / repeat * 1e3, result
+
+
+def listing(buses):
+    return {'buses': [bus.to_dict() for bus in buses]}
+
+
+def invalidate(buses):
+    for bus in buses:
+        object.__setattr__(bus, '_cache', None)
+
+
+def compress(data, coding):
+    compressor = zlib.compressobj(COMPRESS_LEVEL, zlib.DEFLATED, _WBITS[coding])
+    return compressor.compress(data) + compressor.flush()
+
+
+def fetch(client, coding):
+    headers = {'Accept-Encoding': coding} if coding else {}
+    response = client.get('/api/v1/buses/?stream=json', headers=headers)
+    return len(response.data)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--buses', type=int, default=10_000)
+    args = parser.parse_args()
+
+    for i in range(args.buses):
+        facade.create_bus({'name': f"Bus {i}", 'engine_type': ('electric', 'hybrid')[i % 2],
+                           'euro_standard': 6, 'status': 1, 'price': 250_000.0 + i,
+                           'length': 12.0, 'capacity': 90})
+    buses = facade.get_all_buses()
+
+    print(f"{'encoder':>8} {'cold ms':>10} {'warm ms':>10} {'encode ms':>10} {'bytes':>10}")
+    for name, dumps in serialization.ENCODERS.items():
+        def cold():
+            invalidate(buses)
+            return dumps(listing(buses))
+        cold_ms, _ = timed(cold, 5)
+        warm_ms, body = timed(lambda: dumps(listing(buses)), 20)
+        data = listing(buses)
+        encode_ms, _ = timed(lambda: dumps(data), 20)
+        print(f"{name:>8} {cold_ms:>10.2f} {warm_ms:>10.2f} {encode_ms:>10.2f} {len(body):>10,}")
+
+    print(f"\n{'coding':>8} {'ms':>10} {'bytes':>10} {'ratio':>10}")
+    print(f"{'identity':>8} {0:>10.2f} {len(body):>10,} {1:>10.2f}")
+    for coding in _WBITS:
+        ms, compressed = timed(lambda: compress(body, coding), 10)
+        print(f"{coding:>8} {ms:>10.2f} {len(compressed):>10,} {len(body) / len(compressed):>10.2f}")
+
+    client = create_app().test_client()
+    print(f"\n{'request':>8} {'ms':>10} {'bytes':>10}")
+    for coding in (None, 'gzip', 'deflate'):
+        ms, size = timed(lambda: fetch(client, coding), 5)
+        print(f"{coding or 'identity':>8} {ms:>10.2f} {size:>10,}")
+
+
+if __name__ == '__main__':
+    main()
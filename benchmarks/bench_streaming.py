@@ -0,0 +1,61 @@
+"""Peak memory and time to first byte of the bus listing, buffered vs streamed.
+
+The buffered row serializes the whole fleet into one body, as the list
+endpoint did before pagination; the others stream it with ?stream=.
+
+    python -m benchmarks.bench_streaming [--buses 50000]
+"""
+import argparse
+import json
+import time
+import tracemalloc
+
+from app import create_app
+from app.services import facade
+
+
+def measure(client, url):
+    tracemalloc.start()
+    start = time.perf_counter()
+    response = client.get(url, buffered=False)
+    chunks = iter(response.response)
+    next(chunks)
+    first_byte = time.perf_counter() - start
+    size = sum(len(chunk) for chunk in chunks)
+    total = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    response.close()
+    return first_byte, total, peak, size
+
+
+def measure_buffered():
+    tracemalloc.start()
+    start = time.perf_counter()
+    body = json.dumps({'buses': [bus.to_dict() for bus in facade.get_all_buses()]})
+    total = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return total, total, peak, len(body)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--buses', type=int, default=50_000)
+    args = parser.parse_args()
+
+    for i in range(args.buses):
+        facade.create_bus({'name': f"Bus {i}", 'engine_type': 'electric',
+                           'euro_standard': 6, 'status': 1})
+    client = create_app().test_client()
+
+    print(f"{'mode':>10} {'ttfb ms':>10} {'total ms':>10} {'peak MiB':>10}")
+    rows = [('buffered', measure_buffered())]
+    for mode in ('json', 'ndjson'):
+        rows.append((mode, measure(client, f'/api/v1/buses/?stream={mode}')))
+    for mode, (first_byte, total, peak, _) in rows:
+        print(f"{mode:>10} {first_byte * 1e3:>10.2f} {total * 1e3:>10.2f} {peak / 2**20:>10.2f}")
+
+
+if __name__ == '__main__':
+    main()
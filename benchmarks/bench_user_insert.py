@@ -0,0 +1,49 @@
+"""Per-insert latency of user registration as the user repository grows.
+
+Runs the same steps as ``UserList.post``: an email lookup followed by
+``Facade.create_user``. With the unique ``email`` index the latency of each
+batch stays flat; ``--no-index`` shows the old linear scan for comparison.
+
+    python -m benchmarks.bench_user_insert [--users 100000] [--batch 10000]
+"""
+import argparse
+import time
+
+from app.persistence.repository import InMemoryRepository
+from app.services.facade import Facade
+
+
+def run(users, batch, indexed=True):
+    facade = Facade()
+    if not indexed:
+        facade.user_repo = InMemoryRepository()
+
+    results = []
+    start = time.perf_counter()
+    for i in range(users):
+        email = f"user{i}@example.com"
+        if facade.get_user_by_email(email):
+            raise RuntimeError(f"duplicate email {email}")
+        facade.create_user({'first_name': 'Jane', 'last_name': 'Doe', 'email': email})
+        if (i + 1) % batch == 0:
+            elapsed = time.perf_counter() - start
+            results.append((i + 1, elapsed / batch * 1e6))
+            start = time.perf_counter()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=100_000)
+    parser.add_argument('--batch', type=int, default=10_000)
+    parser.add_argument('--no-index', action='store_true',
+                        help='use an unindexed repository (linear scan)')
+    args = parser.parse_args()
+
+    print(f"{'users':>10} {'us/insert':>10}")
+    for count, per_insert in run(args.users, args.batch, indexed=not args.no_index):
+        print(f"{count:>10} {per_insert:>10.2f}")
+
+
+if __name__ == '__main__':
+    main()
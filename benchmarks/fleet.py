@@ -0,0 +1,99 @@
+"""Deterministic synthetic fleets for benchmarks.
+
+``generate(users, seed)`` describes a fleet scaled by its number of users,
+with relationships referring to other entities by index; the same
+arguments always give the same fleet. ``populate(facade, fleet)`` loads it
+through the facade's bulk methods and returns the ids created.
+
+The fan-out follows what a real operator sees rather than a uniform
+spread: a few depots own most of the buses (Pareto-distributed weights),
+reports per bus decay exponentially, and routes range from shuttles to
+trunk lines shared by a dozen buses.
+"""
+import random
+
+ENGINES = ('electric', 'hybrid', 'thermal', 'hydrogen')
+BUSES_PER_USER = 5
+REPORTS_PER_BUS = 2.0
+MAX_REPORTS = 8
+BUSES_PER_ROUTE = (2, 12)
+ROUTES_PER_BUS = 0.15
+
+
+class Fleet:
+    """Payloads for users, reports, buses and routes, linked by index."""
+
+    def __init__(self, users, reports, buses, routes):
+        self.users = users
+        self.reports = reports
+        self.buses = buses
+        self.routes = routes
+
+    def counts(self):
+        return {'users': len(self.users), 'reports': len(self.reports),
+                'buses': len(self.buses), 'routes': len(self.routes)}
+
+
+def generate(users, seed=0):
+    """Describe a fleet of ``users`` users and the buses, reports and routes that go with them."""
+    rng = random.Random(seed)
+    people = [{'first_name': rng.choice(FIRST_NAMES), 'last_name': rng.choice(LAST_NAMES),
+               'email': f"user{i}@fleet.example.com", 'is_admin': i % 50 == 0}
+              for i in range(users)]
+    weights = [rng.paretovariate(1.2) for _ in range(users)]
+
+    reports = []
+    buses = []
+    for i in range(users * BUSES_PER_USER):
+        first = len(reports)
+        for _ in range(min(MAX_REPORTS, int(rng.expovariate(1 / REPORTS_PER_BUS)))):
+            reports.append({'comment': f"{rng.choice(ISSUES)} #{len(reports)}"})
+        owner = rng.choices(range(users), weights)[0]
+        buses.append({'name': f"Bus {i}", 'engine_type': rng.choice(ENGINES),
+                      'euro_standard': rng.randint(3, 6), 'price': round(rng.uniform(1e5, 6e5), 2),
+                      'length': rng.choice((10.5, 12.0, 13.7, 18.0)),
+                      'capacity': float(rng.randint(30, 120)), 'status': rng.randint(0, 2),
+                      'owner': owner, 'reports': list(range(first, len(reports)))})
+
+    routes = []
+    if buses:
+        for i in range(max(1, int(len(buses) * ROUTES_PER_BUS))):
+            size = min(len(buses), rng.randint(*BUSES_PER_ROUTE))
+            routes.append({'route_number': str(i + 1), 'name': f"Line {i + 1}",
+                           'user': rng.randrange(users), 'buses': rng.sample(range(len(buses)), size)})
+    return Fleet(people, reports, buses, routes)
+
+
+def populate(facade, fleet):
+    """Create fleet through facade; return the new ids as {'users': [...], ...}."""
+    users = _created(facade.create_users_many(fleet.users))
+    reports = _created(facade.create_reports_many(fleet.reports))
+    payloads = []
+    for data in fleet.buses:
+        payload = {key: value for key, value in data.items() if key != 'owner'}
+        payload['reports'] = [reports[index] for index in data['reports']]
+        payload['owner_id'] = users[data['owner']]
+        payloads.append(payload)
+    buses = _created(facade.create_buses_many(payloads))
+    routes = [facade.create_route({'route_number': data['route_number'], 'name': data['name'],
+                                   'user_id': users[data['user']],
+                                   'bus_id': [buses[index] for index in data['buses']]}).id
+              for data in fleet.routes]
+    return {'users': users, 'reports': reports, 'buses': buses, 'routes': routes}
+
+
+def _created(results):
+    ids = []
+    for obj, error in results:
+        if error:
+            raise ValueError(f"synthetic fleet rejected: {error}")
+        ids.append(obj.id)
+    return ids
+
+
+FIRST_NAMES = ('Ada', 'Bruno', 'Chloe', 'Dario', 'Elena', 'Farid', 'Greta', 'Hugo',
+               'Ines', 'Jonas', 'Keiko', 'Lucas', 'Maya', 'Nils', 'Olga', 'Pavel')
+LAST_NAMES = ('Martin', 'Bernard', 'Dubois', 'Moreau', 'Laurent', 'Garcia', 'Roux',
+              'Fournier', 'Girard', 'Mercier', 'Blanc', 'Lefevre', 'Faure', 'Andre')
+ISSUES = ('Brake wear', 'Door sensor fault', 'Tyre pressure low', 'AC not cooling',
+          'Battery check', 'Oil leak', 'Seat damaged', 'Display offline', 'Wiper blade')
@@ -0,0 +1,357 @@
+"""Concurrent load test of the whole stack with per-endpoint latency histograms.
+
+Seeds a synthetic fleet (see ``benchmarks.fleet``) through the bulk
+endpoints, then runs ``--requests`` requests from ``--workers`` threads,
+each sending its next request as soon as the last one is answered. The
+mix reads users, buses, reports and routes and sends ``--write-ratio`` of
+writes: new users and reports, user and bus updates. Nothing is deleted,
+so every request of a run stays valid for the same fleet.
+
+By default requests go to ``create_app()`` in this process through
+Werkzeug's test client; ``--url`` sends them over HTTP to a server started
+separately (e.g. ``python run.py``) instead. Each endpoint gets a
+log-linear (HDR-style) histogram of its latencies, good to 1% at any
+scale; the report shows throughput and p50/p95/p99, ``--histograms`` the
+full percentile distribution, and ``--save`` writes it all as JSON.
+
+``--record`` writes the generated requests to a trace, and ``--replay``
+runs a trace again, so two versions can be measured on the same traffic.
+Traces name entities by their index in the fleet, which is regenerated
+from the seed and scale in the trace header.
+
+    python -m benchmarks.load [--users 200] [--requests 20000] [--workers 8]
+                              [--write-ratio 0.2] [--seed 0] [--url http://127.0.0.1:5000]
+                              [--record trace.jsonl | --replay trace.jsonl]
+                              [--save results.json] [--histograms]
+"""
+import argparse
+import itertools
+import json
+import random
+import threading
+import time
+from http.client import HTTPConnection
+from urllib.parse import urlsplit
+
+from app.api.v1.bulk import MAX_BULK_ITEMS
+from benchmarks.fleet import ISSUES, generate
+
+# Endpoint: (weight, fleet entities it refers to, method, path template).
+READS = {
+    'GET /users/<id>': (10, 'users', 'GET', '/api/v1/users/{}'),
+    'GET /buses/<id>': (25, 'buses', 'GET', '/api/v1/buses/{}'),
+    'GET /buses/': (8, None, 'GET', '/api/v1/buses/?limit=50'),
+    'GET /reports/<id>': (10, 'reports', 'GET', '/api/v1/reports/{}'),
+    'GET /reports/search': (4, None, 'GET', '/api/v1/reports/search?q={}'),
+    'GET /routes/<id>': (8, 'routes', 'GET', '/api/v1/routes/{}'),
+    'GET /routes/buses/<id>/routes': (10, 'buses', 'GET', '/api/v1/routes/buses/{}/routes'),
+}
+WRITES = {
+    'POST /users/': (4, None, 'POST', '/api/v1/users/'),
+    'PUT /users/<id>': (5, 'users', 'PUT', '/api/v1/users/{}'),
+    'POST /reports/': (8, None, 'POST', '/api/v1/reports/'),
+    'PUT /buses/<id>': (8, 'buses', 'PUT', '/api/v1/buses/{}'),
+}
+ENDPOINTS = {**READS, **WRITES}
+PERCENTILES = (50, 95, 99)
+
+
+class LatencyHistogram:
+    """Counts of microsecond latencies in log-linear buckets.
+
+    Values below 2**PRECISION are kept exactly; above, each power of two
+    is split into 2**PRECISION buckets, so any value is known to within
+    1 part in 128 while a few hundred buckets cover microseconds to
+    minutes.
+    """
+
+    PRECISION = 7
+
+    def __init__(self):
+        self.counts = {}
+        self.total = 0
+        self.max = 0
+
+    def record(self, micros):
+        value = int(micros)
+        shift = max(0, value.bit_length() - self.PRECISION)
+        bucket = value >> shift << shift
+        self.counts[bucket] = self.counts.get(bucket, 0) + 1
+        self.total += 1
+        if value > self.max:
+            self.max = value
+
+    def merge(self, other):
+        for bucket, count in other.counts.items():
+            self.counts[bucket] = self.counts.get(bucket, 0) + count
+        self.total += other.total
+        self.max = max(self.max, other.max)
+
+    def percentile(self, percent):
+        """Highest value of the bucket holding the given percentile."""
+        if not self.total:
+            return 0
+        wanted = max(1, round(self.total * percent / 100))
+        seen = 0
+        for bucket in sorted(self.counts):
+            seen += self.counts[bucket]
+            if seen >= wanted:
+                shift = max(0, bucket.bit_length() - self.PRECISION)
+                return min(bucket + (1 << shift) - 1, self.max)
+        return self.max
+
+    def distribution(self):
+        """(percentile, microseconds) pairs halving the remaining tail each step, as HdrHistogram prints."""
+        points = []
+        remaining = 100.0
+        while remaining >= 100 / max(self.total, 1) / 2 and len(points) < 20:
+            percent = 100 - remaining
+            points.append((percent, self.percentile(percent)))
+            remaining /= 2
+        points.append((100.0, self.max))
+        return points
+
+
+class InProcess:
+    """Requests answered by the app in this process, through the test client."""
+
+    def __init__(self):
+        from app import create_app
+        self.app = create_app()
+        self._local = threading.local()
+
+    def request(self, method, path, body=None):
+        client = getattr(self._local, 'client', None)
+        if client is None:
+            client = self._local.client = self.app.test_client()
+        response = client.open(path, method=method, json=body)
+        data = response.get_data()
+        response.close()
+        return response.status_code, data
+
+
+class Remote:
+    """Requests sent over HTTP to a running server, one keep-alive connection per thread."""
+
+    def __init__(self, url):
+        parts = urlsplit(url)
+        self.host, self.port = parts.hostname, parts.port or 80
+        self._local = threading.local()
+
+    def request(self, method, path, body=None):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = self._local.connection = HTTPConnection(self.host, self.port)
+        headers = {}
+        if body is not None:
+            body = json.dumps(body)
+            headers['Content-Type'] = 'application/json'
+        connection.request(method, path, body, headers)
+        response = connection.getresponse()
+        return response.status, response.read()
+
+
+def seed_fleet(target, users, seed):
+    """Load the fleet through the bulk endpoints; return its ids by entity, and the user emails."""
+    fleet = generate(users, seed)
+    # Emails are unique per server, so a second run against the same server
+    # would be rejected: tag them with the run.
+    run = f"{time.time_ns():x}"
+    emails = [data['email'].replace('@', f"+{run}@") for data in fleet.users]
+    ids = {'users': _bulk(target, '/api/v1/users/bulk', [
+        dict(data, email=email) for data, email in zip(fleet.users, emails)]), 'emails': emails}
+    ids['reports'] = _bulk(target, '/api/v1/reports/bulk', fleet.reports)
+    buses = []
+    for data in fleet.buses:
+        payload = {key: value for key, value in data.items() if key != 'owner'}
+        payload['reports'] = [ids['reports'][index] for index in data['reports']]
+        payload['owner_id'] = ids['users'][data['owner']]
+        buses.append(payload)
+    ids['buses'] = _bulk(target, '/api/v1/buses/bulk', buses)
+    ids['routes'] = []
+    for data in fleet.routes:
+        status, body = target.request('POST', '/api/v1/routes/', {
+            'route_number': data['route_number'], 'name': data['name'],
+            'user_id': ids['users'][data['user']],
+            'bus_id': [ids['buses'][index] for index in data['buses']]})
+        if status != 201:
+            raise RuntimeError(f"seeding routes failed with {status}: {body[:200]!r}")
+        ids['routes'].append(json.loads(body)['id'])
+    return ids
+
+
+def _bulk(target, path, items):
+    ids = []
+    for offset in range(0, len(items), MAX_BULK_ITEMS):
+        status, body = target.request('POST', path, items[offset:offset + MAX_BULK_ITEMS])
+        if status != 201:
+            raise RuntimeError(f"seeding {path} failed with {status}: {body[:200]!r}")
+        ids.extend(item['id'] for item in json.loads(body)['results'])
+    return ids
+
+
+def workload(count, users, seed, write_ratio):
+    """count requests as {'endpoint', 'ref', 'body'} dicts, refs indexing the fleet."""
+    fleet = generate(users, seed)
+    sizes = {kind: len(getattr(fleet, kind)) for kind in ('users', 'buses', 'reports', 'routes')}
+    rng = random.Random(seed)
+    mixes = [(mix, [weight for weight, *_ in mix.values()]) for mix in (READS, WRITES)]
+    requests = []
+    for i in range(count):
+        mix, weights = mixes[rng.random() < write_ratio]
+        endpoint = rng.choices(list(mix), weights)[0]
+        kind = mix[endpoint][1]
+        request = {'endpoint': endpoint, 'ref': rng.randrange(sizes[kind]) if kind else None,
+                   'body': None}
+        if endpoint == 'GET /reports/search':
+            request['ref'] = rng.choice(ISSUES).split()[0].lower()
+        elif endpoint == 'POST /users/':
+            request['body'] = {'first_name': 'Load', 'last_name': 'Test',
+                               'email': f"load{i}@fleet.example.com"}
+        elif endpoint == 'PUT /users/<id>':
+            # PUT takes the whole user; its email is filled in when sent.
+            request['body'] = {'first_name': 'Load', 'last_name': f"Renamed{i}"}
+        elif endpoint == 'POST /reports/':
+            request['body'] = {'comment': f"{rng.choice(ISSUES)} #{i}"}
+        elif endpoint == 'PUT /buses/<id>':
+            request['body'] = {'price': round(rng.uniform(1e5, 6e5), 2)}
+        requests.append(request)
+    return requests
+
+
+def run(target, ids, requests, workers):
+    """Send requests from workers threads; return ({endpoint: histogram}, {endpoint: errors}, seconds)."""
+    run_tag = f"{time.time_ns():x}"
+    # next() on a count is atomic in CPython, so workers share it without a lock.
+    positions = itertools.count()
+    results = []
+
+    def worker():
+        histograms = {}
+        errors = {}
+        while True:
+            position = next(positions)
+            if position >= len(requests):
+                break
+            request = requests[position]
+            endpoint = request['endpoint']
+            _, kind, method, template = ENDPOINTS[endpoint]
+            ref = request['ref']
+            path = template.format(ids[kind][ref] if kind else ref)
+            body = request['body']
+            if endpoint == 'POST /users/':
+                body = dict(body, email=body['email'].replace('@', f"+{run_tag}@"))
+            elif endpoint == 'PUT /users/<id>':
+                body = dict(body, email=ids['emails'][ref])
+            started = time.perf_counter()
+            status, _ = target.request(method, path, body)
+            elapsed = (time.perf_counter() - started) * 1e6
+            histogram = histograms.get(endpoint)
+            if histogram is None:
+                histogram = histograms[endpoint] = LatencyHistogram()
+            histogram.record(elapsed)
+            if status >= 400:
+                errors[endpoint] = errors.get(endpoint, 0) + 1
+        results.append((histograms, errors))
+
+    threads = [threading.Thread(target=worker, name=f"load-{i}") for i in range(workers)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    histograms = {}
+    errors = {}
+    for worker_histograms, worker_errors in results:
+        for endpoint, histogram in worker_histograms.items():
+            histograms.setdefault(endpoint, LatencyHistogram()).merge(histogram)
+        for endpoint, count in worker_errors.items():
+            errors[endpoint] = errors.get(endpoint, 0) + count
+    return histograms, errors, elapsed
+
+
+def summary(histograms, errors, elapsed):
+    """Per-endpoint and overall figures, latencies in milliseconds."""
+    overall = LatencyHistogram()
+    for histogram in histograms.values():
+        overall.merge(histogram)
+    rows = {}
+    for endpoint, histogram in sorted(histograms.items()) + [('all', overall)]:
+        rows[endpoint] = {
+            'requests': histogram.total,
+            'errors': errors.get(endpoint, 0) if endpoint != 'all' else sum(errors.values()),
+            'throughput': round(histogram.total / elapsed, 1),
+            **{f"p{percent}": histogram.percentile(percent) / 1000 for percent in PERCENTILES},
+            'max': histogram.max / 1000,
+            'buckets': {str(bucket): count for bucket, count in sorted(histogram.counts.items())},
+        }
+    return rows, overall
+
+
+def read_trace(path):
+    with open(path) as handle:
+        header = json.loads(handle.readline())
+        return header, [json.loads(line) for line in handle]
+
+
+def write_trace(path, header, requests):
+    with open(path, 'w') as handle:
+        handle.write(json.dumps(header) + '\n')
+        for request in requests:
+            handle.write(json.dumps(request) + '\n')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--requests', type=int, default=20000)
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--write-ratio', type=float, default=0.2)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--url')
+    parser.add_argument('--record', metavar='PATH')
+    parser.add_argument('--replay', metavar='PATH')
+    parser.add_argument('--save', metavar='PATH')
+    parser.add_argument('--histograms', action='store_true')
+    args = parser.parse_args()
+    if args.record and args.replay:
+        parser.error("--record and --replay are exclusive")
+
+    if args.replay:
+        header, requests = read_trace(args.replay)
+    else:
+        header = {'users': args.users, 'seed': args.seed}
+        requests = workload(args.requests, args.users, args.seed, args.write_ratio)
+        if args.record:
+            write_trace(args.record, header, requests)
+
+    target = Remote(args.url) if args.url else InProcess()
+    ids = seed_fleet(target, header['users'], header['seed'])
+    histograms, errors, elapsed = run(target, ids, requests, args.workers)
+    rows, overall = summary(histograms, errors, elapsed)
+
+    print(f"{len(requests)} requests from {args.workers} workers in {elapsed:.2f} s "
+          f"({'http ' + args.url if args.url else 'in-process'})")
+    print(f"{'endpoint':<32} {'requests':>8} {'errors':>6} {'req/s':>8} "
+          + ''.join(f"{'p' + str(percent):>9}" for percent in PERCENTILES) + f"{'max':>9}  (ms)")
+    for endpoint, row in rows.items():
+        print(f"{endpoint:<32} {row['requests']:>8} {row['errors']:>6} {row['throughput']:>8.1f} "
+              + ''.join(f"{row['p' + str(percent)]:>9.2f}" for percent in PERCENTILES)
+              + f"{row['max']:>9.2f}")
+    if args.histograms:
+        for endpoint, histogram in sorted(histograms.items()) + [('all', overall)]:
+            print(f"\n{endpoint}")
+            for percent, micros in histogram.distribution():
+                print(f"    {percent:>10.5f}%  {micros / 1000:>9.3f} ms")
+    if args.save:
+        with open(args.save, 'w') as handle:
+            json.dump({'trace': header, 'requests': len(requests), 'workers': args.workers,
+                       'target': args.url or 'in-process', 'seconds': round(elapsed, 3),
+                       'endpoints': rows}, handle, indent=2)
+            handle.write('\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,211 @@
+"""Micro-benchmarks of the facade and models over synthetic fleets.
+
+Each scale is a number of users; ``benchmarks.fleet`` generates the buses,
+reports and routes that go with them and loads them into a fresh facade.
+Every case is then run ``--repeat`` times and reported as the best CPU
+time per operation, in microseconds.
+
+``--save`` writes the results as a JSON baseline. ``--compare`` runs the
+scales of a baseline again and flags the cases slower than it by more
+than ``--tolerance``, exiting with status 1 if there are any; only compare
+results taken on the same machine.
+
+    python -m benchmarks.suite [--scales 100,1000,5000] [--repeat 5] [--seed 0]
+                               [--save baseline.json | --compare baseline.json [--tolerance 0.1]]
+"""
+import argparse
+import gc
+import itertools
+import json
+import platform
+import sys
+import time
+
+from app.models.report import Report
+from app.models.route import Route
+from app.models.user import User
+from app.services.facade import Facade
+from benchmarks.fleet import generate, populate
+
+BATCH = 1000
+
+
+class Environment:
+    """A populated facade and what the cases need to know about it."""
+
+    def __init__(self, users, seed):
+        self.fleet = generate(users, seed)
+        self.facade = Facade()
+        self.ids = populate(self.facade, self.fleet)
+        self._serial = itertools.count()
+
+    def new_users(self, count):
+        return [{'first_name': 'Bench', 'last_name': 'User',
+                 'email': f"bench{next(self._serial)}@suite.example.com"} for _ in range(count)]
+
+
+# Each case prepares its run outside the timing and returns it with the
+# number of operations it performs.
+
+def create_user(env):
+    payloads = env.new_users(BATCH)
+    return lambda: [env.facade.create_user(data) for data in payloads], len(payloads)
+
+
+def get_user(env):
+    ids = env.ids['users']
+    return lambda: [env.facade.get_user(user_id) for user_id in ids], len(ids)
+
+
+def update_user(env):
+    ids = env.ids['users'][:BATCH]
+    return lambda: [env.facade.update_user(user_id, {'last_name': 'Updated'}) for user_id in ids], len(ids)
+
+
+def delete_user(env):
+    ids = [user.id for user in map(env.facade.create_user, env.new_users(BATCH))]
+    return lambda: [env.facade.delete_user(user_id) for user_id in ids], len(ids)
+
+
+def get_bus(env):
+    ids = env.ids['buses']
+    return lambda: [env.facade.get_bus(bus_id) for bus_id in ids], len(ids)
+
+
+def update_bus(env):
+    ids = env.ids['buses'][:BATCH]
+    return lambda: [env.facade.update_bus(bus_id, {'price': 1.0}) for bus_id in ids], len(ids)
+
+
+def hydrate_buses(env):
+    facade = env.facade
+    return lambda: facade.hydrate_buses(facade.get_all_buses()), len(env.ids['buses'])
+
+
+def routes_by_bus(env):
+    ids = env.ids['buses']
+    return lambda: [env.facade.get_routes_by_bus(bus_id) for bus_id in ids], len(ids)
+
+
+def serialize_cold(env):
+    buses = env.facade.get_all_buses()
+    return lambda: [vehicle.serialize() for vehicle in buses], len(buses)
+
+
+def serialize_cached(env):
+    buses = env.facade.get_all_buses()
+    for vehicle in buses:
+        vehicle.to_dict()
+    return lambda: [vehicle.to_dict() for vehicle in buses], len(buses)
+
+
+def validate_user(env):
+    payloads = env.fleet.users
+    return lambda: [User(**data) for data in payloads], len(payloads)
+
+
+def validate_report(env):
+    payloads = env.fleet.reports
+    return lambda: [Report(**data) for data in payloads], len(payloads)
+
+
+def validate_route(env):
+    routes = [(data['route_number'], data['name'], env.facade.get_buses_by_route(route_id),
+               env.facade.get_user(env.ids['users'][data['user']]))
+              for data, route_id in zip(env.fleet.routes, env.ids['routes'])]
+    return lambda: [Route(*args) for args in routes], len(routes)
+
+
+CASES = {
+    'facade.create_user': create_user,
+    'facade.get_user': get_user,
+    'facade.update_user': update_user,
+    'facade.delete_user': delete_user,
+    'facade.get_bus': get_bus,
+    'facade.update_bus': update_bus,
+    'facade.hydrate_buses': hydrate_buses,
+    'facade.get_routes_by_bus': routes_by_bus,
+    'model.serialize': serialize_cold,
+    'model.to_dict_cached': serialize_cached,
+    'model.validate_user': validate_user,
+    'model.validate_report': validate_report,
+    'model.validate_route': validate_route,
+}
+
+
+def run_scale(users, seed, repeat):
+    """Best microseconds per operation of every case, at one scale."""
+    env = Environment(users, seed)
+    results = {}
+    for name, case in CASES.items():
+        best = None
+        for _ in range(repeat):
+            fn, count = case(env)
+            gc.collect()
+            # Process time leaves out other processes' turns on the CPU.
+            start = time.process_time()
+            fn()
+            per_op = (time.process_time() - start) / count * 1e6
+            best = per_op if best is None else min(best, per_op)
+        results[name] = round(best, 3)
+    return env.fleet.counts(), results
+
+
+def compare(baseline, current, tolerance):
+    """Rows of (scale, case, before, after, change, regressed) for cases in both runs."""
+    rows = []
+    for scale, cases in current.items():
+        for name, after in cases.items():
+            before = baseline.get(scale, {}).get(name)
+            if before:
+                change = (after - before) / before
+                rows.append((scale, name, before, after, change, change > tolerance))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--scales', type=lambda text: [int(value) for value in text.split(',')])
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--save', metavar='PATH')
+    parser.add_argument('--compare', metavar='PATH')
+    parser.add_argument('--tolerance', type=float, default=0.1)
+    args = parser.parse_args()
+    if args.save and args.compare:
+        parser.error("--save and --compare are exclusive")
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as handle:
+            baseline = json.load(handle)
+    scales = args.scales or ([int(scale) for scale in baseline['results']] if baseline else [100, 1000, 5000])
+    seed = baseline['seed'] if baseline and args.seed == 0 else args.seed
+
+    results = {}
+    for users in scales:
+        counts, results[str(users)] = run_scale(users, seed, args.repeat)
+        print(f"scale {users}: " + ', '.join(f"{count} {kind}" for kind, count in counts.items()))
+        for name, per_op in results[str(users)].items():
+            print(f"    {name:<28} {per_op:>10.2f} us/op")
+
+    if args.save:
+        with open(args.save, 'w') as handle:
+            json.dump({'python': sys.version.split()[0], 'platform': platform.platform(),
+                       'seed': seed, 'repeat': args.repeat, 'results': results}, handle, indent=2)
+            handle.write('\n')
+        print(f"baseline saved to {args.save}")
+    if baseline:
+        rows = compare(baseline['results'], results, args.tolerance)
+        print(f"\n{'scale':>6} {'case':<28} {'baseline':>10} {'current':>10} {'change':>8}")
+        for scale, name, before, after, change, regressed in rows:
+            print(f"{scale:>6} {name:<28} {before:>10.2f} {after:>10.2f} {change:>+8.1%}"
+                  + ("  REGRESSION" if regressed else ""))
+        regressions = sum(row[-1] for row in rows)
+        print(f"{regressions} regression(s) beyond {args.tolerance:.0%}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -3,6 +3,49 @@ import os
 class Config:
     SECRET_KEY = os.getenv('SECRET_KEY', 'default_secret_key')
     DEBUG = False
+    # 'memory' keeps everything in process; 'sqlite' stores it in SQLITE_PATH;
+    # 'journal' keeps it in memory, journaled and snapshotted under DATA_DIR;
+    # 'mmap' serves the read-only files written by Facade.export_snapshot
+    # from SNAPSHOT_DIR, keeping later writes in memory
+    REPOSITORY_BACKEND = os.getenv('REPOSITORY_BACKEND', 'memory')
+    SQLITE_PATH = os.getenv('SQLITE_PATH', 'fleet.db')
+    DATA_DIR = os.getenv('DATA_DIR', 'data')
+    # 'always' (fsync every write), 'interval' (every FSYNC_INTERVAL_MS) or 'os'
+    FSYNC_POLICY = os.getenv('FSYNC_POLICY', 'interval')
+    FSYNC_INTERVAL_MS = int(os.getenv('FSYNC_INTERVAL_MS', '100'))
+    SNAPSHOT_DIR = os.getenv('SNAPSHOT_DIR', 'snapshot')
+    # Guard the shared facade with a reader-writer lock; only switch off
+    # when the server runs a single request thread
+    THREAD_SAFE = os.getenv('THREAD_SAFE', '1') != '0'
+    # 'auto' encodes responses with orjson when installed, else the stdlib
+    JSON_ENCODER = os.getenv('JSON_ENCODER', 'auto')
+    # Compress JSON bodies of at least this many bytes for clients accepting
+    # gzip or deflate
+    COMPRESS_MIN_SIZE = int(os.getenv('COMPRESS_MIN_SIZE', '1024'))
+    COMPRESS_LEVEL = int(os.getenv('COMPRESS_LEVEL', '6'))
+    # Time requests, facade calls and repository operations, served at
+    # /metrics. One call in METRICS_SAMPLE is timed and counted that many
+    # times over: timing every call adds about 12 us (5%) to a cached
+    # GET /api/v1/buses/<id> through WSGI, one in 16 about 2 us (under 1%),
+    # per benchmarks/bench_metrics.py
+    METRICS = os.getenv('METRICS', '1') != '0'
+    METRICS_SAMPLE = int(os.getenv('METRICS_SAMPLE', '16'))
+    # Profile requests sent with 'X-Profile: <PROFILE_TOKEN>', or every request
+    # with PROFILE_ALL, into PROFILE_DIR: 'pstats' runs cProfile, 'collapsed'
+    # samples stacks for flame graphs (X-Profile-Format picks per request)
+    PROFILE_DIR = os.getenv('PROFILE_DIR', 'profiles')
+    PROFILE_TOKEN = os.getenv('PROFILE_TOKEN')
+    PROFILE_ALL = os.getenv('PROFILE_ALL', '0') != '0'
+    PROFILE_FORMAT = os.getenv('PROFILE_FORMAT', 'pstats')
+    # Sample every request's stack each PROFILE_SAMPLE_MS (0: off), adding up
+    # to PROFILE_DIR/sampled.folded; requests slower than SLOW_REQUEST_MS
+    # (0: off) go to PROFILE_DIR/slow.log with their samples, taken every
+    # 10 ms if PROFILE_SAMPLE_MS is not set
+    PROFILE_SAMPLE_MS = float(os.getenv('PROFILE_SAMPLE_MS', '0'))
+    SLOW_REQUEST_MS = float(os.getenv('SLOW_REQUEST_MS', '0'))
+    # Threads of the ASGI entry point (asgi.py) running the Flask app, and
+    # the repository calls of backends that block on I/O
+    ASGI_THREADS = int(os.getenv('ASGI_THREADS', '32'))
 
 class DevelopmentConfig(Config):
     DEBUG = True